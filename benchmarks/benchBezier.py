@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Compare per-segment and batched flattening of Bezier curves.
+#
+# Usage: python benchmarks/benchBezier.py [number of segments]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flatten import DEFAULT_TOLERANCE
+from flatten import cubicSegmentCount, quadraticSegmentCount
+from flatten import flattenCubic, flattenQuadratic
+from flatten import flattenCubics, flattenQuadratics
+
+
+def randomCurves(count, degree, rng):
+    # Chained random curves in a 200 x 200 mm area, with segments between
+    # 0.1 and 20 mm long.
+    P = np.empty((count, degree + 1, 2))
+    P[:, 0] = rng.uniform(0, 200, (count, 2))
+    size = rng.uniform(0.1, 20, (count, 1))
+    for i in range(1, degree + 1):
+        P[:, i] = P[:, 0] + size * rng.uniform(-1, 1, (count, 2))
+    P[1:, 0] = P[:-1, degree]
+
+    return P
+
+
+def best(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    return min(times), result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = np.random.default_rng(0)
+
+    for name, degree, countFunction, single, batch in (
+            ('cubic', 3, cubicSegmentCount, flattenCubic, flattenCubics),
+            ('quadratic', 2, quadraticSegmentCount, flattenQuadratic,
+             flattenQuadratics)):
+        P = randomCurves(count, degree, rng)
+        n = countFunction(P, DEFAULT_TOLERANCE)
+
+        loopTime, loopPoints = best(lambda: np.concatenate(
+            [single(segment, k) for segment, k in zip(P, n)]))
+        batchTime, batchPoints = best(lambda: batch(P, n))
+
+        print('%-9s %7d segments %8d points  per-segment %8.1f ms  '
+              'batched %7.1f ms  speedup %5.1fx  identical %s' %
+              (name, count, len(batchPoints), loopTime * 1000,
+               batchTime * 1000, loopTime / batchTime,
+               np.array_equal(loopPoints, batchPoints)))
+
+
+if __name__ == '__main__':
+    main()
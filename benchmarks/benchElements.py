@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Load time of element records for a large SVG: exec() based construction
+# (as used before the element registry) against elements.createElement.
+#
+# Usage: python benchmarks/benchElements.py [number of elements]
+
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from elements import createElement
+
+
+NAMESPACE = '{http://www.w3.org/2000/svg}'
+
+
+def syntheticSvg(count, rng):
+    # Flat document with a mix of basic shapes.
+    root = ET.Element(NAMESPACE + 'svg', id='svg')
+    for i in range(count):
+        kind = i % 5
+        x, y, w, h = rng.uniform(1, 100, 4).round(3).astype(str)
+        if kind == 0:
+            ET.SubElement(root, NAMESPACE + 'rect', id='rect%d' % i, x=x,
+                          y=y, width=w, height=h, rx='2')
+        elif kind == 1:
+            ET.SubElement(root, NAMESPACE + 'circle', id='circle%d' % i,
+                          cx=x, cy=y, r=w)
+        elif kind == 2:
+            ET.SubElement(root, NAMESPACE + 'ellipse', id='ellipse%d' % i,
+                          cx=x, cy=y, rx=w, ry=h)
+        elif kind == 3:
+            ET.SubElement(root, NAMESPACE + 'line', id='line%d' % i, x1=x,
+                          y1=y, x2=w, y2=h)
+        else:
+            ET.SubElement(root, NAMESPACE + 'path', id='path%d' % i,
+                          d='m %s,%s c 1,1 2,2 3,0 l 5,5 z' % (x, y))
+
+    return root
+
+
+class LegacyElement:
+    # Element construction as done before: exec() for every attribute.
+    validArgs = ('style', 'id', 'x', 'y', 'width', 'height', 'rx', 'ry',
+                 'cx', 'cy', 'r', 'x1', 'x2', 'y1', 'y2', 'points', 'd')
+
+    def __init__(self, args, classType):
+        self.classType = classType
+        for arg in args:
+            if arg[0] in self.validArgs:
+                var = 'self.' + arg[0]
+                str = var + '=' + 'val'
+                exec(str, globals(), {'self': self, 'val': arg[1]})
+
+
+class LegacyLoader:
+    def __init__(self):
+        self.razred = None
+
+    def load(self, root):
+        classes = {}
+        for node in root:
+            classType = node.tag.replace(NAMESPACE, '')
+            execStr = ('self.razred=LegacyElement(args=' + str(node.items()) +
+                       ', classType="' + classType + '")')
+            exec(execStr)
+            classes[node.get('id')] = self.razred
+
+        return classes
+
+
+def registryLoad(root):
+    classes = {}
+    for node in root:
+        classType = node.tag.replace(NAMESPACE, '')
+        classes[node.get('id')] = createElement(classType, node.attrib)
+
+    return classes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    root = syntheticSvg(count, np.random.default_rng(0))
+
+    start = time.perf_counter()
+    LegacyLoader().load(root)
+    legacyTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registryLoad(root)
+    registryTime = time.perf_counter() - start
+
+    print('%d elements  exec %.3f s  registry %.3f s  speedup %.1fx' %
+          (count, legacyTime, registryTime, legacyTime / registryTime))
+
+
+if __name__ == '__main__':
+    main()
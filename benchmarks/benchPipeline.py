@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Time every stage of the pipeline, from XML parsing to G-code export, on
+# a synthetic drawing (see syntheticSvg.py) or a given file. Results can
+# be written as JSON and compared with the results of another commit.
+#
+# Usage: python benchmarks/benchPipeline.py [-n elements] [--mix ...]
+#            [--file drawing.svg] [--json results.json]
+#            [--compare baseline.json]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from gcode import exportGcode
+from geometryCache import GeometryCache
+from jobCache import JobCache
+from motion import Timeline
+import parallelFlatten
+from pipeline import processPaths
+from settings import Settings
+from svgLoader import SvgLoader
+from syntheticSvg import DEFAULT_MIX, parseMix, writeSvg
+
+# Version of the JSON format.
+RESULT_VERSION = 1
+# Qt application for the drawing stages, created when they first run.
+_app = None
+
+
+def gitCommit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Stages:
+    # Runs the stages one after another. Every stage is repeated and the
+    # result of its last run is passed on to the following stages.
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, function, *args):
+        times = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = function(*args)
+            times.append(time.perf_counter() - start)
+        self.results[name] = {'best': min(times),
+                              'median': float(np.median(times)),
+                              'runs': times}
+        print('%-16s %9.1f ms' % (name, min(times) * 1000))
+
+        return result
+
+    def skip(self, name, reason):
+        self.results[name] = {'skipped': reason}
+        print('%-16s skipped (%s)' % (name, reason))
+
+
+def parseXml(filename):
+    # Plain XML parsing with the same iterparse loop as SvgLoader.
+    count = 0
+    for event, node in ET.iterparse(filename, events=('end',)):
+        node.clear()
+        count += 1
+
+    return count
+
+
+def flatten(document, tolerance, workers, cache=None):
+    if cache is None:
+        cache = GeometryCache()
+    loader = SvgLoader(tolerance, cache=cache, workers=workers)
+    loader.flatten(document)
+
+    return document
+
+
+def qtStages(stages, paths, settings):
+    # Preview and simulation drawing, which need PyQt5.
+    global _app
+    try:
+        from PyQt5 import QtCore, QtGui
+        from simulationItem import SimulationItem
+        from svgview import OVERVIEW_SIZE, renderSegments
+    except ImportError as error:
+        stages.skip('preview', str(error))
+        stages.skip('simulation', str(error))
+        return
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    _app = QtGui.QGuiApplication.instance() or QtGui.QGuiApplication([])
+
+    segments = paths.segments()
+    owners = paths.segmentOwners()
+    if owners is None:
+        owners = np.zeros(len(segments), dtype=np.int64)
+
+    def preview():
+        # segment bounds and the overview image, as SvgView.setDocument
+        # and the first paint do
+        bounds = np.hstack((np.minimum(segments[:, :2], segments[:, 2:]),
+                            np.maximum(segments[:, :2], segments[:, 2:])))
+        low = bounds[:, :2].min(axis=0)
+        high = bounds[:, 2:].max(axis=0)
+        scale = OVERVIEW_SIZE / max(high - low)
+        size = QtCore.QSize(int((high[0] - low[0]) * scale) + 1,
+                            int((high[1] - low[1]) * scale) + 1)
+        transform = QtGui.QTransform(scale, 0, 0, scale, -low[0] * scale,
+                                     -low[1] * scale)
+        visible = np.ones(owners.max() + 1 if len(owners) else 0, dtype=bool)
+        return renderSegments(size, transform, segments, bounds, visible,
+                              owners, (low[0], low[1], high[0], high[1]))
+
+    def simulation():
+        # the whole plot drawn by the simulation item
+        pen = QtGui.QPen(QtCore.Qt.black, 0)
+        item = SimulationItem(segments, pen)
+        item.setCount(item.segmentCount())
+        image = QtGui.QImage(OVERVIEW_SIZE, OVERVIEW_SIZE,
+                             QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(image)
+        item.paint(painter, None, None)
+        painter.end()
+        return image
+
+    if len(segments):
+        stages.run('preview', preview)
+        stages.run('simulation', simulation)
+    else:
+        stages.skip('preview', 'no segments')
+        stages.skip('simulation', 'no segments')
+
+
+def benchmark(filename, settings, workers, repeat):
+    stages = Stages(repeat)
+    stages.run('xml', parseXml, filename)
+    document = stages.run('elements', SvgLoader(settings.tolerance).parse,
+                          filename)
+    stages.run('flatten', flatten, document, settings.tolerance, 1)
+    stages.run('flattenParallel', flatten, document, settings.tolerance,
+               workers)
+    cache = GeometryCache()
+    flatten(document, settings.tolerance, 1, cache)
+    stages.run('flattenCached', flatten, document, settings.tolerance, 1,
+               cache)
+    paths = stages.run('getPaths', document.getPaths, range(len(document)))
+    report = {}
+    processed = stages.run('process', processPaths, paths, settings, report)
+    stages.run('timeline', Timeline, processed, settings)
+    qtStages(stages, processed, settings)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stages.run('export', exportGcode, processed,
+                   os.path.join(directory, 'out.gcode'), settings)
+        jobCache = JobCache(directory)
+        key = jobCache.key(filename, settings)
+        stages.run('jobCacheSave', jobCache.save, key, document, processed,
+                   report)
+        stages.run('jobCacheLoad', jobCache.load, key)
+
+    parallelFlatten.shutdown()
+
+    return stages.results, {'elements': len(document),
+                            'paths': len(processed),
+                            'points': processed.pointCount(),
+                            'segments': len(processed.segments())}
+
+
+def compare(results, baseline, threshold):
+    # Prints the change of every stage against an earlier result file and
+    # returns the names of stages which got slower than the threshold.
+    slower = []
+    print('\n%-16s %11s %11s %8s' % ('stage', 'baseline', 'current',
+                                     'change'))
+    for name, stage in results['stages'].items():
+        old = baseline['stages'].get(name, {})
+        if 'best' not in stage or 'best' not in old:
+            continue
+        change = stage['best'] / old['best'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  slower'
+            slower.append(name)
+        print('%-16s %8.1f ms %8.1f ms %+7.1f %%%s' %
+              (name, old['best'] * 1000, stage['best'] * 1000, change * 100,
+               flag))
+
+    return slower
+
+
+def main():
+    settings = Settings()
+    parser = argparse.ArgumentParser(
+        description='Time the stages of the Črtomir pipeline.')
+    parser.add_argument('--file', help='SVG file instead of a synthetic one')
+    parser.add_argument('-n', '--elements', type=int, default=20000,
+                        help='elements of the synthetic drawing')
+    parser.add_argument('--mix', type=parseMix,
+                        help='relative frequencies, e.g. rect=2,path=1')
+    parser.add_argument('--path-segments', type=int, default=40)
+    parser.add_argument('--polyline-points', type=int, default=40)
+    parser.add_argument('--group-size', type=int, default=100)
+    parser.add_argument('--transforms', action='store_true',
+                        help='random transforms on the groups')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs of every stage, the best one is reported')
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help='processes for parallel flattening, 0 for all '
+                        'cores')
+    parser.add_argument('--tolerance', type=float, default=settings.tolerance)
+    parser.add_argument('--fit', action='store_true',
+                        help='scale the drawing to fill the work area')
+    parser.add_argument('--overlap', type=float,
+                        default=settings.overlapTolerance)
+    parser.add_argument('--join', type=float,
+                        default=settings.joinTolerance)
+    parser.add_argument('--simplify', type=float,
+                        default=settings.simplifyTolerance)
+    parser.add_argument('--two-opt', type=float, default=settings.twoOptTime)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='earlier JSON results to compare '
+                        'with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression')
+    args = parser.parse_args()
+
+    settings.tolerance = args.tolerance
+    settings.fitToPage = args.fit
+    settings.overlapTolerance = args.overlap
+    settings.joinTolerance = args.join
+    settings.simplifyTolerance = args.simplify
+    settings.twoOptTime = args.two_opt
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.file:
+            filename = args.file
+            source = {'file': os.path.abspath(filename)}
+        else:
+            filename = os.path.join(directory, 'synthetic.svg')
+            source = {'elements': args.elements,
+                      'mix': args.mix or DEFAULT_MIX,
+                      'pathSegments': args.path_segments,
+                      'polylinePoints': args.polyline_points,
+                      'groupSize': args.group_size,
+                      'transforms': args.transforms,
+                      'seed': args.seed}
+            writeSvg(filename, args.elements, args.mix, args.path_segments,
+                     args.polyline_points, args.group_size, args.seed,
+                     args.transforms)
+        source['bytes'] = os.path.getsize(filename)
+
+        stages, document = benchmark(filename, settings, args.workers,
+                                     args.repeat)
+
+    results = {
+        'version': RESULT_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': gitCommit(),
+        'machine': {'platform': platform.platform(),
+                    'python': platform.python_version(),
+                    'numpy': np.__version__,
+                    'cpus': os.cpu_count()},
+        'settings': {'tolerance': settings.tolerance,
+                     'workArea': settings.workArea,
+                     'clipToWorkArea': settings.clipToWorkArea,
+                     'fitToPage': settings.fitToPage,
+                     'overlapTolerance': settings.overlapTolerance,
+                     'joinTolerance': settings.joinTolerance,
+                     'simplifyTolerance': settings.simplifyTolerance,
+                     'orderPaths': settings.orderPaths,
+                     'twoOptTime': settings.twoOptTime,
+                     'workers': parallelFlatten.workerCount(args.workers),
+                     'repeat': args.repeat},
+        'input': source,
+        'document': document,
+        'stages': stages}
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
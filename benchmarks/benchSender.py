@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Stream the G-code of a synthetic drawing (see syntheticSvg.py) or a given
+# file to the controller emulator, with send and wait and with character
+# counting, and compare the time, line rate and planner starvation. POSIX
+# only.
+#
+# Usage: python benchmarks/benchSender.py [-n elements] [--file drawing.svg]
+#            [--time-scale 0.01] [--baudrate 115200]
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from controllerEmulator import ControllerEmulator
+from gcode import gcodeLines
+from pipeline import processPaths
+from sender import Sender, SerialPort
+from settings import Settings
+from svgLoader import SvgLoader
+from syntheticSvg import writeSvg
+
+
+def stream(paths, settings, maxLines, timeScale):
+    emulator = ControllerEmulator(settings.rxBufferSize,
+                                  baudrate=settings.baudrate,
+                                  rapidRate=settings.travelRate,
+                                  timeScale=timeScale)
+    emulator.start()
+    port = SerialPort(emulator.name, settings.baudrate)
+    sender = Sender(port, gcodeLines(paths, settings),
+                    settings.rxBufferSize, maxLines)
+    sender.start()
+    sender.wait()
+    statistics = sender.statistics()
+    emulatorStatistics = emulator.statistics()
+    port.close()
+    emulator.close()
+
+    return {'state': statistics['state'],
+            'elapsed': statistics['elapsed'],
+            'lineRate': statistics['linesAcked'] / statistics['elapsed'],
+            'moveTime': emulatorStatistics['busyTime'],
+            'starvedTime': emulatorStatistics['starvedTime'],
+            'maxRx': emulatorStatistics['maxRx'],
+            'overflows': emulatorStatistics['overflows']}
+
+
+def main():
+    settings = Settings()
+    parser = argparse.ArgumentParser(
+        description='Compare streaming modes on the controller emulator.')
+    parser.add_argument('--file', help='SVG file instead of a synthetic one')
+    parser.add_argument('-n', '--elements', type=int, default=100,
+                        help='elements of the synthetic drawing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-scale', type=float, default=0.01,
+                        help='emulated moves take this many times as long '
+                             'as on the machine')
+    parser.add_argument('-b', '--baudrate', type=int,
+                        default=settings.baudrate)
+    parser.add_argument('--buffer-size', type=int,
+                        default=settings.rxBufferSize)
+    args = parser.parse_args()
+
+    settings.baudrate = args.baudrate
+    settings.rxBufferSize = args.buffer_size
+    settings.twoOptTime = 0.1
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = args.file
+        if not filename:
+            filename = os.path.join(directory, 'synthetic.svg')
+            writeSvg(filename, args.elements, seed=args.seed)
+        document = SvgLoader(settings.tolerance, workers=1).load(filename)
+    paths = processPaths(document.getPaths(range(len(document))), settings)
+
+    print('%-15s %9s %9s %9s %9s %7s %9s' % (
+        'mode', 'time', 'lines/s', 'moves', 'starved', 'max rx',
+        'overflows'))
+    for name, maxLines in (('send and wait', 1), ('char counting', None)):
+        result = stream(paths, settings, maxLines, args.time_scale)
+        print('%-15s %7.2f s %9.0f %7.2f s %7.2f s %5d B %9d%s' % (
+            name, result['elapsed'], result['lineRate'], result['moveTime'],
+            result['starvedTime'], result['maxRx'], result['overflows'],
+            '' if result['state'] == 'done' else '  ' + result['state']))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
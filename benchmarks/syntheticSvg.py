@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Synthetic SVG drawings of a given size and element mix for benchmarks.
+#
+# Usage: python benchmarks/syntheticSvg.py output.svg [-n elements]
+#            [--mix rect=1,circle=1,path=2] [--path-segments 40]
+
+import argparse
+
+import numpy as np
+
+# Element kinds and their default relative frequency.
+DEFAULT_MIX = {'rect': 1, 'circle': 1, 'ellipse': 1, 'line': 1,
+               'polyline': 1, 'polygon': 1, 'path': 1}
+# Page size in mm.
+PAGE_WIDTH = 210
+PAGE_HEIGHT = 297
+# Relative path commands and their number of parameters.
+PATH_COMMANDS = (('c', 6), ('q', 4), ('s', 4), ('t', 2), ('l', 2))
+
+
+def parseMix(text):
+    # 'rect=2,path=1' -> {'rect': 2.0, 'path': 1.0}
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind not in DEFAULT_MIX:
+            raise ValueError('unknown element kind: ' + kind)
+        mix[kind] = float(weight or 1)
+
+    return mix
+
+
+def numbers(values):
+    return ' '.join('%.3f' % value for value in values)
+
+
+def pathData(rng, segments):
+    # Relative path with a random sequence of curves and lines, as written
+    # by drawing programs. Subpaths are closed now and then.
+    x, y = rng.uniform(0, (PAGE_WIDTH, PAGE_HEIGHT))
+    parts = ['M %.3f,%.3f' % (x, y)]
+    commands = rng.integers(0, len(PATH_COMMANDS), segments)
+    for command in commands:
+        name, count = PATH_COMMANDS[command]
+        parts.append(name + ' ' + numbers(rng.uniform(-10, 10, count)))
+    if rng.random() < 0.5:
+        parts.append('z')
+
+    return ' '.join(parts)
+
+
+def elementXml(kind, index, rng, pathSegments, polylinePoints):
+    x, y = rng.uniform(0, (PAGE_WIDTH, PAGE_HEIGHT))
+    w, h = rng.uniform(1, 30, 2)
+    id = '%s%d' % (kind, index)
+    if kind == 'rect':
+        return ('<rect id="%s" x="%.3f" y="%.3f" width="%.3f" '
+                'height="%.3f" rx="%.3f" ry="%.3f"/>' %
+                (id, x, y, w, h, w / 5, h / 5))
+    if kind == 'circle':
+        return '<circle id="%s" cx="%.3f" cy="%.3f" r="%.3f"/>' % (
+            id, x, y, w)
+    if kind == 'ellipse':
+        return ('<ellipse id="%s" cx="%.3f" cy="%.3f" rx="%.3f" '
+                'ry="%.3f"/>' % (id, x, y, w, h))
+    if kind == 'line':
+        return ('<line id="%s" x1="%.3f" y1="%.3f" x2="%.3f" y2="%.3f"/>' %
+                (id, x, y, x + w, y + h))
+    if kind in ('polyline', 'polygon'):
+        points = np.cumsum(rng.uniform(-5, 5, (polylinePoints, 2)), axis=0)
+        points += (x, y)
+        return '<%s id="%s" points="%s"/>' % (
+            kind, id, ' '.join('%.3f,%.3f' % tuple(p) for p in points))
+
+    return '<path id="%s" d="%s"/>' % (id, pathData(rng, pathSegments))
+
+
+def groupTransform(rng):
+    return ' transform="translate(%.3f,%.3f) rotate(%.3f) scale(%.3f)"' % (
+        tuple(rng.uniform(-20, 20, 2)) + (rng.uniform(-30, 30),
+                                          rng.uniform(0.5, 1.5)))
+
+
+def writeSvg(filename, count, mix=None, pathSegments=40, polylinePoints=40,
+             groupSize=100, seed=0, transforms=False):
+    # Writes a drawing with count elements on an A4 page. Kinds are drawn
+    # at random with the relative frequencies in mix. Elements are put in
+    # groups of groupSize (0 for a flat document), which get a random
+    # transform if transforms is set. The same arguments always give the
+    # same file.
+    mix = mix or DEFAULT_MIX
+    kinds = sorted(mix)
+    weights = np.array([mix[kind] for kind in kinds], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    choices = rng.choice(len(kinds), count, p=weights / weights.sum())
+
+    with open(filename, 'w', buffering=1 << 20) as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<svg xmlns="http://www.w3.org/2000/svg" id="svg" '
+                   'width="%dmm" height="%dmm" viewBox="0 0 %d %d">\n' %
+                   (PAGE_WIDTH, PAGE_HEIGHT, PAGE_WIDTH, PAGE_HEIGHT))
+        for index, choice in enumerate(choices.tolist()):
+            if groupSize and index % groupSize == 0:
+                if index:
+                    file.write('</g>\n')
+                file.write('<g id="g%d"%s>\n' % (
+                    index // groupSize,
+                    groupTransform(rng) if transforms else ''))
+            file.write(elementXml(kinds[choice], index, rng, pathSegments,
+                                  polylinePoints) + '\n')
+        if groupSize and count:
+            file.write('</g>\n')
+        file.write('</svg>\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic SVG drawing.')
+    parser.add_argument('output', help='SVG file')
+    parser.add_argument('-n', '--elements', type=int, default=10000,
+                        help='number of elements')
+    parser.add_argument('--mix', type=parseMix,
+                        help='relative frequencies, e.g. rect=2,path=1')
+    parser.add_argument('--path-segments', type=int, default=40,
+                        help='commands in every path')
+    parser.add_argument('--polyline-points', type=int, default=40,
+                        help='points in every polyline and polygon')
+    parser.add_argument('--group-size', type=int, default=100,
+                        help='elements per group, 0 for no groups')
+    parser.add_argument('--transforms', action='store_true',
+                        help='random transforms on the groups')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    writeSvg(args.output, args.elements, args.mix, args.path_segments,
+             args.polyline_points, args.group_size, args.seed,
+             args.transforms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+from pathArray import PathArray
+
+
+def fitPaths(paths, rect):
+    # Scale paths uniformly to the largest size which fits into rect
+    # (x, y, width, height) and centre them there. Returns the paths and
+    # the scale.
+    if not paths.pointCount():
+        return paths, 1.0
+
+    low = paths.points.min(axis=0)
+    size = paths.points.max(axis=0) - low
+    x, y, width, height = rect
+    scales = [limit / extent for limit, extent in zip((width, height), size)
+              if extent > 0]
+    scale = min(scales) if scales else 1.0
+
+    shift = np.array((x, y)) + (np.array((width, height)) - size * scale) / 2
+    points = (paths.points - low) * scale + shift
+
+    return PathArray(points, paths.offsets, paths.owners), scale
+
+
+def clipPaths(paths, rect):
+    # Clip all segments to rect (x, y, width, height) at once with the
+    # Liang-Barsky algorithm. A subpath which leaves the rectangle is split
+    # there and continues where it comes back. Single points outside are
+    # dropped.
+    if not paths.pointCount():
+        return paths
+
+    x, y, width, height = rect
+    low = np.array((x, y), dtype=np.float64)
+    high = low + (width, height)
+    points = paths.points
+    if (points >= low).all() and (points <= high).all():
+        return paths
+
+    index = np.flatnonzero(paths.segmentMask())
+    A = points[index]
+    D = points[index + 1] - A
+
+    # the segment A + t*D is inside for t0 <= t <= t1, every side of the
+    # rectangle limits t from one end depending on the direction
+    p = np.hstack((-D, D))
+    q = np.hstack((A - low, high - A))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = q / p
+    t0 = np.max(np.where(p < 0, t, 0), axis=1, initial=0)
+    t1 = np.min(np.where(p > 0, t, 1), axis=1, initial=1)
+    parallelOutside = ((p == 0) & (q < 0)).any(axis=1)
+    kept = (t0 <= t1) & ~parallelOutside
+
+    # unclipped ends keep their exact coordinates
+    B = points[index + 1].copy()
+    A = A.copy()
+    start = kept & (t0 > 0)
+    end = kept & (t1 < 1)
+    A[start] = np.clip(A[start] + t0[start, None] * D[start], low, high)
+    B[end] = np.clip(points[index[end]] + t1[end, None] * D[end], low, high)
+
+    single = points[paths.offsets[:-1][paths.lengths() == 1]]
+    dots = ((single >= low) & (single <= high)).all(axis=1)
+
+    return paths.keepSegments(kept, A, B, dots)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# grbl-like controller on a pseudo terminal, to test and benchmark the
+# sender without a machine. POSIX only.
+#
+# Usage: python controllerEmulator.py  (prints the port to connect to)
+
+import collections
+import math
+import os
+import re
+import select
+import threading
+import time
+import tty
+
+from sender import (BAUDRATE, CYCLE_START, FEED_HOLD, RX_BUFFER_SIZE,
+                    SOFT_RESET, STATUS_REPORT)
+
+GREETING = b"\r\nGrbl 1.1h ['$' for help]\r\n"
+# Planner blocks of grbl on an ATmega328p.
+PLANNER_SIZE = 15
+WORD_RE = re.compile(r'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+
+
+class ControllerEmulator:
+    # Receives bytes at the serial speed into an RX buffer of bufferSize
+    # bytes. A line leaves the RX buffer (and is acknowledged with 'ok')
+    # when the planner has a free block. Blocks are executed one after the
+    # other, a move takes its length divided by its feed rate (rapidRate
+    # for G0) times timeScale. Realtime commands are handled at once.
+    # Statistics: RX buffer overflows (flow control errors) and the time
+    # the planner was empty while the job was running (starvation).
+    def __init__(self, bufferSize=RX_BUFFER_SIZE, plannerSize=PLANNER_SIZE,
+                 baudrate=BAUDRATE, rapidRate=3000, timeScale=1.0):
+        self.bufferSize = bufferSize
+        self.plannerSize = plannerSize
+        # bytes per second, 10 bits per byte
+        self.byteRate = baudrate / 10 if baudrate else None
+        self.rapidRate = rapidRate
+        self.timeScale = timeScale
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.name = os.ttyname(self.slave)
+
+        self.lock = threading.Lock()
+        self.thread = None
+        self.isClosed = False
+        self.reset()
+
+    def reset(self):
+        # wire: bytes on the way in, rx: the receive buffer
+        self.wire = bytearray()
+        self.wireTime = None
+        self.rx = bytearray()
+        self.planner = collections.deque()
+        self.blockEnd = None
+        self.isHeld = False
+        self.position = [0.0, 0.0]
+        self.motion = 'G0'
+        self.feedRate = 0.0
+
+        self.linesReceived = 0
+        self.blocksDone = 0
+        self.overflows = 0
+        self.maxRx = 0
+        self.starvedTime = 0.0
+        self.busyTime = 0.0
+        self.idleSince = None
+        self.isRunning = False
+
+    def start(self):
+        os.write(self.master, GREETING)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.isClosed = True
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def statistics(self):
+        with self.lock:
+            return {'linesReceived': self.linesReceived,
+                    'blocksDone': self.blocksDone,
+                    'overflows': self.overflows,
+                    'maxRx': self.maxRx,
+                    'starvedTime': self.starvedTime,
+                    'busyTime': self.busyTime}
+
+    def run(self):
+        while not self.isClosed:
+            now = time.perf_counter()
+            timeout = 0.01
+            if self.blockEnd is not None and not self.isHeld:
+                timeout = min(timeout, max(self.blockEnd - now, 0))
+            if self.wire:
+                timeout = min(timeout, 0.001)
+            ready, _, _ = select.select([self.master], [], [], timeout)
+            if ready:
+                try:
+                    data = os.read(self.master, 4096)
+                except OSError:
+                    return
+                self.receive(data, now)
+
+            with self.lock:
+                now = time.perf_counter()
+                self.transfer(now)
+                self.execute(now)
+                self.plan(now)
+
+    def receive(self, data, now):
+        # Realtime commands bypass the buffers, like on grbl.
+        for byte in data:
+            command = bytes((byte,))
+            if command == STATUS_REPORT:
+                self.report()
+            elif command == FEED_HOLD:
+                with self.lock:
+                    self.hold(now)
+            elif command == CYCLE_START:
+                with self.lock:
+                    self.cycleStart(now)
+            elif command == SOFT_RESET:
+                with self.lock:
+                    self.reset()
+                os.write(self.master, GREETING)
+            else:
+                if not self.wire:
+                    self.wireTime = now
+                self.wire.append(byte)
+
+    def transfer(self, now):
+        # bytes arrive in the RX buffer at the serial speed
+        if not self.wire:
+            return
+        count = len(self.wire)
+        if self.byteRate:
+            count = min(count, int((now - self.wireTime) * self.byteRate))
+        if count <= 0:
+            return
+        self.wireTime += count / self.byteRate if self.byteRate else 0
+        free = self.bufferSize - len(self.rx)
+        if count > free:
+            # a real controller loses these bytes
+            self.overflows += 1
+        self.rx += self.wire[:count]
+        del self.wire[:count]
+        self.maxRx = max(self.maxRx, len(self.rx))
+
+    def plan(self, now):
+        while len(self.planner) < self.plannerSize:
+            end = self.rx.find(b'\n')
+            if end < 0:
+                return
+            line = self.rx[:end].decode('ascii', 'replace').strip()
+            del self.rx[:end + 1]
+            self.linesReceived += 1
+            self.isRunning = line != 'M2'
+            duration = self.parse(line)
+            if duration is not None:
+                self.planner.append(duration)
+                if self.idleSince is not None:
+                    self.starvedTime += now - self.idleSince
+                    self.idleSince = None
+            os.write(self.master, b'ok\r\n')
+
+    def parse(self, line):
+        # Duration of the move of a line in s, None if it does not move.
+        words = dict(WORD_RE.findall(line.upper()))
+        if 'G' in words and words['G'] in ('0', '1', '00', '01'):
+            self.motion = 'G' + str(int(words['G']))
+        if 'F' in words:
+            self.feedRate = float(words['F'])
+        if 'X' not in words and 'Y' not in words:
+            return None
+
+        x = float(words.get('X', self.position[0]))
+        y = float(words.get('Y', self.position[1]))
+        length = math.hypot(x - self.position[0], y - self.position[1])
+        self.position = [x, y]
+        rate = self.rapidRate if self.motion == 'G0' else self.feedRate
+        if rate <= 0:
+            return 0.0
+
+        return length / (rate / 60) * self.timeScale
+
+    def execute(self, now):
+        if self.isHeld:
+            return
+        while self.planner:
+            if self.blockEnd is None:
+                self.blockEnd = now + self.planner[0]
+            if self.blockEnd > now:
+                return
+            self.busyTime += self.planner.popleft()
+            self.blocksDone += 1
+            if self.planner:
+                # the next block follows without a stop
+                self.blockEnd += self.planner[0]
+            else:
+                self.blockEnd = None
+        if self.isRunning and self.idleSince is None:
+            self.idleSince = now
+
+    def hold(self, now):
+        if not self.isHeld:
+            self.isHeld = True
+            if self.blockEnd is not None:
+                # time left of the current block
+                self.planner[0] = max(self.blockEnd - now, 0)
+                self.blockEnd = None
+
+    def cycleStart(self, now):
+        self.isHeld = False
+
+    def report(self):
+        with self.lock:
+            state = 'Hold' if self.isHeld else \
+                'Run' if self.planner else 'Idle'
+            status = '<%s|MPos:%.3f,%.3f,0.000|Bf:%d,%d>\r\n' % (
+                state, self.position[0], self.position[1],
+                self.plannerSize - len(self.planner),
+                self.bufferSize - len(self.rx))
+        os.write(self.master, status.encode('ascii'))
+
+
+if __name__ == '__main__':
+    emulator = ControllerEmulator()
+    emulator.start()
+    print('Controller emulator on %s, Ctrl+C to stop' % emulator.name)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(emulator.statistics())
+        emulator.close()
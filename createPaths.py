@@ -10,284 +10,457 @@
 import numpy as np
 import re
 
+from pathArray import PathArray
+from flatten import DEFAULT_TOLERANCE
+from flatten import cubicSegmentCount, quadraticSegmentCount, arcSegmentCount
+from flatten import evaluateCurves, cubicBasis, quadraticBasis
 
-class CreateShapePaths:
 
-    def getRectPath(self, element):
-        path = {'x': [], 'y': []}
-        x = float(element.x)
-        y = float(element.y)
-        rx = float(element.rx)
-        ry = float(element.ry)
-        width = float(element.width)
-        height = float(element.height)
+NUMBER = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+NUMBER_RE = re.compile(NUMBER)
+COMMAND_RE = re.compile(r'([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)')
+# arc flags are single characters and may be packed without separators
+_SEP = r'[\s,]*'
+ARC_RE = re.compile(_SEP.join(['(' + NUMBER + ')']*3 + ['([01])']*2 +
+                              ['(' + NUMBER + ')']*2))
+PARAMETER_COUNT = {'m': 2, 'z': 0, 'l': 2, 'h': 1, 'v': 1,
+                   'c': 6, 's': 4, 'q': 4, 't': 2, 'a': 7}
 
-        # perform an absolute moveto operation to location (x+rx,y)
-        path['x'].append(x + rx)
-        path['y'].append(y)
-
-        # perform an absolute horizontal lineto operation to location (x+width-rx,y)
-        path['x'].append(x + width - rx)
-        path['y'].append(y)
-
-        # perform an absolute elliptical arc operation to coordinate (x+width,y+ry)
-        if rx != 0:
-            angle = np.linspace(np.pi*3/2, np.pi*2, 12)
-            _x = x + width - rx + rx*np.cos(angle)
-            _y = y + ry + ry*np.sin(angle)
-            path['x'].extend(_x[1:-1].tolist())
-            path['y'].extend(_y[1:-1].tolist())
-
-        # perform an absolute vertical lineto to location (x+width,y+height-ry)
-        path['x'].append(x + width)
-        path['y'].append(y + height - ry)
-
-        # perform an absolute elliptical arc operation to coordinate (x+width-rx,y+height)
-        if rx != 0:
-            angle = np.linspace(0, np.pi/2, 12)
-            _x = x + width - rx + rx*np.cos(angle)
-            _y = y + height - ry + ry*np.sin(angle)
-            path['x'].extend(_x[1:-1].tolist())
-            path['y'].extend(_y[1:-1].tolist())
-
-        # perform an absolute horizontal lineto to location (x+rx,y+height)
-        path['x'].append(x + rx)
-        path['y'].append(y + height)
-
-        # perform an absolute elliptical arc operation to coordinate (x,y+height-ry)
-        if rx != 0:
-            angle = np.linspace(np.pi/2, np.pi, 12)
-            _x = x + rx + rx*np.cos(angle)
-            _y = y + height - ry + ry*np.sin(angle)
-            path['x'].extend(_x[1:-1].tolist())
-            path['y'].extend(_y[1:-1].tolist())
-
-        # perform an absolute absolute vertical lineto to location (x,y+ry)
-        path['x'].append(x)
-        path['y'].append(y + ry)
-
-        # perform an absolute elliptical arc operation to coordinate (x+rx,y)
-        if rx != 0:
-            angle = np.linspace(np.pi, np.pi*3/2, 12)
-            _x = x + rx + rx*np.cos(angle)
-            _y = y + ry + ry*np.sin(angle)
-            path['x'].extend(_x[1:-1].tolist())
-            path['y'].extend(_y[1:-1].tolist())
-
-        return path
 
-    def getCircPath(self, element):
-        path = {'x': [], 'y': []}
-        r = float(element.r)
-        cx = float(element.cx)
-        cy = float(element.cy)
+def getElementPath(element, tolerance=DEFAULT_TOLERANCE):
+    # Flattened PathArray of a single element, None for elements which
+    # draw nothing themselves (svg, g, unknown tags).
+    if 'rect' == element.classType:
+        return CreateShapePaths(tolerance).getRectPath(element)
 
-        angle = np.linspace(0, 2*np.pi, 50)
-        x = cx + r*np.cos(angle)
-        y = cy + r*np.sin(angle)
+    if 'circle' == element.classType:
+        return CreateShapePaths(tolerance).getCircPath(element)
 
-        path['x'] = x.tolist()
-        path['y'] = y.tolist()
+    if 'ellipse' == element.classType:
+        return CreateShapePaths(tolerance).getEllipsePath(element)
 
-        return path
+    if 'line' == element.classType:
+        return CreateShapePaths(tolerance).getLinePath(element)
 
-    def getEllipsePath(self, element):
-        path = {'x': [], 'y': []}
-        rx = float(element.rx)
-        ry = float(element.ry)
-        cx = float(element.cx)
-        cy = float(element.cy)
+    if 'polyline' == element.classType:
+        return CreateShapePaths(tolerance).getPolylinePath(element)
 
-        angle = np.linspace(0, 2*np.pi, 50)
-        x = cx + rx*np.cos(angle)
-        y = cy + ry*np.sin(angle)
+    if 'polygon' == element.classType:
+        return CreateShapePaths(tolerance).getPolygonPath(element)
 
-        path['x'] = x.tolist()
-        path['y'] = y.tolist()
+    if 'path' == element.classType:
+        return CreatePathPaths(tolerance).getPathPath(element)
 
-        return path
+    return None
 
-    def getLinePath(self, element):
-        path = {'x': [], 'y': []}
-        x1 = float(element.x1)
-        x2 = float(element.x2)
-        y1 = float(element.y1)
-        y2 = float(element.y2)
 
-        path['x'].append(x1)
-        path['x'].append(x2)
-        path['y'].append(y1)
-        path['y'].append(y2)
+def getElementsPaths(elements, tolerance=DEFAULT_TOLERANCE):
+    # Flatten a list of element classes into one PathArray, in order.
+    paths = [getElementPath(element, tolerance) for element in elements]
 
-        return path
+    return PathArray.concatenate([path for path in paths if path is not None])
 
-    def getPolylinePath(self, element):
-        path = {'x': [], 'y': []}
 
-        points = re.split('[, ]', element.points)
+class CreateShapePaths:
 
-        for i in range(len(points)):
-            if i % 2 == 0:
-                path['x'].append(float(points[i]))
-            else:
-                path['y'].append(float(points[i]))
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
 
-        return path
+    def getRectPath(self, element):
+        x = element.x
+        y = element.y
+        rx = element.rx
+        ry = element.ry
+        width = element.width
+        height = element.height
+
+        if rx == 0 or ry == 0:
+            points = np.array([[x, y],
+                               [x + width, y],
+                               [x + width, y + height],
+                               [x, y + height],
+                               [x, y]])
+            return PathArray(points)
+
+        # Corner arcs (interior points only), clockwise starting at the
+        # top right corner. Straight sides are implied by consecutive arcs.
+        n = arcSegmentCount(max(rx, ry), np.pi/2, self.tolerance)
+        angle = np.linspace(0, np.pi/2, n + 1)[1:-1]
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+
+        points = np.empty((4*(len(angle) + 2) + 1, 2))
+        corners = ((x + width - rx, y + ry, np.pi*3/2),
+                   (x + width - rx, y + height - ry, 0),
+                   (x + rx, y + height - ry, np.pi/2),
+                   (x + rx, y + ry, np.pi))
 
-    def getPolygonPath(self, element):
-        path = {'x': [], 'y': []}
+        # perform an absolute moveto operation to location (x+rx,y)
+        points[0] = (x + rx, y)
+        index = 1
+        for cx, cy, start in corners:
+            c = np.cos(start)
+            s = np.sin(start)
+            # lineto the start of the corner arc
+            points[index] = (cx + rx*c, cy + ry*s)
+            # elliptical arc rotated by the corner start angle
+            n = len(angle)
+            points[index+1:index+1+n, 0] = cx + rx*(c*cos - s*sin)
+            points[index+1:index+1+n, 1] = cy + ry*(s*cos + c*sin)
+            # end of the corner arc
+            points[index+1+n] = (cx + rx*np.cos(start + np.pi/2),
+                                 cy + ry*np.sin(start + np.pi/2))
+            index += n + 2
+
+        return PathArray(points)
 
-        points = re.split('[, ]', element.points)
+    def getCircPath(self, element):
+        r = element.r
+        cx = element.cx
+        cy = element.cy
 
-        for i in range(len(points)):
-            if i % 2 == 0:
-                path['x'].append(float(points[i]))
-            else:
-                path['y'].append(float(points[i]))
+        n = arcSegmentCount(r, 2*np.pi, self.tolerance)
+        angle = np.linspace(0, 2*np.pi, n + 1)
+        points = np.empty((len(angle), 2))
+        points[:, 0] = cx + r*np.cos(angle)
+        points[:, 1] = cy + r*np.sin(angle)
 
-        path['x'].append(float(path[0]))
-        path['y'].append(float(path[1]))
+        return PathArray(points)
 
-        return path
+    def getEllipsePath(self, element):
+        rx = element.rx
+        ry = element.ry
+        cx = element.cx
+        cy = element.cy
+
+        # the larger radius has the largest chord error
+        n = arcSegmentCount(max(rx, ry), 2*np.pi, self.tolerance)
+        angle = np.linspace(0, 2*np.pi, n + 1)
+        points = np.empty((len(angle), 2))
+        points[:, 0] = cx + rx*np.cos(angle)
+        points[:, 1] = cy + ry*np.sin(angle)
+
+        return PathArray(points)
+
+    def getLinePath(self, element):
+        x1 = element.x1
+        x2 = element.x2
+        y1 = element.y1
+        y2 = element.y2
+
+        return PathArray(np.array([[x1, y1], [x2, y2]]))
+
+    def getPolylinePath(self, element):
+        return PathArray(element.points)
+
+    def getPolygonPath(self, element):
+        points = element.points
+
+        # close the polygon by returning to the first point
+        return PathArray(np.vstack((points, points[:1])))
 
 
 class CreatePathPaths:
 
+    def __init__(self, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+
     def getPathPath(self, element):
-        d = element.d
-        dString = d.split()
-
-        self.paths = []
-        self.path = {'x': [], 'y': []}
-        self.currentPosition = {'x': 0, 'y': 0}
-        self.startPosition = {'x': 0, 'y': 0}
-        isExecute = False
-        pathCommand_current = 'm'
-        pathCommand_next = None
-        array = []
-        parameters = []
-
-        for i in range(1, len(dString)):
-            if len(dString[i]) == 1 and dString[i] > 'a':
-                pathCommand_next = dString[i]
-                isExecute = True
-
-            if isExecute:
-                isExecute = False
-
-                self.function(pathCommand_current, parameters)
-                pathCommand_current = pathCommand_next
-                parameters = []
+        d = element.d or ''
+
+        # Coordinates are written straight into a preallocated buffer which
+        # is only grown (doubled) when curves produce more points than the
+        # initial estimate.
+        self.points = np.empty((max(16, len(d) // 4), 2))
+        self.size = 0
+        self.offsets = []
+        self.subpathStart = 0
+        self.isClosed = True
+        self.currentPosition = np.zeros(2)
+        self.startPosition = np.zeros(2)
+        self.lastControl = None
+        self.lastCommand = None
+        self.cubics = []
+        self.quadratics = []
+
+        for command, args in COMMAND_RE.findall(d):
+            self.function(command, args)
+        self.endSubpath()
+
+        self.offsets.append(self.size)
+        if self.cubics or self.quadratics:
+            return self.flattenCurves()
+
+        return PathArray(self.points[:self.size].copy(), self.offsets)
+
+    def flattenCurves(self):
+        # While parsing only the end point of every curve is written. All
+        # curves of the path are flattened here in one batch and their
+        # points are inserted in front of their end points.
+        points = self.points[:self.size]
+        extra = np.zeros(self.size, dtype=np.int64)
+        curves = []
+
+        for segments, countFunction, basis in (
+                (self.cubics, cubicSegmentCount, cubicBasis),
+                (self.quadratics, quadraticSegmentCount, quadraticBasis)):
+            if segments:
+                at = np.concatenate([index for index, P in segments])
+                P = np.concatenate([P for index, P in segments])
+                n = countFunction(P, self.tolerance)
+                extra[at] = n - 1
+                curves.append((P, n, basis, at))
+
+        # final position of every point written while parsing
+        position = np.arange(self.size) + np.cumsum(extra)
+        out = np.empty((self.size + extra.sum(), 2))
+        out[position] = points
+
+        for P, n, basis, at in curves:
+            evaluateCurves(P, n, basis, out, position[at] - n + 1)
+
+        offsets = np.append(position[self.offsets[:-1]], len(out))
+        return PathArray(out, offsets)
+
+    def reserve(self, count):
+        if self.size + count > len(self.points):
+            capacity = max(2*len(self.points), self.size + count)
+            points = np.empty((capacity, 2))
+            points[:self.size] = self.points[:self.size]
+            self.points = points
+
+    def append(self, point):
+        self.reserve(1)
+        self.points[self.size] = point
+        self.size += 1
+
+    def extend(self, points):
+        self.reserve(len(points))
+        self.points[self.size:self.size + len(points)] = points
+        self.size += len(points)
+
+    def endSubpath(self):
+        # A subpath with a single point (moveto only) draws nothing.
+        if self.isClosed:
+            return
+        if self.size - self.subpathStart > 1:
+            self.offsets.append(self.subpathStart)
+        else:
+            self.size = self.subpathStart
+        self.isClosed = True
+
+    def newSubpath(self, point):
+        self.endSubpath()
+        self.subpathStart = self.size
+        self.isClosed = False
+        self.append(point)
+
+    def function(self, pathCommand, args):
+        command = pathCommand.lower()
+        relative = pathCommand == command
+
+        if command == 'z':
+            if not self.isClosed:
+                if np.any(self.points[self.size - 1] != self.startPosition):
+                    self.append(self.startPosition)
+                self.endSubpath()
+            self.currentPosition = self.startPosition.copy()
+            self.lastCommand = command
+            return
+
+        if command == 'a':
+            values = np.array(ARC_RE.findall(args), dtype=np.float64).ravel()
+        else:
+            values = np.array(NUMBER_RE.findall(args), dtype=np.float64)
+        count = PARAMETER_COUNT[command]
+        values = values[:len(values) // count * count].reshape(-1, count)
+        if not len(values):
+            return
+
+        if command == 'm':
+            point = values[0].copy()
+            if relative:
+                point += self.currentPosition
+            self.newSubpath(point)
+            self.currentPosition = point
+            self.startPosition = point.copy()
+
+            # additional coordinate pairs are implicit lineto commands
+            if len(values) > 1:
+                self.lineTo(values[1:], relative)
+            self.lastCommand = command
+            return
+
+        if self.isClosed:
+            self.newSubpath(self.currentPosition.copy())
+
+        if command == 'l':
+            self.lineTo(values, relative)
+
+        if command == 'h':
+            x = values[:, 0]
+            if relative:
+                x = self.currentPosition[0] + np.cumsum(x)
+            self.lineTo(np.column_stack(
+                (x, np.full(len(x), self.currentPosition[1]))), False)
+
+        if command == 'v':
+            y = values[:, 0]
+            if relative:
+                y = self.currentPosition[1] + np.cumsum(y)
+            self.lineTo(np.column_stack(
+                (np.full(len(y), self.currentPosition[0]), y)), False)
+
+        if command == 'c':
+            P0, P3 = self.segmentEnds(values[:, 4:6], relative)
+            P1 = values[:, 0:2] + P0 if relative else values[:, 0:2]
+            P2 = values[:, 2:4] + P0 if relative else values[:, 2:4]
+            self.cubic(np.stack((P0, P1, P2, P3), axis=1))
+            self.lastControl = P2[-1]
+
+        if command == 's':
+            # first control point is the reflection of the previous
+            # segment's second control point
+            P0, P3 = self.segmentEnds(values[:, 2:4], relative)
+            P2 = values[:, 0:2] + P0 if relative else values[:, 0:2]
+            previous = np.empty_like(P2)
+            previous[1:] = P2[:-1]
+            if self.lastCommand in ('c', 's'):
+                previous[0] = self.lastControl
+            else:
+                previous[0] = P0[0]
+            P1 = 2*P0 - previous
+            self.cubic(np.stack((P0, P1, P2, P3), axis=1))
+            self.lastControl = P2[-1]
+
+        if command == 'q':
+            P0, P2 = self.segmentEnds(values[:, 2:4], relative)
+            P1 = values[:, 0:2] + P0 if relative else values[:, 0:2]
+            self.quadratic(np.stack((P0, P1, P2), axis=1))
+            self.lastControl = P1[-1]
+
+        if command == 't':
+            # control point is the reflection of the previous one, so every
+            # segment depends on the one before it
+            P0, P2 = self.segmentEnds(values, relative)
+            P1 = np.empty_like(P0)
+            if self.lastCommand in ('q', 't'):
+                control = self.lastControl
             else:
-                array = dString[i].split(',')
-
-                for j in range(len(array)):
-                    array[j] = float(array[j])
-
-                parameters.append(array)
-
-        self.function(pathCommand_current, parameters)
-        self.paths.append(self.path)
-
-        return self.paths
-
-    def function(self, pathCommand, param):
-        if pathCommand == 'm':
-            if len(self.path['x']):
-                self.paths.append(self.path)
-            
-            self.path = {'x': [], 'y': []}
-            for x, y in param:
-                self.currentPosition['x'] += x
-                self.currentPosition['y'] += y
-                self.startPosition['x'] = self.currentPosition['x']
-                self.startPosition['y'] = self.currentPosition['y']
-            self.path['x'].append(self.currentPosition['x'])
-            self.path['y'].append(self.currentPosition['y'])
-
-        if pathCommand == 'z':
-            self.currentPosition['x'] = self.startPosition['x']
-            self.currentPosition['y'] = self.startPosition['y']
-            self.path['x'].append(self.startPosition['x'])
-            self.path['y'].append(self.startPosition['y'])
-
-        if pathCommand == 'l':
-            for x, y in param:
-                self.currentPosition['x'] += x
-                self.currentPosition['y'] += y
-                self.path['x'].append(self.currentPosition['x'])
-                self.path['y'].append(self.currentPosition['y'])
-
-        if pathCommand == 'h':
-            for x in param:
-                self.currentPosition['x'] += x[0]
-            self.path['x'].append(self.currentPosition['x'])
-            self.path['y'].append(self.currentPosition['y'])
-
-        if pathCommand == 'v':
-            for y in param:
-                self.currentPosition['y'] += y[0]
-            self.path['x'].append(self.currentPosition['x'])
-            self.path['y'].append(self.currentPosition['y'])
-
-        if pathCommand == 'c':
-            # Cubic curve:
-            # B(t) = (1-t)^3 * P0 + 3(1-t)^2 * t * P1 + 3(1-t) * t^2 * P2 + t^3 * P3
-
-            counter = 1
-            P0 = [self.currentPosition['x'], self.currentPosition['y']]
-            for x, y in param:
-                if counter % 3 == 1:
-                    P1 = [P0[0] + x, P0[1] + y]
-                if counter % 3 == 2:
-                    P2 = [P0[0] + x, P0[1] + y]
-                if counter % 3 == 0:
-                    P3 = [P0[0] + x, P0[1] + y]
-
-                if counter == 3:
-                    t = np.linspace(0, 1, 11)
-
-                    B_x = (1-t)**3 * P0[0] + 3*(1-t)**2 * t * \
-                        P1[0] + 3*(1-t)*t ** 2*P2[0] + t**3 * P3[0]
-                    B_y = (1-t)**3 * P0[1] + 3*(1-t)**2 * t * \
-                        P1[1] + 3*(1-t)*t ** 2*P2[1] + t**3 * P3[1]
-
-                    self.path['x'].extend(B_x.tolist())
-                    self.path['y'].extend(B_y.tolist())
-
-                    P0 = P3
-                    counter = 0
-
-                counter += 1
-
-            self.currentPosition['x'] = P0[0]
-            self.currentPosition['y'] = P0[1]
-
-        if pathCommand == 'q':
-            # Quadratic curve:
-            # B(t) = (1-t)^2 * P0 + 2(1-t) * t * P1 + t^2 * P2
-
-            counter = 1
-            P0 = [self.currentPosition['x'], self.currentPosition['y']]
-            for x, y in param:
-                if counter % 2 == 1:
-                    P1 = [P0[0] + x, P0[1] + y]
-                if counter % 2 == 0:
-                    P2 = [P0[0] + x, P0[1] + y]
-
-                if counter == 2:
-                    t = np.linspace(0, 1, 11)
-
-                    B_x = (1-t)**2 * P0[0] + 2*(1-t)*t*P1[0] + t**2 * P2[0]
-                    B_y = (1-t)**2 * P0[1] + 2*(1-t)*t*P1[1] + t**2 * P2[1]
-
-                    self.path['x'].extend(B_x.tolist())
-                    self.path['y'].extend(B_y.tolist())
-
-                    P0 = P2
-                    counter = 0
-
-                counter += 1
-
-            self.currentPosition['x'] = P0[0]
-            self.currentPosition['y'] = P0[1]
+                control = P0[0]
+            for i in range(len(P0)):
+                control = 2*P0[i] - control
+                P1[i] = control
+            self.quadratic(np.stack((P0, P1, P2), axis=1))
+            self.lastControl = P1[-1]
+
+        if command == 'a':
+            for rx, ry, phi, largeArc, sweep, x, y in values:
+                end = np.array((x, y))
+                if relative:
+                    end += self.currentPosition
+                if rx == 0 or ry == 0:
+                    self.lineTo(end.reshape(1, 2), False)
+                    continue
+
+                curves = arcToCubics(self.currentPosition, rx, ry, phi,
+                                     largeArc, sweep, end)
+                if len(curves):
+                    self.cubic(curves)
+                self.currentPosition = end
+
+        self.lastCommand = command
+
+    def lineTo(self, points, relative):
+        if relative:
+            points = self.currentPosition + np.cumsum(points, axis=0)
+        self.extend(points)
+        self.currentPosition = points[-1].copy()
+
+    def segmentEnds(self, ends, relative):
+        # Start and end point of every segment in a run of curve segments.
+        if relative:
+            ends = self.currentPosition + np.cumsum(ends, axis=0)
+        starts = np.empty_like(ends)
+        starts[0] = self.currentPosition
+        starts[1:] = ends[:-1]
+        self.currentPosition = ends[-1].copy()
+
+        return starts, ends
+
+    def cubic(self, P):
+        # Cubic curve:
+        # B(t) = (1-t)^3 * P0 + 3(1-t)^2 * t * P1 + 3(1-t) * t^2 * P2 + t^3 * P3
+        self.cubics.append((np.arange(self.size, self.size + len(P)), P))
+        self.extend(P[:, 3])
+
+    def quadratic(self, P):
+        # Quadratic curve:
+        # B(t) = (1-t)^2 * P0 + 2(1-t) * t * P1 + t^2 * P2
+        self.quadratics.append((np.arange(self.size, self.size + len(P)), P))
+        self.extend(P[:, 2])
+
+
+def arcToCubics(P0, rx, ry, phi, largeArc, sweep, P1):
+    # Convert an SVG elliptical arc (endpoint parameterization) to cubic
+    # Bezier segments of at most 90 degrees each, see SVG 1.1 F.6.5.
+    if np.all(P0 == P1):
+        return np.empty((0, 4, 2))
+
+    rx = abs(rx)
+    ry = abs(ry)
+    phi = np.radians(phi % 360)
+    cos = np.cos(phi)
+    sin = np.sin(phi)
+
+    dx, dy = (P0 - P1) / 2
+    x1 = cos*dx + sin*dy
+    y1 = -sin*dx + cos*dy
+
+    # scale up radii which are too small to reach the end point
+    scale = x1**2 / rx**2 + y1**2 / ry**2
+    if scale > 1:
+        rx *= np.sqrt(scale)
+        ry *= np.sqrt(scale)
+
+    numerator = rx**2 * ry**2 - rx**2 * y1**2 - ry**2 * x1**2
+    denominator = rx**2 * y1**2 + ry**2 * x1**2
+    coefficient = np.sqrt(max(numerator, 0) / denominator)
+    if bool(largeArc) == bool(sweep):
+        coefficient = -coefficient
+    cx1 = coefficient * rx * y1 / ry
+    cy1 = -coefficient * ry * x1 / rx
+
+    cx = cos*cx1 - sin*cy1 + (P0[0] + P1[0]) / 2
+    cy = sin*cx1 + cos*cy1 + (P0[1] + P1[1]) / 2
+
+    theta = np.arctan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    dtheta = np.arctan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - theta
+    if sweep and dtheta < 0:
+        dtheta += 2*np.pi
+    if not sweep and dtheta > 0:
+        dtheta -= 2*np.pi
+
+    n = max(int(np.ceil(abs(dtheta) / (np.pi/2) - 1e-9)), 1)
+    delta = dtheta / n
+    k = 4/3 * np.tan(delta/4)
+    a0 = theta + delta*np.arange(n)
+    a1 = a0 + delta
+
+    # control points on the unit circle
+    u = np.empty((n, 4, 2))
+    u[:, 0] = np.column_stack((np.cos(a0), np.sin(a0)))
+    u[:, 3] = np.column_stack((np.cos(a1), np.sin(a1)))
+    u[:, 1] = u[:, 0] + k*np.column_stack((-np.sin(a0), np.cos(a0)))
+    u[:, 2] = u[:, 3] - k*np.column_stack((-np.sin(a1), np.cos(a1)))
+
+    # scale, rotate and translate to the ellipse
+    x = rx*u[..., 0]
+    y = ry*u[..., 1]
+    P = np.empty_like(u)
+    P[..., 0] = cos*x - sin*y + cx
+    P[..., 1] = sin*x + cos*y + cy
+    P[0, 0] = P0
+    P[-1, 3] = P1
+
+    return P
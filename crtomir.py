@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+# Headless command line interface. Does not import PyQt5.
+#
+# Usage: python -m crtomir convert drawings/*.svg -o out/ -j 4
+#        python -m crtomir send drawing.svg --port /dev/ttyUSB0
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import sys
+import time
+
+from gcode import exportGcode, gcodeLines
+from jobCache import JobCache
+from motion import Timeline, formatDuration
+from pipeline import processPaths, formatReport
+from sender import Sender, SerialPort
+from settings import Settings
+from svgLoader import SvgLoader
+
+
+def loadJob(filename, settings):
+    # Processed paths of an SVG file, from the job cache if possible.
+    # Returns (document, paths, report, cached).
+    job = None
+    if settings.useJobCache:
+        cache = JobCache(settings.jobCacheDir, settings.jobCacheSize)
+        key = cache.key(filename, settings)
+        job = cache.load(key)
+
+    if job is not None:
+        document, paths, report = job
+        return document, paths, report, True
+
+    document = SvgLoader(settings.tolerance,
+                         workers=settings.flattenWorkers).load(filename)
+    paths = document.getPaths(range(len(document)))
+    report = {}
+    paths = processPaths(paths, settings, report)
+    if settings.useJobCache:
+        cache.save(key, document, paths, report)
+
+    return document, paths, report, False
+
+
+def outputFiles(files, outputDir):
+    # G-code file of every SVG file. Files from different directories keep
+    # their path below the directory they all are in, so files with the
+    # same name do not overwrite each other.
+    directories = [os.path.dirname(os.path.abspath(filename))
+                   for filename in files]
+    try:
+        common = os.path.commonpath(directories)
+    except ValueError:
+        # on different drives
+        common = None
+
+    outputs = []
+    for filename, directory in zip(files, directories):
+        name = os.path.splitext(os.path.basename(filename))[0] + '.gcode'
+        if common is not None:
+            name = os.path.join(os.path.relpath(directory, common), name)
+        outputs.append(os.path.normpath(os.path.join(outputDir, name)))
+
+    return outputs
+
+
+def convertFile(filename, output, settings):
+    # Convert one SVG file to G-code. Returns statistics for the summary.
+    start = time.perf_counter()
+    document, paths, report, cached = loadJob(filename, settings)
+    loadTime = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    result = exportGcode(paths, output, settings)
+
+    return {'file': filename,
+            'output': output,
+            'elements': len(document),
+            'paths': len(paths),
+            'points': paths.pointCount(),
+            'lines': result.lineCount,
+            'plotTime': Timeline(paths, settings).totalTime(),
+            'cached': cached,
+            'loadTime': loadTime,
+            'time': time.perf_counter() - start,
+            'report': formatReport(report)}
+
+
+def printResult(result):
+    print('%s -> %s: %d elements, %d paths, %d points, %d lines, '
+          'plot time %s, load %.2f s%s, total %.2f s%s' %
+          (result['file'], result['output'], result['elements'],
+           result['paths'], result['points'], result['lines'],
+           formatDuration(result['plotTime']),
+           result['loadTime'], ' (cached)' if result['cached'] else '',
+           result['time'],
+           ' (' + result['report'] + ')' if result['report'] else ''))
+
+
+def convert(args):
+    settings = Settings()
+    settings.tolerance = args.tolerance
+    settings.workArea = tuple(args.work_area)
+    settings.clipToWorkArea = not args.no_clip
+    settings.fitToPage = args.fit
+    settings.overlapTolerance = args.overlap
+    settings.joinTolerance = args.join
+    settings.simplifyTolerance = args.simplify
+    settings.orderPaths = not args.no_order
+    settings.twoOptTime = args.two_opt
+    settings.feedRate = args.feed_rate
+    settings.useJobCache = not args.no_cache
+    settings.jobCacheDir = args.cache_dir
+    # with several files in parallel every file is flattened in its own
+    # worker process, a single process uses all cores for the elements
+    settings.flattenWorkers = 0 if args.jobs == 1 else 1
+
+    # patterns are expanded here as well because not every shell does it,
+    # files matched by several patterns are converted once
+    files = []
+    seen = set()
+    for pattern in args.files:
+        for filename in sorted(glob.glob(pattern)) or [pattern]:
+            path = os.path.normcase(os.path.abspath(filename))
+            if path not in seen:
+                seen.add(path)
+                files.append(filename)
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    failed = 0
+
+    # a file whose G-code would overwrite that of an earlier one fails
+    outputs = {}
+    for filename, output in zip(files, outputFiles(files, args.output)):
+        other = outputs.setdefault(os.path.normcase(output),
+                                   (filename, output))[0]
+        if other != filename:
+            failed += 1
+            print('%s: error: %s is the output of %s' %
+                  (filename, output, other), file=sys.stderr)
+    outputs = list(outputs.values())
+
+    if args.jobs == 1:
+        for filename, output in outputs:
+            try:
+                printResult(convertFile(filename, output, settings))
+            except Exception as error:
+                failed += 1
+                print('%s: error: %s' % (filename, error), file=sys.stderr)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(args.jobs) as executor:
+            futures = {executor.submit(convertFile, filename, output,
+                                       settings): filename
+                       for filename, output in outputs}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    printResult(future.result())
+                except Exception as error:
+                    failed += 1
+                    print('%s: error: %s' % (futures[future], error),
+                          file=sys.stderr)
+
+    print('%d files converted, %d failed in %.2f s' %
+          (len(files) - failed, failed, time.perf_counter() - start))
+
+    return 1 if failed else 0
+
+
+def fileLines(filename):
+    # Lines of a G-code file without comments and empty lines. The drawn
+    # segments are not known, the line number is used instead.
+    count = 0
+    with open(filename) as file:
+        for line in file:
+            line = line.split(';', 1)[0].strip()
+            if line:
+                count += 1
+                yield line, count
+
+
+def send(args):
+    settings = Settings()
+    settings.tolerance = args.tolerance
+    settings.feedRate = args.feed_rate
+    settings.useJobCache = not args.no_cache
+    settings.flattenWorkers = 0
+
+    if args.file.lower().endswith('.svg'):
+        _, paths, _, _ = loadJob(args.file, settings)
+        lines = gcodeLines(paths, settings, args.start)
+        total = len(paths.segments())
+    else:
+        lines = fileLines(args.file)
+        total = sum(1 for _ in fileLines(args.file))
+
+    emulator = None
+    port = args.port
+    if args.emulate:
+        from controllerEmulator import ControllerEmulator
+        emulator = ControllerEmulator(args.buffer_size,
+                                      baudrate=args.baudrate,
+                                      rapidRate=settings.travelRate,
+                                      timeScale=args.emulate)
+        emulator.start()
+        port = emulator.name
+    elif not port:
+        print('error: --port or --emulate is needed', file=sys.stderr)
+        return 2
+
+    sender = Sender(SerialPort(port, args.baudrate), lines, args.buffer_size,
+                    1 if args.send_and_wait else None)
+    sender.start()
+    try:
+        while sender.isRunning():
+            sender.wait(args.interval)
+            statistics = sender.statistics()
+            print('%-9s %d/%d segments, %d lines, %.0f lines/s, '
+                  '%.0f B/s, buffer %d/%d B, %d errors' %
+                  (statistics['state'], statistics['segmentCount'], total,
+                   statistics['linesAcked'], statistics['lineRate'],
+                   statistics['byteRate'], statistics['bufferFill'],
+                   statistics['bufferSize'], statistics['errors']))
+    except KeyboardInterrupt:
+        sender.stop()
+        sender.wait()
+
+    statistics = sender.statistics()
+    print('%s after %.2f s%s' % (
+        statistics['state'], statistics['elapsed'],
+        ': ' + statistics['error'] if statistics['error'] else ''))
+    if emulator is not None:
+        emulatorStatistics = emulator.statistics()
+        print('emulator: %d overflows, %d B max receive buffer, '
+              'planner starved %.2f s' %
+              (emulatorStatistics['overflows'], emulatorStatistics['maxRx'],
+               emulatorStatistics['starvedTime']))
+        emulator.close()
+    sender.port.close()
+
+    return 0 if statistics['state'] == 'done' else 1
+
+
+def positiveInt(value):
+    # argparse type of counts which must be at least 1.
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('%s is not a positive number' %
+                                         value)
+
+    return number
+
+
+def main(argv=None):
+    settings = Settings()
+    parser = argparse.ArgumentParser(
+        prog='crtomir', description='Črtomir plotter command line tools.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_convert = commands.add_parser(
+        'convert', help='convert SVG files to G-code')
+    parser_convert.add_argument('files', nargs='+', help='SVG files')
+    parser_convert.add_argument('-o', '--output', default='.',
+                                help='output directory')
+    parser_convert.add_argument('-j', '--jobs', type=positiveInt,
+                                default=os.cpu_count(),
+                                help='number of worker processes')
+    parser_convert.add_argument('--tolerance', type=float,
+                                default=settings.tolerance,
+                                help='curve flattening tolerance in mm')
+    parser_convert.add_argument('--work-area', type=float, nargs=4,
+                                default=settings.workArea,
+                                metavar=('X', 'Y', 'WIDTH', 'HEIGHT'),
+                                help='work area of the machine in mm')
+    parser_convert.add_argument('--no-clip', action='store_true',
+                                help='do not clip to the work area')
+    parser_convert.add_argument('--fit', action='store_true',
+                                help='scale the drawing to fill the work '
+                                     'area')
+    parser_convert.add_argument('--overlap', type=float,
+                                default=settings.overlapTolerance,
+                                help='remove segments drawn again within '
+                                     'this distance in mm (0 = off)')
+    parser_convert.add_argument('--join', type=float,
+                                default=settings.joinTolerance,
+                                help='join subpaths whose ends are closer '
+                                     'than this in mm (0 = off)')
+    parser_convert.add_argument('--simplify', type=float,
+                                default=settings.simplifyTolerance,
+                                help='simplification tolerance in mm '
+                                     '(0 = off)')
+    parser_convert.add_argument('--no-order', action='store_true',
+                                help='keep the document path order')
+    parser_convert.add_argument('--two-opt', type=float,
+                                default=settings.twoOptTime,
+                                help='2-opt time budget per file in seconds')
+    parser_convert.add_argument('--feed-rate', type=float,
+                                default=settings.feedRate,
+                                help='drawing feed rate in mm/min')
+    parser_convert.add_argument('--cache-dir', default=settings.jobCacheDir,
+                                help='compiled job cache directory')
+    parser_convert.add_argument('--no-cache', action='store_true',
+                                help='do not use the compiled job cache')
+    parser_convert.set_defaults(function=convert)
+
+    parser_send = commands.add_parser(
+        'send', help='stream an SVG or G-code file to the controller')
+    parser_send.add_argument('file', help='SVG or G-code file')
+    parser_send.add_argument('-p', '--port', default=settings.port,
+                             help='serial port, e.g. /dev/ttyUSB0 or COM3')
+    parser_send.add_argument('-b', '--baudrate', type=int,
+                             default=settings.baudrate)
+    parser_send.add_argument('--buffer-size', type=int,
+                             default=settings.rxBufferSize,
+                             help='receive buffer of the controller in bytes')
+    parser_send.add_argument('--send-and-wait', action='store_true',
+                             help='wait for every line to be acknowledged')
+    parser_send.add_argument('--start', type=int, default=0,
+                             help='drawn segments to skip (SVG files)')
+    parser_send.add_argument('--emulate', type=float, metavar='TIME_SCALE',
+                             help='stream to an emulated controller (POSIX) '
+                                  'whose moves take TIME_SCALE times as '
+                                  'long')
+    parser_send.add_argument('--interval', type=float, default=1.0,
+                             help='seconds between progress reports')
+    parser_send.add_argument('--tolerance', type=float,
+                             default=settings.tolerance,
+                             help='curve flattening tolerance in mm')
+    parser_send.add_argument('--feed-rate', type=float,
+                             default=settings.feedRate,
+                             help='drawing feed rate in mm/min')
+    parser_send.add_argument('--no-cache', action='store_true',
+                             help='do not use the compiled job cache')
+    parser_send.set_defaults(function=send)
+
+    args = parser.parse_args(argv)
+
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
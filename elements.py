@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import math
+import re
+
+import numpy as np
+
+from createPaths import NUMBER_RE
+
+# Size of absolute length units in mm. Numbers without a unit are px.
+UNITS = {'': 25.4 / 96, 'px': 25.4 / 96, 'pt': 25.4 / 72, 'pc': 25.4 / 6,
+         'in': 25.4, 'cm': 10.0, 'mm': 1.0, 'q': 0.25}
+TRANSFORM_RE = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)'
+                          r'\s*\(([^)]*)\)')
+
+
+def parseLength(value, default=0.0):
+    # Numeric part of an SVG length attribute such as '10', '2.5mm' or
+    # '1e-3'. Units are ignored.
+    if value is None:
+        return default
+    match = NUMBER_RE.match(value.strip())
+    if not match:
+        return default
+
+    return float(match.group())
+
+
+def parseSize(value):
+    # Absolute length in mm, None if it is missing, relative (%, em, ...)
+    # or not a number.
+    if value is None:
+        return None
+    value = value.strip()
+    match = NUMBER_RE.match(value)
+    if not match:
+        return None
+    unit = value[match.end():].strip().lower()
+    if unit not in UNITS:
+        return None
+
+    return float(match.group()) * UNITS[unit]
+
+
+def parseTransform(value):
+    # Transform attribute as a 3x3 matrix, None for no (or an invalid)
+    # transform. Transforms in the list are applied right to left, like
+    # nested groups.
+    if not value:
+        return None
+
+    matrix = np.eye(3)
+    count = 0
+    for name, arguments in TRANSFORM_RE.findall(value):
+        a = [float(number) for number in NUMBER_RE.findall(arguments)]
+        step = np.eye(3)
+        if name == 'matrix' and len(a) == 6:
+            step[:2] = [[a[0], a[2], a[4]], [a[1], a[3], a[5]]]
+        elif name == 'translate' and len(a) in (1, 2):
+            step[:2, 2] = a if len(a) == 2 else (a[0], 0)
+        elif name == 'scale' and len(a) in (1, 2):
+            step[0, 0] = a[0]
+            step[1, 1] = a[-1]
+        elif name == 'rotate' and len(a) in (1, 3):
+            angle = math.radians(a[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step[:2, :2] = [[cos, -sin], [sin, cos]]
+            if len(a) == 3:
+                # rotation about (cx, cy)
+                cx, cy = a[1:]
+                step[:2, 2] = (cx - cos * cx + sin * cy,
+                               cy - sin * cx - cos * cy)
+        elif name == 'skewX' and len(a) == 1:
+            step[0, 1] = math.tan(math.radians(a[0]))
+        elif name == 'skewY' and len(a) == 1:
+            step[1, 0] = math.tan(math.radians(a[0]))
+        else:
+            continue
+        matrix = matrix @ step
+        count += 1
+
+    return matrix if count else None
+
+
+def parsePoints(value):
+    # Points attribute of polyline and polygon as an (N, 2) array.
+    if not value:
+        return np.empty((0, 2))
+    points = np.array(NUMBER_RE.findall(value), dtype=np.float64)
+
+    return points[:len(points) // 2 * 2].reshape(-1, 2)
+
+
+class Element:
+    # Base record for SVG elements. Attributes are converted once, when the
+    # document is loaded. Unknown tags get a plain Element. transform is
+    # the element's own transform, SvgDocument composes it with the
+    # transforms of the parents. digest is the hash of geometry(), kept by
+    # GeometryCache.key once it is known.
+    __slots__ = ('classType', 'id', 'style', 'transform', 'digest')
+    lengths = ()
+
+    def __init__(self, attributes, classType):
+        self.classType = classType
+        self.id = attributes.get('id')
+        self.style = attributes.get('style')
+        self.transform = parseTransform(attributes.get('transform'))
+        self.digest = None
+
+        for name in self.lengths:
+            setattr(self, name, parseLength(attributes.get(name)))
+
+    def geometry(self):
+        # Values of all attributes which define the shape of the element in
+        # its own coordinates, i.e. everything but the id, style and
+        # transform.
+        return tuple(getattr(self, name)
+                     for cls in reversed(type(self).__mro__[:-2])
+                     for name in cls.__slots__)
+
+
+class Svg(Element):
+    # Root element. width and height are in mm, None if they are missing
+    # or relative.
+    __slots__ = ('width', 'height', 'viewBox', 'preserveAspectRatio')
+
+    def __init__(self, attributes, classType):
+        super().__init__(attributes, classType)
+        self.width = parseSize(attributes.get('width'))
+        self.height = parseSize(attributes.get('height'))
+        viewBox = [float(number) for number in
+                   NUMBER_RE.findall(attributes.get('viewBox', ''))]
+        self.viewBox = viewBox if len(viewBox) == 4 and \
+            viewBox[2] > 0 and viewBox[3] > 0 else None
+        self.preserveAspectRatio = attributes.get(
+            'preserveAspectRatio', 'xMidYMid meet').split()
+
+    def pageTransform(self):
+        # (matrix, page size) mapping user units to mm on the page. Without
+        # a size in absolute units, the viewBox is taken in mm. Without a
+        # viewBox user units are px, or mm if the size is not given either.
+        # The page size is None if it is not known.
+        width, height = self.width, self.height
+        if self.viewBox is None:
+            matrix = np.eye(3)
+            if width is not None and height is not None:
+                matrix[0, 0] = matrix[1, 1] = UNITS['px']
+                return matrix, (width, height)
+            return matrix, None
+
+        x, y, boxWidth, boxHeight = self.viewBox
+        if width is None or height is None:
+            width, height = boxWidth, boxHeight
+        sx = width / boxWidth
+        sy = height / boxHeight
+        tx = ty = 0.0
+        align = self.preserveAspectRatio[0] if self.preserveAspectRatio \
+            else 'xMidYMid'
+        if align != 'none':
+            isSlice = self.preserveAspectRatio[-1:] == ['slice']
+            sx = sy = max(sx, sy) if isSlice else min(sx, sy)
+            # free space is distributed by the alignment
+            if 'xMid' in align:
+                tx = (width - boxWidth * sx) / 2
+            elif 'xMax' in align:
+                tx = width - boxWidth * sx
+            if 'YMid' in align:
+                ty = (height - boxHeight * sy) / 2
+            elif 'YMax' in align:
+                ty = height - boxHeight * sy
+
+        matrix = np.array([[sx, 0, tx - x * sx],
+                           [0, sy, ty - y * sy],
+                           [0, 0, 1]])
+        return matrix, (width, height)
+
+
+class G(Element):
+    __slots__ = ()
+
+
+class Rect(Element):
+    __slots__ = ('x', 'y', 'width', 'height', 'rx', 'ry')
+    lengths = ('x', 'y', 'width', 'height')
+
+    def __init__(self, attributes, classType):
+        super().__init__(attributes, classType)
+        rx = parseLength(attributes.get('rx'), None)
+        ry = parseLength(attributes.get('ry'), None)
+
+        # a missing radius takes the value of the other one
+        if rx is None:
+            rx = ry
+        if ry is None:
+            ry = rx
+
+        self.rx = min(rx or 0.0, self.width / 2)
+        self.ry = min(ry or 0.0, self.height / 2)
+
+
+class Circle(Element):
+    __slots__ = ('cx', 'cy', 'r')
+    lengths = __slots__
+
+
+class Ellipse(Element):
+    __slots__ = ('cx', 'cy', 'rx', 'ry')
+    lengths = __slots__
+
+
+class Line(Element):
+    __slots__ = ('x1', 'x2', 'y1', 'y2')
+    lengths = __slots__
+
+
+class Polyline(Element):
+    __slots__ = ('points',)
+
+    def __init__(self, attributes, classType):
+        super().__init__(attributes, classType)
+        self.points = parsePoints(attributes.get('points'))
+
+
+class Polygon(Polyline):
+    __slots__ = ()
+
+
+class Path(Element):
+    __slots__ = ('d',)
+
+    def __init__(self, attributes, classType):
+        super().__init__(attributes, classType)
+        self.d = attributes.get('d', '')
+
+
+# Tag (without namespace) to element class.
+ELEMENT_CLASSES = {
+    'svg': Svg,
+    'g': G,
+    'rect': Rect,
+    'circle': Circle,
+    'ellipse': Ellipse,
+    'line': Line,
+    'polyline': Polyline,
+    'polygon': Polygon,
+    'path': Path,
+}
+
+
+def createElement(classType, attributes):
+    return ELEMENT_CLASSES.get(classType, Element)(attributes, classType)
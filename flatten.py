@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+from functools import lru_cache
+
+import numpy as np
+
+# Default maximum distance (chord error) between a curve and the polyline
+# which replaces it, in mm.
+DEFAULT_TOLERANCE = 0.05
+MIN_TOLERANCE = 1e-4
+MAX_SEGMENTS = 4096
+
+
+def cubicSegmentCount(P, tolerance):
+    # Number of line segments needed to flatten cubic Bezier curves P of
+    # shape (N, 4, 2) within tolerance (Wang's formula):
+    # n = sqrt(3/4 * max|P0 - 2P1 + P2|, |P1 - 2P2 + P3| / tolerance)
+    tolerance = max(tolerance, MIN_TOLERANCE)
+    d1 = np.hypot(*(P[:, 0] - 2*P[:, 1] + P[:, 2]).T)
+    d2 = np.hypot(*(P[:, 1] - 2*P[:, 2] + P[:, 3]).T)
+    n = np.ceil(np.sqrt(0.75 * np.maximum(d1, d2) / tolerance))
+
+    return np.clip(n, 1, MAX_SEGMENTS).astype(np.int64)
+
+
+def quadraticSegmentCount(P, tolerance):
+    # Same as cubicSegmentCount for quadratic curves of shape (N, 3, 2):
+    # n = sqrt(1/4 * |P0 - 2P1 + P2| / tolerance)
+    tolerance = max(tolerance, MIN_TOLERANCE)
+    d = np.hypot(*(P[:, 0] - 2*P[:, 1] + P[:, 2]).T)
+    n = np.ceil(np.sqrt(0.25 * d / tolerance))
+
+    return np.clip(n, 1, MAX_SEGMENTS).astype(np.int64)
+
+
+def arcSegmentCount(radius, angle, tolerance):
+    # Number of chords needed for a circular arc of given radius and
+    # angle (in radians) so that the sagitta of each chord,
+    # r * (1 - cos(step / 2)), stays within tolerance.
+    tolerance = max(tolerance, MIN_TOLERANCE)
+    if radius <= tolerance:
+        step = np.pi
+    else:
+        step = 2*np.arccos(1 - tolerance/radius)
+    n = np.ceil(abs(angle) / step)
+
+    # at least one chord per quarter turn
+    minimum = max(np.ceil(abs(angle) / (np.pi/2) - 1e-9), 1)
+
+    return int(np.clip(n, minimum, MAX_SEGMENTS))
+
+
+def flattenCubic(P, n):
+    # Points of a single cubic curve P (4, 2) at t = 1/n ... 1. The start
+    # point is left out because it already ends the previous segment.
+    # B(t) = (1-t)^3 * P0 + 3(1-t)^2 * t * P1 + 3(1-t) * t^2 * P2 + t^3 * P3
+    t = np.linspace(0, 1, n + 1)[1:].reshape(-1, 1)
+
+    return (1-t)**3 * P[0] + 3*(1-t)**2 * t * P[1] + \
+        3*(1-t)*t**2 * P[2] + t**3 * P[3]
+
+
+def flattenQuadratic(P, n):
+    # Points of a single quadratic curve P (3, 2) at t = 1/n ... 1.
+    # B(t) = (1-t)^2 * P0 + 2(1-t) * t * P1 + t^2 * P2
+    t = np.linspace(0, 1, n + 1)[1:].reshape(-1, 1)
+
+    return (1-t)**2 * P[0] + 2*(1-t)*t * P[1] + t**2 * P[2]
+
+
+@lru_cache(maxsize=256)
+def cubicBasis(n):
+    # Bernstein basis of degree 3 at t = 1/n ... 1, shape (n, 4). Terms are
+    # computed exactly like in flattenCubic so both give identical points.
+    t = np.linspace(0, 1, n + 1)[1:].reshape(-1, 1)
+    basis = np.hstack(((1-t)**3, 3*(1-t)**2 * t, 3*(1-t)*t**2, t**3))
+    basis.setflags(write=False)
+
+    return basis
+
+
+@lru_cache(maxsize=256)
+def quadraticBasis(n):
+    t = np.linspace(0, 1, n + 1)[1:].reshape(-1, 1)
+    basis = np.hstack(((1-t)**2, 2*(1-t)*t, t**2))
+    basis.setflags(write=False)
+
+    return basis
+
+
+def evaluateCurves(P, n, basis, out, start):
+    # Flatten all curves P of shape (N, degree + 1, 2) at once. Curve i is
+    # sampled at n[i] points which are written to out[start[i]:start[i]+n[i]].
+    # Curves are grouped by point count so every group is a single
+    # broadcasted multiply against its basis matrix.
+    for count in np.unique(n):
+        select = np.flatnonzero(n == count)
+        B = basis(int(count))
+        curves = P[select]
+
+        samples = B[:, 0, None] * curves[:, None, 0]
+        for i in range(1, B.shape[1]):
+            samples = samples + B[:, i, None] * curves[:, None, i]
+
+        out[start[select, None] + np.arange(count)] = samples
+
+
+def flattenCubics(P, n):
+    # Batched flattenCubic: points of all curves P (N, 4, 2), one after the
+    # other, without their start points.
+    n = np.asarray(n)
+    out = np.empty((n.sum(), 2))
+    evaluateCurves(P, n, cubicBasis, out, np.cumsum(n) - n)
+
+    return out
+
+
+def flattenQuadratics(P, n):
+    n = np.asarray(n)
+    out = np.empty((n.sum(), 2))
+    evaluateCurves(P, n, quadraticBasis, out, np.cumsum(n) - n)
+
+    return out
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+# Number of G-code lines collected before they are written out.
+CHUNK_LINES = 4096
+
+
+class GcodeGenerator:
+    # Turns flattened paths into G-code lines. Coordinates are rounded to a
+    # fixed number of decimals once; axis words, G0/G1 and F words are only
+    # written when their value differs from the modal state of the machine.
+    def __init__(self, settings, trackSegments=False):
+        self.settings = settings
+        self.precision = settings.precision
+        self.scale = 10**self.precision
+        self.format = '%.' + str(self.precision) + 'f'
+
+        self.x = None
+        self.y = None
+        self.motion = None
+        self.feedRate = None
+        self.isPenDown = None
+
+        self.drawLength = 0
+        self.travelLength = 0
+        self.lineCount = 0
+        # drawn segments of the paths which are done after the last line,
+        # updated for every line if trackSegments is set
+        self.trackSegments = trackSegments
+        self.segmentCount = 0
+
+    def number(self, value):
+        # value is an integer in units of 10^-precision
+        text = self.format % (value / self.scale)
+        if self.precision:
+            text = text.rstrip('0').rstrip('.')
+
+        return text
+
+    def header(self):
+        yield 'G21'
+        yield 'G90'
+        yield from self.penUp()
+
+    def footer(self):
+        yield from self.penUp()
+        yield from self.move(0, 0, 'G0')
+        yield 'M2'
+
+    def penUp(self):
+        if self.isPenDown is not False:
+            self.isPenDown = False
+            yield self.settings.penUpCommand
+
+    def penDown(self):
+        if self.isPenDown is not True:
+            self.isPenDown = True
+            yield self.settings.penDownCommand
+
+    def move(self, x, y, motion):
+        words = []
+        if x != self.x:
+            words.append('X' + self.number(x))
+        if y != self.y:
+            words.append('Y' + self.number(y))
+        if not words:
+            return
+        self.x = x
+        self.y = y
+
+        if motion == 'G1' and self.feedRate != self.settings.feedRate:
+            self.feedRate = self.settings.feedRate
+            words.append('F' + self.number(self.feedRate * self.scale))
+        if motion != self.motion:
+            self.motion = motion
+            words.insert(0, motion)
+
+        yield ' '.join(words)
+
+    def path(self, points, done=0):
+        # G-code for a single subpath: travel to its start with the pen up
+        # and draw the rest with the pen down. done is the number of drawn
+        # segments before the subpath.
+        self.segmentCount = done
+        q = np.rint(points * self.scale).astype(np.int64)
+
+        # drop points which round to the previous point
+        keep = np.ones(len(q), dtype=bool)
+        keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+        q = q[keep]
+
+        x, y = q[0].tolist()
+        if (x, y) != (self.x, self.y):
+            yield from self.penUp()
+            if self.x is not None:
+                self.travelLength += np.hypot(x - self.x,
+                                              y - self.y) / self.scale
+            yield from self.move(x, y, 'G0')
+
+        if len(q) < 2:
+            return
+
+        yield from self.penDown()
+        self.drawLength += np.hypot(*np.diff(q, axis=0).T).sum() / self.scale
+
+        if self.trackSegments:
+            counts = np.flatnonzero(keep)[1:] + done
+            for (x, y), self.segmentCount in zip(q[1:].tolist(),
+                                                 counts.tolist()):
+                yield from self.move(x, y, 'G1')
+        else:
+            for x, y in q[1:].tolist():
+                yield from self.move(x, y, 'G1')
+
+    def lines(self, paths, start=0):
+        # All G-code lines of a job, generated lazily. With start the job
+        # begins after the first start drawn segments, e.g. to continue an
+        # interrupted plot.
+        yield from self.header()
+        done = 0
+        for points in paths:
+            count = max(len(points) - 1, 0)
+            skip = min(max(start - done, 0), count)
+            if len(points) and (skip < count or done >= start):
+                yield from self.path(points[skip:], done + skip)
+            done += count
+        self.segmentCount = done
+        yield from self.footer()
+
+
+def gcodeLines(paths, settings, start=0):
+    # (line, drawn segments done after the line) for every line of a job.
+    generator = GcodeGenerator(settings, trackSegments=True)
+    for line in generator.lines(paths, start):
+        yield line, generator.segmentCount
+
+
+def writeGcode(paths, file, settings):
+    # Stream G-code for paths into an open text file, in chunks so the
+    # memory use does not depend on the job size.
+    generator = GcodeGenerator(settings)
+    chunk = []
+
+    for line in generator.lines(paths):
+        chunk.append(line)
+        if len(chunk) == CHUNK_LINES:
+            generator.lineCount += len(chunk)
+            file.write('\n'.join(chunk) + '\n')
+            chunk = []
+
+    generator.lineCount += len(chunk)
+    file.write('\n'.join(chunk) + '\n')
+
+    return generator
+
+
+def exportGcode(paths, filename, settings):
+    with open(filename, 'w', buffering=1 << 20, newline='\n') as file:
+        return writeGcode(paths, file, settings)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import collections
+import hashlib
+import threading
+
+import numpy as np
+
+from createPaths import getElementPath
+
+# Default memory cap for cached geometry, in bytes.
+CACHE_SIZE = 256 * 2**20
+# Estimated memory used by an entry besides its point arrays.
+ENTRY_OVERHEAD = 200
+
+
+def geometryDigest(element):
+    # Hash of the attributes which define the shape of an element.
+    digest = hashlib.blake2b(digest_size=16)
+    for value in element.geometry():
+        if isinstance(value, np.ndarray):
+            digest.update(value.tobytes())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b'\0')
+
+    return digest.digest()
+
+
+class GeometryCache:
+    # LRU cache of flattened element geometry. Entries are keyed by the
+    # element tag, a hash of its geometric attributes and the flattening
+    # tolerance, so equal elements share their arrays across toggles,
+    # re-opened files and exports. Cached arrays are read-only. The cache
+    # may be used from the GUI and the load worker thread.
+    def __init__(self, maxSize=CACHE_SIZE):
+        self.maxSize = maxSize
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def key(self, element, tolerance):
+        # The digest is computed once per element, by a flattening worker
+        # process if it was flattened in parallel (see parallelFlatten).
+        if element.digest is None:
+            element.digest = geometryDigest(element)
+
+        return (element.classType, element.digest, tolerance)
+
+    def lookup(self, key):
+        # (True, path) for a cached key, (False, None) otherwise.
+        with self.lock:
+            entries = self.entries
+            if key in entries:
+                entries.move_to_end(key)
+                self.hits += 1
+                return True, entries[key][0]
+            self.misses += 1
+
+        return False, None
+
+    def insert(self, key, path):
+        # Stores the path of a key (as returned by getElementPath) and
+        # returns it.
+        size = ENTRY_OVERHEAD
+        if path is not None:
+            path.points.setflags(write=False)
+            path.offsets.setflags(write=False)
+            size += path.points.nbytes + path.offsets.nbytes
+
+        with self.lock:
+            entries = self.entries
+            if key not in entries:
+                entries[key] = (path, size)
+                self.size += size
+            while self.size > self.maxSize and len(entries) > 1:
+                _, (_, removed) = entries.popitem(last=False)
+                self.size -= removed
+
+        return path
+
+    def getPath(self, element, tolerance):
+        key = self.key(element, tolerance)
+        found, path = self.lookup(key)
+        if found:
+            return path
+
+        # flattened outside the lock, so other threads are not blocked
+        return self.insert(key, getElementPath(element, tolerance))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def statistics(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self.entries),
+                'size': self.size,
+                'maxSize': self.maxSize}
+
+
+# Cache shared by all documents of the process.
+geometryCache = GeometryCache()
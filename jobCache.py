@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import hashlib
+import os
+
+import numpy as np
+
+from elements import Element
+from pathArray import PathArray
+from svgLoader import SvgDocument
+
+# Bump when the stored layout or the processing changes, so old jobs are
+# not used any more.
+JOB_CACHE_VERSION = 7
+# Settings which change the stored paths.
+JOB_SETTINGS = ('tolerance', 'workArea', 'clipToWorkArea', 'fitToPage',
+                'overlapTolerance', 'joinTolerance', 'simplifyTolerance',
+                'orderPaths', 'twoOptTime')
+# Default size limit of the cache directory, in bytes.
+JOB_CACHE_SIZE = 2**30
+# Block size for hashing input files.
+HASH_BLOCK = 2**20
+
+
+def defaultCacheDir():
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(base, 'crtomir')
+
+
+class JobCache:
+    # Directory of compiled jobs: the flattened geometry and element tree
+    # of an SVG file together with its processed (simplified, ordered)
+    # paths. Every job is one uncompressed .npz file named after the hash
+    # of the file content and the processing settings. The least recently
+    # used jobs are deleted when the directory grows over maxSize.
+    def __init__(self, directory=None, maxSize=JOB_CACHE_SIZE):
+        self.directory = directory or defaultCacheDir()
+        self.maxSize = maxSize
+
+    def key(self, filename, settings):
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK), b''):
+                digest.update(block)
+
+        digest.update(repr((JOB_CACHE_VERSION,) +
+                           tuple(getattr(settings, name)
+                                 for name in JOB_SETTINGS)).encode())
+
+        return digest.hexdigest()
+
+    def jobPath(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def load(self, key):
+        # (document, paths, report) of a stored job, None if there is none.
+        filename = self.jobPath(key)
+        try:
+            with np.load(filename) as job:
+                job = dict(job)
+            os.utime(filename)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        document = SvgDocument(tolerance=float(job['tolerance']))
+        document.compiled = True
+        width, height = job['page'].tolist()
+        if width > 0 and height > 0:
+            document.pageSize = (width, height)
+        hasId = job['hasId']
+        for index, (classType, id, parent) in enumerate(
+                zip(job['classTypes'].tolist(), job['ids'].tolist(),
+                    job['parents'].tolist())):
+            attributes = {'id': id} if hasId[index] else {}
+            document.add(Element(attributes, classType), parent, None)
+
+        # per element slices of the stored geometry
+        points = job['points']
+        offsets = job['offsets']
+        subpaths = job['elementSubpaths']
+        for index in np.flatnonzero(job['hasPath']).tolist():
+            first, last = subpaths[index], subpaths[index + 1]
+            document.paths[index] = PathArray(
+                points[offsets[first]:offsets[last]],
+                offsets[first:last + 1] - offsets[first])
+
+        paths = PathArray(job['orderedPoints'], job['orderedOffsets'],
+                          job['orderedOwners'])
+        # report entries are numbers or (before, after) pairs
+        report = {name[len('report_'):]: job[name].item()
+                  if job[name].ndim == 0 else tuple(job[name].tolist())
+                  for name in job if name.startswith('report_')}
+
+        return document, paths, report
+
+    def save(self, key, document, paths, report):
+        geometry = [path if path is not None else PathArray()
+                    for path in document.paths]
+        hasPath = np.array([path is not None for path in document.paths],
+                           dtype=bool)
+        elementSubpaths = np.zeros(len(geometry) + 1, dtype=np.int64)
+        np.cumsum([len(path) for path in geometry], out=elementSubpaths[1:])
+        geometry = PathArray.concatenate(geometry)
+
+        ids = [element.id for element in document.elements]
+        owners = paths.owners if paths.owners is not None else \
+            np.zeros(paths.pointCount(), dtype=np.int64)
+
+        arrays = {
+            'tolerance': np.float64(document.tolerance),
+            'page': np.array(document.pageSize or (0.0, 0.0)),
+            'classTypes': np.array([element.classType
+                                    for element in document.elements],
+                                   dtype=str),
+            'ids': np.array([id or '' for id in ids], dtype=str),
+            'hasId': np.array([id is not None for id in ids], dtype=bool),
+            'parents': np.array(document.parents, dtype=np.int64),
+            'points': geometry.points,
+            'offsets': geometry.offsets,
+            'elementSubpaths': elementSubpaths,
+            'hasPath': hasPath,
+            'orderedPoints': paths.points,
+            'orderedOffsets': paths.offsets,
+            'orderedOwners': owners,
+        }
+        for name, value in report.items():
+            arrays['report_' + name] = np.array(value, dtype=np.float64)
+
+        # written under a temporary name, so other processes never see a
+        # partial job
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.jobPath(key)
+        temporary = '%s.%d.tmp' % (filename, os.getpid())
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, filename)
+
+        self.evict()
+
+    def evict(self):
+        jobs = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                jobs.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(job[1] for job in jobs)
+        for _, jobSize, path in sorted(jobs):
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= jobSize
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.npz'):
+                    os.remove(entry.path)
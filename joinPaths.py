@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+from pathArray import PathArray
+from pathOrder import reorder
+
+# Cell offsets of the 3x3 neighbourhood of a grid cell.
+NEIGHBOURS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def matchEndpoints(endpoints, usable, tolerance):
+    # Pair up end points of different paths which are at most tolerance
+    # apart, every end point with at most one other (the closest free one).
+    # End point 2*i is the start and 2*i+1 the end of path i. Returns the
+    # partner of every end point, -1 if it has none.
+    partner = [-1] * len(endpoints)
+    if not usable.any():
+        return partner
+
+    # end points are hashed to square cells of the tolerance size, so a
+    # partner is always in one of the 3x3 cells around an end point
+    cells = np.floor(endpoints / tolerance).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    height = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * height + cells[:, 1]
+    offsets = [dx * height + dy for dx, dy in NEIGHBOURS]
+
+    # only end points with another one around them need the search below
+    unique, counts = np.unique(keys[usable], return_counts=True)
+    around = np.zeros(len(keys), dtype=np.int64)
+    for offset in offsets:
+        index = np.minimum(np.searchsorted(unique, keys + offset),
+                           len(unique) - 1)
+        around += np.where(unique[index] == keys + offset, counts[index], 0)
+    candidates = np.flatnonzero(usable & (around > 1))
+
+    grid = {}
+    for id, key in zip(candidates.tolist(), keys[candidates].tolist()):
+        grid.setdefault(key, []).append(id)
+
+    coordinates = endpoints.tolist()
+    limit = tolerance**2
+    for id, key in zip(candidates.tolist(), keys[candidates].tolist()):
+        if partner[id] >= 0:
+            continue
+        x, y = coordinates[id]
+        best = -1
+        bestDistance = limit
+        for offset in offsets:
+            for other in grid.get(key + offset, ()):
+                if other >> 1 == id >> 1 or partner[other] >= 0:
+                    continue
+                x1, y1 = coordinates[other]
+                distance = (x1 - x)**2 + (y1 - y)**2
+                if distance <= bestDistance:
+                    best = other
+                    bestDistance = distance
+        if best >= 0:
+            partner[id] = best
+            partner[best] = id
+
+    return partner
+
+
+def chainPaths(partner, count):
+    # Follow the matched end points from path to path. Returns the path
+    # order, a reversed flag for every path and a flag for the first path
+    # of every chain. Chains start at a free end point, paths which are
+    # left form closed rings and are started anywhere.
+    visited = [False] * count
+    order = []
+    reverse = []
+    first = []
+
+    def walk(path, entry):
+        isFirst = True
+        while True:
+            visited[path] = True
+            order.append(path)
+            reverse.append(entry & 1)
+            first.append(isFirst)
+            isFirst = False
+
+            following = partner[entry ^ 1]
+            if following < 0 or visited[following >> 1]:
+                return
+            path, entry = following >> 1, following
+
+    for path in range(count):
+        if not visited[path]:
+            if partner[2*path] < 0:
+                walk(path, 2*path)
+            elif partner[2*path + 1] < 0:
+                walk(path, 2*path + 1)
+    for path in range(count):
+        if not visited[path]:
+            walk(path, 2*path)
+
+    return (np.array(order, dtype=np.int64), np.array(reverse, dtype=bool),
+            np.array(first, dtype=bool))
+
+
+def joinPaths(paths, tolerance):
+    # Merge subpaths whose end points are at most tolerance apart into
+    # longer strokes, reversing them where needed, so the pen is lifted
+    # less often. Where the end points are not equal, the gap is drawn and
+    # belongs to the owner of the subpath before it.
+    if tolerance <= 0 or len(paths) < 2:
+        return paths
+
+    starts = paths.points[paths.offsets[:-1]]
+    ends = paths.points[paths.offsets[1:] - 1]
+    endpoints = np.empty((2 * len(paths), 2))
+    endpoints[0::2] = starts
+    endpoints[1::2] = ends
+    # single points are dots, not strokes to continue
+    usable = np.repeat(paths.lengths() > 1, 2)
+
+    partner = matchEndpoints(endpoints, usable, tolerance)
+    order, reverse, first = chainPaths(partner, len(paths))
+    if first.all():
+        return paths
+
+    ordered = reorder(paths, order, reverse)
+    points = ordered.points
+    starts = ordered.offsets[:-1]
+
+    # the first point of a continuing subpath is dropped if it repeats the
+    # last point of the previous one
+    keep = np.ones(len(points), dtype=bool)
+    repeated = ~first
+    repeated[repeated] = (points[starts[repeated]] ==
+                          points[starts[repeated] - 1]).all(axis=1)
+    keep[starts[repeated]] = False
+
+    kept = np.zeros(len(points) + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept[1:])
+    offsets = np.append(kept[starts[first]], kept[-1])
+    # the kept point before a dropped one starts the next segment
+    owners = None
+    if ordered.owners is not None:
+        owners = ordered.owners.copy()
+        owners[starts[repeated] - 1] = owners[starts[repeated]]
+        owners = owners[keep]
+
+    return PathArray(points[keep], offsets, owners)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import copy
+
+from PyQt5 import QtCore
+
+from jobCache import JobCache
+from motion import Timeline
+from pipeline import processPaths
+from svgLoader import PROGRESS_INTERVAL, SvgLoader
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoadSignals(QtCore.QObject):
+    # Every signal carries the id of the load, so results of a load which
+    # was replaced by a newer one can be ignored.
+
+    # id, bytes read, total bytes
+    progress = QtCore.pyqtSignal(int, int, int)
+    # id, list of (index, parent, classType, element id)
+    elements = QtCore.pyqtSignal(int, object)
+    # id, SvgDocument
+    documentReady = QtCore.pyqtSignal(int, object)
+    # id, processed PathArray, report, Timeline
+    pathsReady = QtCore.pyqtSignal(int, object, object, object)
+    # id
+    finished = QtCore.pyqtSignal(int)
+    cancelled = QtCore.pyqtSignal(int)
+    # id, error message
+    failed = QtCore.pyqtSignal(int, str)
+
+
+class LoadWorker(QtCore.QRunnable):
+    # Loads an SVG file in a thread pool: the document (from the job cache
+    # or parsed), then the processed paths and their timeline. Elements
+    # are delivered in batches while the file is parsed, so the tree can
+    # be filled before the whole file is read. cancel() stops the load at
+    # the next progress report or between stages.
+    #
+    # Given a loaded document, only the paths of the elements in indices
+    # are processed again. The document is flattened again (into a copy,
+    # the GUI keeps using it meanwhile) if the tolerance changed, and then
+    # delivered with documentReady.
+    def __init__(self, id, filename, settings, document=None, indices=None):
+        super().__init__()
+        self.id = id
+        self.filename = filename
+        # the settings may change in the GUI while loading
+        self.settings = copy.copy(settings)
+        self.document = document
+        self.indices = indices
+        self.signals = LoadSignals()
+        self.isCancelled = False
+        self.loader = None
+        # the elements of a loaded document are in the tree already
+        self.sent = 0 if document is None else len(document)
+
+    def cancel(self):
+        self.isCancelled = True
+
+    def check(self):
+        if self.isCancelled:
+            raise LoadCancelled()
+
+    def sendElements(self, document):
+        end = len(document)
+        for start in range(self.sent, end, PROGRESS_INTERVAL):
+            stop = min(start + PROGRESS_INTERVAL, end)
+            self.signals.elements.emit(self.id, [
+                (index, document.parents[index],
+                 document.elements[index].classType,
+                 document.elements[index].id)
+                for index in range(start, stop)])
+        self.sent = end
+
+    def progress(self, done, total):
+        self.check()
+        self.signals.progress.emit(self.id, done, total)
+        if self.loader is not None and self.loader.document is not None:
+            self.sendElements(self.loader.document)
+
+    def run(self):
+        try:
+            if self.document is None:
+                self.load()
+            else:
+                self.process()
+        except LoadCancelled:
+            self.signals.cancelled.emit(self.id)
+        except Exception as error:
+            self.signals.failed.emit(self.id, str(error))
+
+    def load(self):
+        settings = self.settings
+        job = None
+        if settings.useJobCache:
+            cache = JobCache(settings.jobCacheDir, settings.jobCacheSize)
+            key = cache.key(self.filename, settings)
+            job = cache.load(key)
+        self.check()
+
+        if job is not None:
+            document, paths, report = job
+        else:
+            self.loader = SvgLoader(settings.tolerance, self.progress,
+                                   workers=settings.flattenWorkers)
+            document = self.loader.load(self.filename)
+        self.sendElements(document)
+        self.signals.documentReady.emit(self.id, document)
+        self.check()
+
+        if job is None:
+            report = {}
+            paths = processPaths(document.getPaths(range(len(document))),
+                                 settings, report)
+            self.check()
+        timeline = Timeline(paths, settings)
+        self.signals.pathsReady.emit(self.id, paths, report, timeline)
+
+        if job is None and settings.useJobCache:
+            cache.save(key, document, paths, report)
+        self.signals.finished.emit(self.id)
+
+    def process(self):
+        settings = self.settings
+        document = self.document
+        if document.tolerance != settings.tolerance:
+            if document.compiled:
+                # a document from the job cache has no attributes to
+                # flatten, the file is parsed again (same elements)
+                self.loader = SvgLoader(settings.tolerance, self.progress,
+                                        workers=settings.flattenWorkers)
+                document = self.loader.load(self.filename)
+            else:
+                document = copy.copy(document)
+                document.flatten(settings.tolerance,
+                                 workers=settings.flattenWorkers,
+                                 progress=self.progress)
+            self.signals.documentReady.emit(self.id, document)
+            self.check()
+
+        report = {}
+        paths = processPaths(document.getPaths(self.indices), settings,
+                             report)
+        self.check()
+        timeline = Timeline(paths, settings)
+        self.signals.pathsReady.emit(self.id, paths, report, timeline)
+        self.signals.finished.emit(self.id)
@@ -9,46 +9,119 @@
 
 import sys
 import os
-import xml.etree.ElementTree as ET
-import re
 import time
-from PyQt5 import QtCore, QtGui, QtWidgets, QtSvg, Qt
+
+from PyQt5 import QtCore, QtGui, QtWidgets, Qt
 
 from mainwindow import Ui_MainWindow
 from simulation import Ui_Dialog
-from svgview import SvgView
-from createPaths import CreateShapePaths as csp
-from createPaths import CreatePathPaths as cpp
+from simulationItem import SimulationItem
+from gcode import exportGcode, gcodeLines
+from geometryCache import geometryCache
+from loadWorker import LoadWorker
+import parallelFlatten
+from pipeline import formatReport
+from motion import Timeline, formatDuration
+from pathArray import OwnerIndex
+from sender import Sender, SerialPort
+from settings import Settings
+
+# Simulation frame interval in ms.
+FRAME_INTERVAL = 33
+# Interval of the streaming progress updates in ms.
+SENDER_INTERVAL = 200
 
 
 class SimDialogWindow(QtWidgets.QDialog, Ui_Dialog):
-    def __init__(self):
+    # emitted before a job is sent, so stale paths can be rebuilt first; the
+    # job is sent when they arrive (setProcessing)
+    aboutToSend = QtCore.pyqtSignal()
+
+    def __init__(self, settings):
         super().__init__()
         self.setupUi(self)
-        self.elementsClasses = None
+        self.settings = settings
+        self.report = {}
+        self.item = None
+        self.headItem = None
+        self.ownerIndex = None
+        self.timeline = None
+        self.simTime = 0.0
+        self.lastTick = 0.0
         self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.advance)
+        self.sender = None
+        self.senderPort = None
+        self.senderTimeline = None
+        self.isProcessing = False
+        self.isSendPending = False
+        self.senderTimer = QtCore.QTimer()
+        self.senderTimer.setInterval(SENDER_INTERVAL)
+        self.senderTimer.timeout.connect(self.updateSender)
 
         self.runButton.clicked.connect(self.run)
         self.stepFwdButton.clicked.connect(self.stepFwd)
         self.stepBackButton.clicked.connect(self.stepBack)
         self.stepBackButton.setDisabled(True)
+        self.progressSlider.valueChanged.connect(self.seek)
+        self.portEdit.setText(settings.port)
+        self.sendButton.clicked.connect(self.send)
+        self.pauseButton.clicked.connect(self.pauseSend)
+        self.stopButton.clicked.connect(self.stopSend)
+        self.pauseButton.setDisabled(True)
+        self.stopButton.setDisabled(True)
         self.graphicsView.setScene(QtWidgets.QGraphicsScene(self.graphicsView))
         self.scene = self.graphicsView.scene()
+        self.setControlsEnabled(False)
 
     def initialise(self):
-        self.lines = []
+        # A new document is loading: stop playback and keep the controls
+        # disabled until its paths arrive (setControlsEnabled).
+        self.timer.stop()
+        self.runButton.setText('Run')
+        self.setControlsEnabled(False)
+        self.item = None
+        self.headItem = None
+        self.ownerIndex = None
+        self.timeline = None
+        self.isSendPending = False
         self.isFirstRun = True
         self.pathIndex = 0
+        self.simTime = 0.0
         self.scene.clear()
-        self.timer.setInterval(100)
-        self.timer.timeout.connect(lambda: self.startNewThread('forward'))
+        self.timer.setInterval(FRAME_INTERVAL)
+
+    def setControlsEnabled(self, enabled):
+        # Playback and sending need the processed paths. Nothing is enabled
+        # while a job is being sent.
+        enabled = enabled and self.sender is None
+        for widget in (self.runButton, self.stepFwdButton,
+                       self.progressSlider, self.sendButton):
+            widget.setEnabled(enabled)
+        self.stepBackButton.setDisabled(True)
+
+    def setProcessing(self, processing):
+        # New paths are processed in the background: playback and sending
+        # wait for them. A job sent meanwhile is sent when they arrive.
+        self.isProcessing = processing
+        if processing:
+            self.timer.stop()
+            self.runButton.setText('Run')
+            self.setControlsEnabled(False)
+        else:
+            self.setControlsEnabled(self.timeline is not None)
+            if self.isSendPending:
+                self.isSendPending = False
+                self.send()
+
+    def cancelProcessing(self):
+        # the new paths do not come, neither does the job
+        self.isSendPending = False
+        self.setProcessing(False)
 
     def clearSimulation(self):
         self.isFirstRun = True
-        self.pathIndex = 0
-        self.scene.clear()
         self.clearScene()
-        self.setLineItems()
 
     def wheelEvent(self, event):
         factor = pow(1.2, event.angleDelta().y() / 240.0)
@@ -70,10 +143,9 @@ class SimDialogWindow(QtWidgets.QDialog, Ui_Dialog):
             if self.isFirstRun:
                 self.scene = self.graphicsView.scene()
                 self.clearScene()
-                self.timer.start()
 
-            else:
-                self.timer.start()
+            self.lastTick = time.perf_counter()
+            self.timer.start()
 
         else:
             self.isFirstRun = False
@@ -83,6 +155,9 @@ class SimDialogWindow(QtWidgets.QDialog, Ui_Dialog):
             self.timer.stop()
 
     def stepFwd(self):
+        if self.timeline is None:
+            return
+
         if self.isFirstRun:
             self.scene = self.graphicsView.scene()
             self.clearScene()
@@ -90,88 +165,214 @@ class SimDialogWindow(QtWidgets.QDialog, Ui_Dialog):
 
             self.isFirstRun = False
 
-        self.startNewThread('forward')
+        if self.pathIndex < self.item.segmentCount():
+            self.setTime(self.timeline.timeOfCount(self.pathIndex + 1))
+        else:
+            self.finish()
 
     def stepBack(self):
-        self.startNewThread('backward')
-
-    def setElementsClasses(self, classes):
-        self.elementsClasses = classes
-
-    def setSimulationPath(self):
-        path = {'x': [], 'y': []}
-        self.paths = []
-        for element in self.elementsClasses:
-            path = {'x': [], 'y': []}
-            if 'rect' == element.classType:
-                path = csp().getRectPath(element)
-                self.paths.append(path)
-
-            if 'circle' == element.classType:
-                path = csp().getCircPath(element)
-                self.paths.append(path)
-
-            if 'ellipse' == element.classType:
-                path = csp().getEllipsePath(element)
-                self.paths.append(path)
-
-            if 'line' == element.classType:
-                path = csp().getLinePath(element)
-                self.paths.append(path)
-
-            if 'path' == element.classType:
-                path = cpp().getPathPath(element)
-                self.paths.extend(path)
-
-    def setLineItems(self):
-        self.lines = []
-        for path in self.paths:
-            for xIndex in range(1, len(path['x'])):
-                x1 = path['x'][xIndex-1]
-                y1 = path['y'][xIndex-1]
-                x2 = path['x'][xIndex]
-                y2 = path['y'][xIndex]
-
-                pen = QtGui.QPen()
-                pen.setWidth(0.5)
-                pen.setColor(QtGui.QColor("#FFFF0000"))
-                line = QtWidgets.QGraphicsLineItem(x1, y1, x2, y2)
-                line.setPen(pen)
-
-                self.lines.append(line)
-
-    def startNewThread(self, direction):
-        nrOfPaths = len(self.lines)
-        if self.pathIndex < nrOfPaths:
-            #self.scene = self.graphicsView.scene()
-
-            if direction == 'forward':
-                line = self.lines[self.pathIndex]
-                self.pathIndex += 1
-                self.scene.addItem(line)
-            else:
-                if self.pathIndex > 0:
-                    self.pathIndex -= 1
-                    line = self.lines[self.pathIndex]
-                    self.scene.removeItem(line)
+        if self.timeline is None:
+            return
 
-        else:
+        self.setTime(self.timeline.timeOfCount(self.pathIndex - 1))
+
+    def speed(self):
+        return float(self.speedBox.currentText().rstrip('x'))
+
+    def advance(self):
+        # Move the simulation forward by the wall-clock time since the
+        # last frame times the speed multiplier.
+        if self.timeline is None:
             self.timer.stop()
-            # self.timer.timeout.disconnect(self.startNewThread)
-            self.runButton.setText('Run')
-            self.stepFwdButton.setEnabled(True)
-            self.stepBackButton.setDisabled(True)
-            self.pathIndex = 0
-            self.isFirstRun = True
+            return
+
+        now = time.perf_counter()
+        self.simTime += (now - self.lastTick) * self.speed()
+        self.lastTick = now
+
+        if self.simTime >= self.timeline.totalTime():
+            self.setTime(self.timeline.totalTime())
+            self.finish()
+        else:
+            self.setTime(self.simTime)
+
+    def seek(self, value):
+        # Jump to a position of the slider. Only the segments after the
+        # closest render checkpoint are drawn.
+        if self.timeline is None:
+            return
+
+        # playback continues from here instead of starting over
+        if self.isFirstRun:
+            self.isFirstRun = False
+            if not self.timer.isActive():
+                self.stepBackButton.setEnabled(True)
+        self.setTime(self.timeline.totalTime() * value /
+                     self.progressSlider.maximum())
+
+    def setTime(self, simTime):
+        # Show the plot as it is at the given time since the start.
+        self.simTime = min(max(simTime, 0.0), self.timeline.totalTime())
+        self.pathIndex = self.timeline.countAt(self.simTime)
+        self.item.setCount(self.pathIndex)
+
+        if self.headItem is not None:
+            (x, y), isDown = self.timeline.positionAt(self.simTime)
+            self.headItem.setPos(x, y)
+            self.headItem.setBrush(QtGui.QBrush(
+                QtCore.Qt.blue if isDown else QtCore.Qt.gray))
+
+        total = self.timeline.totalTime()
+        self.timeLabel.setText('%s\n/ %s\n%.0f mm\n/ %.0f mm' % (
+            formatDuration(self.simTime), formatDuration(total),
+            self.timeline.drawLength(self.pathIndex),
+            self.timeline.drawLength()))
+
+        self.progressSlider.blockSignals(True)
+        self.progressSlider.setValue(round(
+            self.progressSlider.maximum() * self.simTime / total)
+            if total > 0 else 0)
+        self.progressSlider.blockSignals(False)
+
+    def finish(self):
+        self.timer.stop()
+        self.runButton.setText('Run')
+        self.stepFwdButton.setEnabled(True)
+        self.stepBackButton.setDisabled(True)
+        self.pathIndex = 0
+        self.isFirstRun = True
+
+    def send(self):
+        # Stream the job to the controller. If the simulation was stopped
+        # part way, the job continues from there. The simulation follows
+        # the acknowledged lines.
+        if self.timeline is None or self.sender is not None:
+            return
+
+        self.aboutToSend.emit()
+        if self.isProcessing:
+            self.isSendPending = True
+            return
+
+        self.settings.port = self.portEdit.text().strip()
+        total = self.item.segmentCount()
+        start = self.pathIndex if 0 < self.pathIndex < total else 0
+        try:
+            self.senderPort = SerialPort(self.settings.port,
+                                         self.settings.baudrate)
+        except (OSError, RuntimeError) as error:
+            self.senderLabel.setText('Can not open\n' + str(error))
+            return
+
+        self.timer.stop()
+        if self.isFirstRun:
+            self.clearScene()
+            self.isFirstRun = False
+        for button in (self.runButton, self.stepFwdButton,
+                       self.stepBackButton, self.sendButton):
+            button.setDisabled(True)
+        self.pauseButton.setText('Pause')
+        self.pauseButton.setEnabled(True)
+        self.stopButton.setEnabled(True)
+
+        self.sender = Sender(self.senderPort,
+                             gcodeLines(self.paths, self.settings, start),
+                             self.settings.rxBufferSize)
+        self.senderTimeline = self.timeline
+        self.sender.start()
+        self.senderTimer.start()
+
+    def pauseSend(self):
+        if self.sender is None:
+            return
+
+        if self.pauseButton.text() == 'Pause':
+            self.sender.pause()
+            self.pauseButton.setText('Resume')
+        else:
+            self.sender.resume()
+            self.pauseButton.setText('Pause')
+
+    def stopSend(self):
+        if self.sender is not None:
+            self.sender.stop()
+
+    def closeSender(self):
+        # Stop the machine before the application exits, the sender thread
+        # writes the stop commands.
+        if self.sender is not None:
+            self.sender.stop()
+            self.sender.wait(1.0)
+            self.senderPort.close()
+
+    def updateSender(self):
+        statistics = self.sender.statistics()
+        self.senderLabel.setText('%s\n%.0f lines/s\n%d / %d B\n%d errors' % (
+            statistics['error'] or statistics['state'],
+            statistics['lineRate'], statistics['bufferFill'],
+            statistics['bufferSize'], statistics['errors']))
+        # a document opened while sending is not followed
+        if self.timeline is not None and \
+                self.timeline is self.senderTimeline:
+            self.setTime(self.timeline.timeOfCount(
+                statistics['segmentCount']))
+
+        if not self.sender.isRunning():
+            self.senderTimer.stop()
+            self.senderPort.close()
+            self.sender = None
+            self.senderPort = None
+            self.senderTimeline = None
+            self.setControlsEnabled(self.timeline is not None)
+            self.stepBackButton.setEnabled(self.timeline is not None and
+                                           self.pathIndex > 0)
+            self.pauseButton.setText('Pause')
+            self.pauseButton.setDisabled(True)
+            self.stopButton.setDisabled(True)
+
+    def setPaths(self, paths, report):
+        # Paths are processed by a LoadWorker, report is its report.
+        self.report = report
+        self.paths = paths
+
+    def setSegments(self, timeline=None):
+        # timeline may be computed in advance, e.g. by the load worker
+        pen = QtGui.QPen()
+        pen.setWidthF(0.5)
+        pen.setColor(QtGui.QColor("#FFFF0000"))
+
+        shown = self.item is not None and self.item.scene() is self.scene
+        if shown:
+            self.scene.removeItem(self.item)
+        self.item = SimulationItem(self.paths.segments(), pen)
+        if shown:
+            self.scene.addItem(self.item)
+        owners = self.paths.segmentOwners()
+        self.ownerIndex = None if owners is None else OwnerIndex(owners)
+        if timeline is None:
+            timeline = Timeline(self.paths, self.settings)
+        self.timeline = timeline
+        self.setTime(self.simTime)
+
+    def setElementsVisible(self, indices, visible):
+        # Show or hide the segments of the given elements without
+        # rebuilding the simulation.
+        if self.ownerIndex is None or not len(indices):
+            return
+
+        self.item.setSegmentsVisible(self.ownerIndex.segments(indices),
+                                     visible)
 
     def clearScene(self):
+        # Empty the scene apart from the page outline and the (restarted)
+        # simulation item.
         items = self.scene.items()
         if len(items) > 0:
             for item in items:
                 self.scene.removeItem(item)
 
-        # Set outline for A4 paper size
-        outlineItem = QtWidgets.QGraphicsRectItem(0, 0, 210, 297)
+        # outline of the work area, nothing is drawn outside of it
+        outlineItem = QtWidgets.QGraphicsRectItem(*self.settings.workArea)
         outline = QtGui.QPen(QtCore.Qt.black, 2, QtCore.Qt.DashLine)
         outline.setCosmetic(True)
         outlineItem.setPen(outline)
@@ -180,6 +381,18 @@ class SimDialogWindow(QtWidgets.QDialog, Ui_Dialog):
         outlineItem.setZValue(1)
 
         self.scene.addItem(outlineItem)
+
+        # pen position, same size at every zoom level
+        self.headItem = QtWidgets.QGraphicsEllipseItem(-3, -3, 6, 6)
+        self.headItem.setFlag(
+            QtWidgets.QGraphicsItem.ItemIgnoresTransformations)
+        self.headItem.setPen(QtGui.QPen(QtCore.Qt.NoPen))
+        self.headItem.setZValue(2)
+        self.scene.addItem(self.headItem)
+
+        if self.item is not None:
+            self.scene.addItem(self.item)
+            self.setTime(0.0)
         self.scene.setSceneRect(
             outlineItem.boundingRect().adjusted(-10, -10, 10, 10))
 
@@ -189,69 +402,206 @@ class AppWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         super().__init__()
         self.setupUi(self)
 
-        self.simDialog = SimDialogWindow()
+        self.settings = Settings()
+        self.simDialog = SimDialogWindow(self.settings)
+        self.simDialog.aboutToSend.connect(self.updateSimulationPaths)
         self.graphicsView.run()
 
         self.setCentralWidget(self.centralwidget)
         self.actionOpen.triggered.connect(self.openFile)
         self.actionExit.triggered.connect(self.exitProgram)
         self.actionSimulation.triggered.connect(self.simulation)
+        self.actionGenerate_G_Code.triggered.connect(self.generateGcode)
+        self.actionTolerance.triggered.connect(self.setTolerance)
+        self.actionSimplify.triggered.connect(self.setSimplify)
+        self.actionOrderPaths.triggered.connect(self.setOrderPaths)
         self.actionBackground.triggered.connect(
             self.graphicsView.setViewBackground)
         self.actionOutline.triggered.connect(self.graphicsView.setViewOutline)
 
         self.treeWidget.itemClicked.connect(self.checkBoxClick)
 
+        self.debugDock.hide()
+        self.actionDebug.toggled.connect(self.debugDock.setVisible)
+        self.debugDock.visibilityChanged.connect(self.showDebugPanel)
+        self.clearCacheButton.clicked.connect(self.clearCache)
+        self.debugTimer = QtCore.QTimer()
+        self.debugTimer.setInterval(500)
+        self.debugTimer.timeout.connect(self.updateDebugPanel)
+
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setMaximumWidth(200)
+        self.progressBar.hide()
+        self.statusBar().addPermanentWidget(self.progressBar)
+        self.cancelButton = QtWidgets.QPushButton('Cancel')
+        self.cancelButton.hide()
+        self.cancelButton.clicked.connect(self.cancelLoad)
+        self.statusBar().addPermanentWidget(self.cancelButton)
+        self.loadWorker = None
+        self.loadId = 0
+
         self.name = ''
         self.path = ''
-        self.temp = ''
+        self.document = None
+        self.hidden = set()
+        # hidden elements of the paths being processed, called with the
+        # paths up to date
+        self.processedHidden = set()
+        self.isSimulationDirty = False
+        self.afterPaths = None
 
     def treeView(self):  # fc:startStop AppWindow treeView
+        # The file is loaded by a LoadWorker in the thread pool. The tree
+        # is filled while the file is parsed, the preview and the
+        # simulation are set when the document and the processed paths
+        # arrive.
+        self.cancelLoad()
         self.treeWidget.clear()  # fc:middleware "Clear tree struct" QTreeWidget.clear()
+        self.treeWidget.setEnabled(False)
+        self.treeWidget.setHeaderLabel(self.name)
 
-        tree = ET.parse(self.path)
-        root = tree.getroot()
-        namespace = '{' + re.split('[{}]', root.tag)[1] + '}'
-
-        self.elements = Elements(self.treeWidget, namespace)
-        self.elements.initSVG(root)
-
-        classes = self.elements.setVisibility(root, [])
-        self.simDialog.setElementsClasses(classes)
-        self.simDialog.setSimulationPath()
-        self.simDialog.setLineItems()
-
-        self.temp = self.path.replace('.svg', '_temp.svg')
-        tree.write(self.temp)
+        self.document = None
+        self.elements = Elements(self.treeWidget)
+        self.hidden = set()
+        self.actionSimulation.setEnabled(False)
+        self.actionGenerate_G_Code.setEnabled(False)
 
-        self.treeWidget.setHeaderLabel(self.name)
-        self.treeWidget.expandAll()
-        self.treeWidget.show()
+        self.startWorker(LoadWorker(self.loadId + 1, self.path,
+                                    self.settings))
+        self.statusBar().showMessage('Loading ' + self.name)
 
     # fc:startStop end
 
-    def checkBoxClick(self, event):
-        iterator = QtWidgets.QTreeWidgetItemIterator(
-            self.treeWidget, QtWidgets.QTreeWidgetItemIterator.NotChecked)
-        items = []
-        while iterator.value():
-            item = iterator.value()
-            text = item.text(0)
-            itemID = text.split(': ')[1]
-            items.append(itemID)
-            iterator += 1
-
-        tree = ET.parse(self.temp)
-        root = tree.getroot()
-        classes = self.elements.setVisibility(root, items)
-        self.simDialog.setElementsClasses(classes)
-        self.simDialog.setSimulationPath()
-        self.simDialog.setLineItems()
-
-        tree.write(self.temp)
-
-        tmp = QtCore.QFile(self.temp)
-        self.graphicsView.openFile(tmp)
+    def startWorker(self, worker):
+        # Run a LoadWorker, the results of earlier ones are ignored.
+        self.loadId = worker.id
+        self.loadWorker = worker
+        self.processedHidden = set(self.hidden)
+        signals = worker.signals
+        signals.progress.connect(self.showProgress)
+        signals.elements.connect(self.addElements)
+        signals.documentReady.connect(self.documentLoaded)
+        signals.pathsReady.connect(self.pathsLoaded)
+        signals.finished.connect(self.loadFinished)
+        signals.cancelled.connect(self.loadFinished)
+        signals.failed.connect(self.loadFailed)
+
+        self.simDialog.setProcessing(True)
+        self.progressBar.setValue(0)
+        self.progressBar.show()
+        self.cancelButton.show()
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def cancelLoad(self):
+        if self.loadWorker is not None:
+            self.loadWorker.cancel()
+            self.loadWorker = None
+            self.afterPaths = None
+            self.simDialog.cancelProcessing()
+            self.progressBar.hide()
+            self.cancelButton.hide()
+            self.statusBar().showMessage('Loading cancelled')
+
+    def showProgress(self, id, done, total):
+        if id == self.loadId:
+            self.progressBar.setValue(int(100 * done / max(total, 1)))
+
+    def addElements(self, id, records):
+        if id == self.loadId:
+            self.elements.addElements(records)
+
+    def documentLoaded(self, id, document):
+        if id != self.loadId:
+            return
+
+        # a document flattened again keeps the tree and the hidden elements
+        isNew = self.document is None
+        self.document = document
+        self.graphicsView.setDocument(document)
+        for index in self.hidden:
+            self.graphicsView.setElementVisible(index, False)
+        if isNew:
+            self.treeWidget.expandAll()
+            self.treeWidget.setEnabled(True)
+
+    def pathsLoaded(self, id, paths, report, timeline):
+        if id != self.loadId:
+            return
+
+        self.simDialog.setPaths(paths, report)
+        self.simDialog.setSegments(timeline)
+        # elements hidden or shown while the paths were processed
+        self.simDialog.setElementsVisible(
+            self.hidden - self.processedHidden, False)
+        self.isSimulationDirty = self.hidden != self.processedHidden
+        self.actionSimulation.setEnabled(True)
+        self.actionGenerate_G_Code.setEnabled(True)
+        self.showReport()
+        self.loadFinished(id)
+        self.simDialog.setProcessing(False)
+
+        action, self.afterPaths = self.afterPaths, None
+        if action is not None:
+            action()
+
+    def loadFinished(self, id):
+        if id == self.loadId and self.loadWorker is not None:
+            self.loadWorker = None
+            self.progressBar.hide()
+            self.cancelButton.hide()
+
+    def loadFailed(self, id, message):
+        if id == self.loadId:
+            self.loadFinished(id)
+            self.afterPaths = None
+            self.simDialog.cancelProcessing()
+            self.treeWidget.setEnabled(True)
+            self.statusBar().showMessage(
+                'Error loading %s: %s' % (self.name, message))
+
+    def setSimulationPaths(self):
+        # The paths of the shown elements are processed by a LoadWorker,
+        # replacing one which is still processing.
+        if self.loadWorker is not None:
+            self.loadWorker.cancel()
+        active = [index for index in range(len(self.document))
+                  if index not in self.hidden]
+        self.startWorker(LoadWorker(self.loadId + 1, self.path,
+                                    self.settings, self.document, active))
+        self.statusBar().showMessage('Processing ' + self.name)
+        self.isSimulationDirty = False
+
+    def updateSimulationPaths(self, action=None):
+        # Rebuild the paths if elements were hidden or shown since. action
+        # is called once the paths are up to date, at once or when they
+        # arrive.
+        if self.isSimulationDirty:
+            self.setSimulationPaths()
+        if self.loadWorker is not None:
+            self.afterPaths = action
+        elif action is not None:
+            action()
+
+    def checkBoxClick(self, item, column=0):
+        # Only the clicked item and its children can change, so only their
+        # preview and simulation items are updated. The simulation paths
+        # are rebuilt (and reordered) when they are needed next.
+        changed = self.elements.changedElements(item, self.hidden)
+        if not changed:
+            return
+
+        for index, visible in changed:
+            if visible:
+                self.hidden.discard(index)
+            else:
+                self.hidden.add(index)
+            self.graphicsView.setElementVisible(index, visible)
+
+        self.simDialog.setElementsVisible(
+            [index for index, visible in changed if visible], True)
+        self.simDialog.setElementsVisible(
+            [index for index, visible in changed if not visible], False)
+        self.isSimulationDirty = True
 
     def openFile(self, path=None):
         if not path:
@@ -264,232 +614,153 @@ class AppWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
             self.simDialog.initialise()
             self.treeView()
-            tmp = QtCore.QFile(self.temp)
-            self.graphicsView.openFile(tmp)
-            self.treeWidget.setHeaderLabel(self.name)
-            self.actionSimulation.setEnabled(True)
+
+    def showReport(self):
+        message = formatReport(self.simDialog.report)
+        plotTime = 'plot time %s' % formatDuration(
+            self.simDialog.timeline.totalTime())
+        self.statusBar().showMessage(
+            message + ', ' + plotTime if message else plotTime)
 
     def exitProgram(self):
         self.close()
 
     def simulation(self):
+        # the dialog shows the old paths until the new ones arrive
         self.simDialog.show()
         self.simDialog.clearSimulation()
+        self.updateSimulationPaths()
 
-    def closeEvent(self, event):
-        if w.temp:
-            os.remove(w.temp)
+    def generateGcode(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save G-code", self.path.replace('.svg', '.gcode'),
+            "G-code files (*.gcode *.nc)")
 
+        if path:
+            self.updateSimulationPaths(lambda: self.exportGcode(path))
+
+    def exportGcode(self, path):
+        start = time.perf_counter()
+        result = exportGcode(self.simDialog.paths, path, self.settings)
+        self.statusBar().showMessage(
+            '%d lines, draw %.0f mm, travel %.0f mm, plot time %s '
+            '(%.2f s)' %
+            (result.lineCount, result.drawLength, result.travelLength,
+             formatDuration(self.simDialog.timeline.totalTime()),
+             time.perf_counter() - start))
+
+    def updatePaths(self):
+        if self.loadWorker is not None and self.loadWorker.document is None:
+            # the running load uses the old settings
+            self.treeView()
+        elif self.document is not None:
+            self.setSimulationPaths()
+
+    def setOrderPaths(self, enable):
+        self.settings.orderPaths = enable
+        self.updatePaths()
+
+    def setTolerance(self):
+        tolerance, ok = QtWidgets.QInputDialog.getDouble(
+            self, 'Tolerance', 'Maximum chord error [mm]:',
+            self.settings.tolerance, 0.001, 10, 3)
+
+        if ok and tolerance != self.settings.tolerance:
+            self.settings.tolerance = tolerance
+            self.updatePaths()
+
+    def setSimplify(self):
+        tolerance, ok = QtWidgets.QInputDialog.getDouble(
+            self, 'Simplify', 'Simplification tolerance [mm] (0 = off):',
+            self.settings.simplifyTolerance, 0, 10, 3)
+
+        if ok and tolerance != self.settings.simplifyTolerance:
+            self.settings.simplifyTolerance = tolerance
+            self.updatePaths()
+
+    def showDebugPanel(self, visible):
+        self.actionDebug.setChecked(visible)
+        if visible:
+            self.updateDebugPanel()
+            self.debugTimer.start()
+        else:
+            self.debugTimer.stop()
+
+    def updateDebugPanel(self):
+        stats = geometryCache.statistics()
+        lookups = stats['hits'] + stats['misses']
+        self.debugLabel.setText(
+            'Geometry cache\n'
+            'hits: %d\n'
+            'misses: %d\n'
+            'hit rate: %.1f %%\n'
+            'entries: %d\n'
+            'memory: %.1f / %.0f MB' %
+            (stats['hits'], stats['misses'],
+             100 * stats['hits'] / max(lookups, 1), stats['entries'],
+             stats['size'] / 2**20, stats['maxSize'] / 2**20))
+
+    def clearCache(self):
+        geometryCache.clear()
+        geometryCache.resetCounters()
+        self.updateDebugPanel()
+
+    def closeEvent(self, event):
+        self.cancelLoad()
+        self.simDialog.closeSender()
         self.simDialog.close()
+        parallelFlatten.shutdown()
 
 
 class Elements():
-    def __init__(self, tree, namespace):
+    def __init__(self, tree):
         self.tree = [tree]
+        self.items = []
         self.classes = {}
-        self.razred = None
-        self.indent = 0
-        self.namespace = namespace
-        self.useElements = (namespace + 'g',
-                            namespace + 'rect',
-                            namespace + 'circle',
-                            namespace + 'ellipse',
-                            namespace + 'path',
-                            namespace + 'polyline')
-
-    def initSVG(self, root):
-        self.initSVGRecur(root)
-
-    def initSVGRecur(self, root):
-        string = (str(root.tag.replace(self.namespace, '')) +
-                  ': ' + str(root.get('id')))
-        parent = QtWidgets.QTreeWidgetItem(self.tree[-1])
-        parent.setText(0, string)
-        root.set("visibility", "visible")
-
-        var = 'self.razred'
-        classType = root.tag.replace(self.namespace, '')
-        clas = classType.capitalize()
-        execStr = (var + '=' + clas +
-                   '(args=' + str(root.items()) + ', classType="' + classType + '")')
-
-        exec(execStr)
-        className = root.get('id')
-        self.classes[className] = self.razred
-        parent.setFlags(parent.flags() | Qt.Qt.ItemIsTristate |
-                        Qt.Qt.ItemIsUserCheckable)
-        self.tree.append(parent)
-        for elem in root:
-            if elem.tag in self.useElements:
-                self.initSVGRecur(elem)
-        parent.setFlags(parent.flags() | Qt.Qt.ItemIsUserCheckable)
-        parent.setCheckState(0, Qt.Qt.Checked)
-        del(self.tree[-1])
-
-    def setVisibility(self, root, itemsToHide):
-        self.setVisibilityRecur(root, itemsToHide)
-
-        activeElements = []
-        for element in self.classes:
-            addElement = True
-            for item in itemsToHide:
-                if element == item:
-                    addElement = False
-
-            if addElement:
-                activeElements.append(self.classes[element])
-
-        return activeElements
-
-    def setVisibilityRecur(self, root, items):
-        elementID = root.get('id')
-        root.set("visibility", "visible")
-
-        if elementID:
-            for item in items:
-                if elementID in item:
-                    root.set("visibility", "hidden")
-
-        for elem in root:
-            if elem.tag in self.useElements:
-                self.setVisibilityRecur(elem, items)
-
-
-class Rect:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.x = 0
-        self.y = 0
-        self.width = None
-        self.height = None
-        self.rx = None
-        self.ry = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'x', 'y', 'width', 'height', 'rx', 'ry')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-        if self.rx or self.ry:
-            if self.rx and self.ry:
-                pass
+
+    def addElements(self, records):
+        # Tree items for a batch of (index, parent, classType, id) records
+        # in document order. Items are created detached and inserted with
+        # one addChildren() call per parent, which is much faster than
+        # inserting them one by one into a visible tree.
+        items = self.items
+        children = {}
+        for index, parent, classType, id in records:
+            string = classType + ': ' + str(id)
+            item = QtWidgets.QTreeWidgetItem()
+            item.setText(0, string)
+            item.setData(0, Qt.Qt.UserRole, index)
+            item.setFlags(item.flags() | Qt.Qt.ItemIsTristate |
+                          Qt.Qt.ItemIsUserCheckable)
+            item.setCheckState(0, Qt.Qt.Checked)
+            items.append(item)
+            children.setdefault(parent, []).append(item)
+
+            if id is not None:
+                self.classes[id] = index
+
+        # deepest parents first, so every subtree is complete when it is
+        # inserted
+        for parent in sorted(children, reverse=True):
+            if parent >= 0:
+                items[parent].addChildren(children[parent])
             else:
-                if self.rx:
-                    self.ry = self.rx
-                elif self.ry:
-                    self.rx = self.ry
-        else:
-            self.rx = 0
-            self.ry = 0
-
-
-class Circle:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.cx = None
-        self.cy = None
-        self.r = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'cx', 'cy', 'r')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-
-class Ellipse:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.cx = None
-        self.cy = None
-        self.rx = None
-        self.ry = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'cx', 'cy', 'rx', 'ry')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-
-class Line:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.x1 = None
-        self.x2 = None
-        self.y1 = None
-        self.y2 = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'x1', 'x2', 'y1', 'y2')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-
-class Polyline:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.points = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'points')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-
-class Path:
-    def __init__(self, args, classType):
-        self.style = None
-        self.id = None
-        self.d = None
-        self.classType = classType
-
-        validArgs = ('style', 'id', 'd')
-
-        for arg in args:
-            if arg[0] in validArgs:
-                var = 'self.' + arg[0]
-                val = arg[1]
-                str = var + '=' + 'val'
-                exec(str)
-
-
-class Svg:
-    def __init__(self, args, classType):
-        self.classType = classType
-
-
-class G:
-    def __init__(self, args, classType):
-        self.classType = classType
+                self.tree[0].addTopLevelItems(children[parent])
+
+    def changedElements(self, item, hidden):
+        # (index, visible) of elements in the subtree of item whose check
+        # state no longer matches the hidden set.
+        changed = []
+        stack = [item]
+        while stack:
+            item = stack.pop()
+            index = item.data(0, Qt.Qt.UserRole)
+            visible = item.checkState(0) != Qt.Qt.Unchecked
+            if visible == (index in hidden):
+                changed.append((index, visible))
+            stack.extend(item.child(i) for i in range(item.childCount()))
+
+        return changed
 
 
 if __name__ == "__main__":
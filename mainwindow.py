@@ -2,9 +2,10 @@
 
 # Form implementation generated from reading ui file 'mainwindow.ui'
 #
-# Created by: PyQt5 UI code generator 5.14.2
+# Created by: PyQt5 UI code generator 5.15.11
 #
-# WARNING! All changes made in this file will be lost!
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
 
 
 from PyQt5 import QtCore, QtGui, QtWidgets
@@ -78,6 +79,22 @@ class Ui_MainWindow(object):
         self.menuTools = QtWidgets.QMenu(self.menubar)
         self.menuTools.setObjectName("menuTools")
         MainWindow.setMenuBar(self.menubar)
+        self.debugDock = QtWidgets.QDockWidget(MainWindow)
+        self.debugDock.setObjectName("debugDock")
+        self.debugContents = QtWidgets.QWidget()
+        self.debugContents.setObjectName("debugContents")
+        self.debugLayout = QtWidgets.QVBoxLayout(self.debugContents)
+        self.debugLayout.setObjectName("debugLayout")
+        self.debugLabel = QtWidgets.QLabel(self.debugContents)
+        self.debugLabel.setText("")
+        self.debugLabel.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.debugLabel.setObjectName("debugLabel")
+        self.debugLayout.addWidget(self.debugLabel)
+        self.clearCacheButton = QtWidgets.QPushButton(self.debugContents)
+        self.clearCacheButton.setObjectName("clearCacheButton")
+        self.debugLayout.addWidget(self.clearCacheButton)
+        self.debugDock.setWidget(self.debugContents)
+        MainWindow.addDockWidget(QtCore.Qt.DockWidgetArea(2), self.debugDock)
         self.actionOpen = QtWidgets.QAction(MainWindow)
         self.actionOpen.setObjectName("actionOpen")
         self.actionExit = QtWidgets.QAction(MainWindow)
@@ -95,13 +112,30 @@ class Ui_MainWindow(object):
         self.actionSimulation = QtWidgets.QAction(MainWindow)
         self.actionSimulation.setEnabled(False)
         self.actionSimulation.setObjectName("actionSimulation")
+        self.actionSimplify = QtWidgets.QAction(MainWindow)
+        self.actionSimplify.setObjectName("actionSimplify")
+        self.actionOrderPaths = QtWidgets.QAction(MainWindow)
+        self.actionOrderPaths.setCheckable(True)
+        self.actionOrderPaths.setChecked(True)
+        self.actionOrderPaths.setObjectName("actionOrderPaths")
+        self.actionDebug = QtWidgets.QAction(MainWindow)
+        self.actionDebug.setCheckable(True)
+        self.actionDebug.setObjectName("actionDebug")
+        self.actionTolerance = QtWidgets.QAction(MainWindow)
+        self.actionTolerance.setObjectName("actionTolerance")
         self.menuDatoteka.addAction(self.actionOpen)
         self.menuDatoteka.addSeparator()
         self.menuDatoteka.addAction(self.actionExit)
         self.menuView.addAction(self.actionBackground)
         self.menuView.addAction(self.actionOutline)
+        self.menuView.addSeparator()
+        self.menuView.addAction(self.actionDebug)
         self.menuTools.addAction(self.actionGenerate_G_Code)
         self.menuTools.addAction(self.actionSimulation)
+        self.menuTools.addSeparator()
+        self.menuTools.addAction(self.actionTolerance)
+        self.menuTools.addAction(self.actionSimplify)
+        self.menuTools.addAction(self.actionOrderPaths)
         self.menubar.addAction(self.menuDatoteka.menuAction())
         self.menubar.addAction(self.menuTools.menuAction())
         self.menubar.addAction(self.menuView.menuAction())
@@ -115,6 +149,8 @@ class Ui_MainWindow(object):
         self.menuDatoteka.setTitle(_translate("MainWindow", "File"))
         self.menuView.setTitle(_translate("MainWindow", "View"))
         self.menuTools.setTitle(_translate("MainWindow", "Tools"))
+        self.debugDock.setWindowTitle(_translate("MainWindow", "Debug"))
+        self.clearCacheButton.setText(_translate("MainWindow", "Clear Cache"))
         self.actionOpen.setText(_translate("MainWindow", "Open..."))
         self.actionOpen.setShortcut(_translate("MainWindow", "Ctrl+O"))
         self.actionExit.setText(_translate("MainWindow", "Exit"))
@@ -123,6 +159,10 @@ class Ui_MainWindow(object):
         self.actionOutline.setText(_translate("MainWindow", "Outline"))
         self.actionGenerate_G_Code.setText(_translate("MainWindow", "Generate G-Code"))
         self.actionSimulation.setText(_translate("MainWindow", "Simulation"))
+        self.actionSimplify.setText(_translate("MainWindow", "Simplify..."))
+        self.actionOrderPaths.setText(_translate("MainWindow", "Optimise Path Order"))
+        self.actionDebug.setText(_translate("MainWindow", "Debug Panel"))
+        self.actionTolerance.setText(_translate("MainWindow", "Tolerance..."))
 from svgview import SvgView
 
 
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+
+def formatDuration(seconds):
+    seconds = int(round(seconds))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return '%d:%02d:%02d' % (hours, minutes, seconds)
+
+    return '%d:%02d' % (minutes, seconds)
+
+
+class Timeline:
+    # Motion timeline of a plot, computed once for all moves. Move k ends
+    # at point k of the paths: it is a pen-up travel if point k starts a
+    # subpath and a drawn segment otherwise. A last travel returns to the
+    # start. Every move has a trapezoidal speed profile. Speeds at the
+    # junctions of drawn segments are limited by the junction deviation
+    # (like grbl does), the pen stops at every pen up/down. Lengths are
+    # in mm, times in seconds.
+    def __init__(self, paths, settings, start=(0, 0)):
+        start = np.asarray(start, dtype=np.float64)
+        points = paths.points
+        self.starts = np.vstack((start, points))
+        self.ends = np.vstack((points, start))
+        count = len(self.ends)
+
+        self.isDraw = np.ones(count, dtype=bool)
+        self.isDraw[paths.offsets[:-1]] = False
+        self.isDraw[-1] = False
+        # number of drawn segments finished after the first k moves
+        self.drawCount = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(self.isDraw, out=self.drawCount[1:])
+
+        delta = self.ends - self.starts
+        self.lengths = np.hypot(delta[:, 0], delta[:, 1])
+        # drawn length after the first n drawn segments
+        self.drawDistance = np.zeros(self.drawCount[-1] + 1)
+        np.cumsum(self.lengths[self.isDraw], out=self.drawDistance[1:])
+        feed = np.where(self.isDraw, settings.feedRate,
+                        settings.travelRate) / 60.0
+        self.feed = feed
+        accel = self.acceleration = float(settings.acceleration)
+
+        # maximum squared speed at the start of every move (junction j is
+        # between moves j-1 and j), 0 at pen changes and at both ends
+        direction = np.divide(delta, self.lengths[:, None],
+                              out=np.zeros_like(delta),
+                              where=self.lengths[:, None] > 0)
+        cosine = -np.einsum('ij,ij->i', direction[:-1], direction[1:])
+        sine = np.sqrt(np.clip(0.5 * (1 - cosine), 0, 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            junction = accel * settings.junctionDeviation * sine / (1 - sine)
+        junction[sine >= 1 - 1e-9] = np.inf
+        degenerate = (self.lengths[:-1] == 0) | (self.lengths[1:] == 0)
+        junction[degenerate] = np.inf
+        junction = np.minimum(junction, np.minimum(feed[:-1], feed[1:])**2)
+        junction[~(self.isDraw[:-1] & self.isDraw[1:])] = 0
+
+        limit = np.zeros(count + 1)
+        limit[1:-1] = junction
+
+        # backward and forward pass: the squared speed can change by at
+        # most 2*a*length over a move. Both passes are running minimums of
+        # the limits shifted by the cumulative length.
+        distance = np.zeros(count + 1)
+        np.cumsum(2 * accel * self.lengths, out=distance[1:])
+        backward = np.minimum.accumulate((limit + distance)[::-1])[::-1] - \
+            distance
+        speed2 = np.minimum.accumulate(backward - distance) + distance
+        speed2 = np.maximum(np.minimum(speed2, limit), 0)
+
+        self.entry = np.sqrt(speed2[:-1])
+        self.exit = np.sqrt(speed2[1:])
+        peak2 = (2 * accel * self.lengths + speed2[:-1] + speed2[1:]) / 2
+        self.peak = np.sqrt(np.minimum(peak2, feed**2))
+        self.peak = np.maximum(self.peak, np.maximum(self.entry, self.exit))
+        self.accelTime = (self.peak - self.entry) / accel
+        self.decelTime = (self.peak - self.exit) / accel
+        accelLength = (self.peak + self.entry) / 2 * self.accelTime
+        decelLength = (self.peak + self.exit) / 2 * self.decelTime
+        cruise = np.maximum(self.lengths - accelLength - decelLength, 0)
+        self.cruiseTime = np.divide(cruise, self.peak,
+                                    out=np.zeros_like(cruise),
+                                    where=self.peak > 0)
+
+        duration = self.accelTime + self.cruiseTime + self.decelTime
+        self.times = np.zeros(count + 1)
+        np.cumsum(duration, out=self.times[1:])
+
+    def totalTime(self):
+        return float(self.times[-1])
+
+    def drawTime(self):
+        return float(np.diff(self.times)[self.isDraw].sum())
+
+    def drawLength(self, count=None):
+        # Length drawn by the first count segments, all if count is None.
+        if count is None:
+            return float(self.drawDistance[-1])
+
+        return float(self.drawDistance[min(max(count, 0),
+                                           len(self.drawDistance) - 1)])
+
+    def moveAt(self, time):
+        return int(np.clip(np.searchsorted(self.times, time, 'right') - 1,
+                           0, len(self.lengths) - 1))
+
+    def countAt(self, time):
+        # Number of drawn segments finished at the given time.
+        return int(self.drawCount[np.searchsorted(self.times[1:], time,
+                                                  'right')])
+
+    def timeOfCount(self, count):
+        # Time at which the given number of drawn segments is finished.
+        if count <= 0:
+            return 0.0
+        count = min(count, int(self.drawCount[-1]))
+        move = int(np.searchsorted(self.drawCount, count))
+
+        return float(self.times[move])
+
+    def positionAt(self, time):
+        # Pen position at the given time and whether the pen is down.
+        move = self.moveAt(time)
+        t = min(max(time - self.times[move], 0), self.times[move + 1] -
+                self.times[move])
+        entry = self.entry[move]
+        peak = self.peak[move]
+        accel = self.acceleration
+
+        t1 = min(t, self.accelTime[move])
+        distance = entry * t1 + accel * t1**2 / 2
+        t2 = min(max(t - self.accelTime[move], 0), self.cruiseTime[move])
+        distance += peak * t2
+        t3 = max(t - self.accelTime[move] - self.cruiseTime[move], 0)
+        distance += peak * t3 - accel * t3**2 / 2
+
+        length = self.lengths[move]
+        fraction = min(distance / length, 1) if length > 0 else 1
+        position = self.starts[move] + fraction * \
+            (self.ends[move] - self.starts[move])
+
+        return position, bool(self.isDraw[move])
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+# Segments count as collinear if their directions differ by less than
+# tolerance / LINE_LENGTH, i.e. by less than the tolerance over this length
+# in mm.
+LINE_LENGTH = 100
+
+
+def drawLength(paths):
+    # Total pen-down distance.
+    if paths.pointCount() < 2:
+        return 0.0
+
+    steps = np.diff(paths.points, axis=0)
+    lengths = np.hypot(steps[:, 0], steps[:, 1])
+
+    return float(lengths[paths.segmentMask()].sum())
+
+
+def coveredIntervals(keys, starts, ends):
+    # For intervals sorted by key and start: the largest end of the
+    # preceding intervals with the same key, -inf for the first of a key.
+    # The running maximum of all keys is taken at once, with every key
+    # shifted above the ends of the previous one.
+    group = np.zeros(len(keys), dtype=np.int64)
+    group[1:] = np.cumsum(keys[1:] != keys[:-1])
+    low = starts.min()
+    span = ends.max() - low + 1
+    shift = group * span - low
+
+    reached = np.maximum.accumulate(ends + shift)
+    previous = np.full(len(keys), -np.inf)
+    previous[1:] = reached[:-1] - shift[1:]
+    previous[np.append(True, group[1:] != group[:-1])] = -np.inf
+
+    return previous
+
+
+def spanCells(low, high):
+    # All cells from low to high of every row, as the row and the cell of
+    # each of them.
+    counts = high - low + 1
+    rows = np.repeat(np.arange(len(low)), counts)
+    cells = np.arange(counts.sum()) - \
+        np.repeat(np.cumsum(counts) - counts - low, counts)
+
+    return rows, cells
+
+
+def lineDistance(P, A, D):
+    # Distance of points P from the lines through A in directions D.
+    cross = D[:, 0] * (P[:, 1] - A[:, 1]) - D[:, 1] * (P[:, 0] - A[:, 0])
+
+    return np.abs(cross) / np.hypot(D[:, 0], D[:, 1])
+
+
+def removeOverlaps(paths, tolerance):
+    # Remove the parts of segments which earlier segments draw again, in
+    # either direction, splitting segments where the overlap is inside.
+    # Segments are hashed to a uniform grid over the lines they lie on
+    # (direction and distance from the origin). Every segment goes into
+    # all cells its tolerance band touches, so segments within the
+    # tolerance always share a cell. Overlapping segments of a cell are
+    # then confirmed with their exact distance. Subpaths are split where
+    # parts are removed, joinPaths can merge them again.
+    if tolerance <= 0 or paths.pointCount() < 2:
+        return paths
+
+    points = paths.points
+    index = np.flatnonzero(paths.segmentMask())
+    A = points[index]
+    B = points[index + 1]
+    D = B - A
+    lengths = np.hypot(D[:, 0], D[:, 1])
+    count = len(index)
+
+    # direction in [0, pi), so both directions of a line get the same
+    # cells, which are at least two steps wide
+    live = np.flatnonzero(lengths > 0)
+    if len(live) < 2:
+        return paths
+    step = tolerance / LINE_LENGTH
+    steps = max(int(np.pi / (2 * step)), 1)
+    width = np.pi / steps
+    angle = np.arctan2(D[live, 1], D[live, 0]) % np.pi
+    segment, angle = spanCells(
+        np.floor((angle - step / 2) / width).astype(np.int64),
+        np.floor((angle + step / 2) / width).astype(np.int64))
+    segment = live[segment]
+    angle %= steps
+
+    # distance from the origin along the normal of the cell, in cells two
+    # tolerances wide covering both ends
+    cos, sin = np.cos(angle * width), np.sin(angle * width)
+    cellA, cellB = A[segment], B[segment]
+    dA = cellA[:, 1] * cos - cellA[:, 0] * sin
+    dB = cellB[:, 1] * cos - cellB[:, 0] * sin
+    rows, offset = spanCells(
+        np.floor((np.minimum(dA, dB) - tolerance / 2) /
+                 (2 * tolerance)).astype(np.int64),
+        np.floor((np.maximum(dA, dB) + tolerance / 2) /
+                 (2 * tolerance)).astype(np.int64))
+    limit = 2 * int(np.abs(offset).max()) + 1
+    keys = angle[rows] * limit + offset
+
+    # position of both ends along the cell
+    tA = (cellA[:, 0] * cos + cellA[:, 1] * sin)[rows]
+    tB = (cellB[:, 0] * cos + cellB[:, 1] * sin)[rows]
+    segment = segment[rows]
+    starts = np.minimum(tA, tB)
+    ends = np.maximum(tA, tB)
+
+    # only cells with more than one segment are sorted by position
+    select = np.argsort(keys)
+    same = keys[select[1:]] == keys[select[:-1]]
+    shared = np.zeros(len(select), dtype=bool)
+    shared[1:] = same
+    shared[:-1] |= same
+    select = select[shared]
+    if not len(select):
+        return paths
+    order = select[np.lexsort((starts[select], keys[select]))]
+
+    # pairs of overlapping segments in a cell: every interval with all
+    # following ones of its cell which start before it ends, found at once
+    # with every cell shifted above the previous one
+    keys = keys[order]
+    group = np.zeros(len(order), dtype=np.int64)
+    group[1:] = np.cumsum(keys[1:] != keys[:-1])
+    low = starts[order].min()
+    span = ends[order].max() - low + 2 * tolerance + 1
+    shift = group * span - low
+    last = np.searchsorted(starts[order] + shift,
+                           ends[order] + shift + tolerance, 'right')
+    first, second = spanCells(np.arange(1, len(order) + 1), last - 1)
+
+    # segments may share several cells, every pair is compared once with
+    # the earlier segment X covering the later one Y
+    X = segment[order[first]]
+    Y = segment[order[second]]
+    pairs = np.unique(np.minimum(X, Y) * count + np.maximum(X, Y))
+    X, Y = np.divmod(pairs, count)
+    X, Y = X[X != Y], Y[X != Y]
+
+    # the part of Y next to X, as parameters along Y, has to lie within
+    # the tolerance of the line of X
+    DY = D[Y]
+    squared = lengths[Y] ** 2
+    fromA = np.einsum('ij,ij->i', A[X] - A[Y], DY) / squared
+    fromB = np.einsum('ij,ij->i', B[X] - A[Y], DY) / squared
+    lo = np.clip(np.minimum(fromA, fromB), 0, 1)
+    hi = np.clip(np.maximum(fromA, fromB), 0, 1)
+    close = \
+        (lineDistance(A[Y] + lo[:, None] * DY, A[X], D[X]) <= tolerance) & \
+        (lineDistance(A[Y] + hi[:, None] * DY, A[X], D[X]) <= tolerance)
+    Y, lo, hi = Y[close], lo[close], hi[close]
+    if not len(Y):
+        return paths
+
+    # the covered parts of every Y are runs of intervals without a gap
+    # wider than the tolerance; parts within the tolerance of an end reach
+    # the end, shorter parts (unless they cover the whole segment) are not
+    # worth a pen lift
+    order = np.lexsort((lo, Y))
+    Y, lo, hi = Y[order], lo[order], hi[order]
+    slack = tolerance / lengths[Y]
+    begin = np.flatnonzero(~(lo <= coveredIntervals(Y, lo, hi) + slack))
+    covered = Y[begin]
+    low = lo[begin]
+    high = np.maximum.reduceat(hi, begin)
+    slack = slack[begin]
+    low[low <= slack] = 0
+    high[high >= 1 - slack] = 1
+    wide = (high - low > slack) | ((low == 0) & (high == 1))
+    covered, low, high = covered[wide], low[wide], high[wide]
+    if not len(covered):
+        return paths
+
+    # the pieces of every segment between its covered parts, as the
+    # sorted starts and the sorted ends of all of them paired up
+    segments = np.concatenate((np.arange(count), covered))
+    starts = np.concatenate((np.zeros(count), high))
+    ends = np.concatenate((np.ones(count), low))
+    ends = ends[np.lexsort((ends, segments))]
+    order = np.lexsort((starts, segments))
+    segments, starts = segments[order], starts[order]
+    piece = ends > starts
+    segments, starts, ends = segments[piece], starts[piece], ends[piece]
+
+    # uncut ends keep their exact coordinates
+    P = A[segments]
+    Q = B[segments]
+    moved = np.flatnonzero(starts > 0)
+    P[moved] += starts[moved, None] * D[segments[moved]]
+    moved = np.flatnonzero(ends < 1)
+    Q[moved] = A[segments[moved]] + ends[moved, None] * D[segments[moved]]
+
+    return paths.segmentPieces(segments, P, Q)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+from createPaths import getElementPath
+from flatten import DEFAULT_TOLERANCE
+from geometryCache import geometryCache, geometryDigest
+from pathArray import PathArray
+
+# Elements flattened by one task. Also the progress reporting interval.
+CHUNK_SIZE = 1000
+# Below this number of elements to flatten, starting and feeding the
+# worker processes costs more than it saves.
+PARALLEL_MIN_ELEMENTS = 4000
+
+executor = None
+executorWorkers = 0
+executorLock = threading.Lock()
+
+
+def workerCount(workers=0):
+    # Number of processes for the workers setting, 0 means all CPU cores.
+    if workers > 0:
+        return workers
+
+    return os.cpu_count() or 1
+
+
+def getExecutor(workers):
+    # Process pool shared by all documents. The processes are started with
+    # spawn on every platform: forking the multithreaded GUI process is not
+    # safe.
+    global executor, executorWorkers
+    with executorLock:
+        if executor is None or executorWorkers != workers:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            executor = concurrent.futures.ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context('spawn'))
+            executorWorkers = workers
+
+        return executor
+
+
+def shutdown():
+    global executor
+    with executorLock:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+            executor = None
+
+
+def flattenChunk(elements, tolerances):
+    # Runs in a worker process. Paths of the elements are packed into one
+    # points and one offsets array, so the result is a few large arrays
+    # instead of thousands of small pickled objects. pointCounts is -1 for
+    # elements without geometry. The digests of elements which were not
+    # hashed yet are computed here as well, and equal elements of the
+    # chunk are flattened once.
+    digests = [geometryDigest(element) if element.digest is None
+               else element.digest for element in elements]
+    paths = []
+    flattened = {}
+    for element, tolerance, digest in zip(elements, tolerances, digests):
+        key = (element.classType, digest, tolerance)
+        if key not in flattened:
+            flattened[key] = getElementPath(element, tolerance)
+        paths.append(flattened[key])
+    present = [path for path in paths if path is not None]
+    pointCounts = np.array([-1 if path is None else path.pointCount()
+                            for path in paths], dtype=np.int64)
+    offsetCounts = np.array([0 if path is None else len(path.offsets)
+                             for path in paths], dtype=np.int64)
+    if present:
+        points = np.concatenate([path.points for path in present])
+        offsets = np.concatenate([path.offsets for path in present])
+    else:
+        points = np.empty((0, 2))
+        offsets = np.empty(0, dtype=np.int64)
+
+    return points, offsets, pointCounts, offsetCounts, digests
+
+
+def unpackChunk(points, offsets, pointCounts, offsetCounts):
+    # Inverse of flattenChunk, without the digests. Arrays are copied, so
+    # every cached path owns its memory.
+    paths = []
+    point = 0
+    offset = 0
+    for pointCount, offsetCount in zip(pointCounts.tolist(),
+                                       offsetCounts.tolist()):
+        if pointCount < 0:
+            paths.append(None)
+            continue
+        paths.append(PathArray(points[point:point + pointCount].copy(),
+                               offsets[offset:offset + offsetCount].copy()))
+        point += pointCount
+        offset += offsetCount
+
+    return paths
+
+
+def flattenElements(elements, tolerance=DEFAULT_TOLERANCE,
+                    cache=geometryCache, workers=0, progress=None):
+    # Flattened paths of all elements in document order, None for elements
+    # which draw nothing. tolerance is one value for all elements or a
+    # sequence with a value per element. Geometry found in the cache is
+    # reused and equal elements are flattened once. The rest is split in
+    # chunks which are flattened in a process pool, if there are enough of
+    # them and more than one worker. progress(done, total) is called after
+    # every chunk and may raise to stop.
+    #
+    # Hashing the elements for the cache keys takes time as well. Elements
+    # which were never hashed are left to the worker processes, if there
+    # are enough of them, and looked up when their paths come back.
+    if np.ndim(tolerance) == 0:
+        tolerances = [tolerance] * len(elements)
+    else:
+        tolerances = [float(value) for value in tolerance]
+    workers = workerCount(workers)
+    unhashed = []
+    if workers > 1:
+        unhashed = [index for index, element in enumerate(elements)
+                    if element.digest is None]
+        if len(unhashed) < PARALLEL_MIN_ELEMENTS:
+            unhashed = []
+    paths = [None] * len(elements)
+    missing = {}
+    hashed = np.ones(len(elements), dtype=bool)
+    hashed[unhashed] = False
+    for index in np.flatnonzero(hashed).tolist():
+        key = cache.key(elements[index], tolerances[index])
+        missing.setdefault(key, []).append(index)
+    for key in list(missing):
+        found, path = cache.lookup(key)
+        if found:
+            for index in missing.pop(key):
+                paths[index] = path
+
+    missing = list(missing.items()) + [(None, [index]) for index in unhashed]
+    total = len(missing)
+    chunks = [missing[start:start + CHUNK_SIZE]
+              for start in range(0, total, CHUNK_SIZE)]
+
+    def store(chunk, chunkPaths, digests=None):
+        for position, ((key, indices), path) in enumerate(
+                zip(chunk, chunkPaths)):
+            if key is None:
+                element = elements[indices[0]]
+                element.digest = digests[position]
+                key = cache.key(element, tolerances[indices[0]])
+                found, cached = cache.lookup(key)
+                if found:
+                    path = cached
+            path = cache.insert(key, path)
+            for index in indices:
+                paths[index] = path
+
+    if workers == 1 or total < PARALLEL_MIN_ELEMENTS:
+        done = 0
+        for chunk in chunks:
+            store(chunk, [getElementPath(elements[indices[0]],
+                                         tolerances[indices[0]])
+                          for _, indices in chunk])
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+        return paths
+
+    pool = getExecutor(workers)
+    futures = {pool.submit(flattenChunk,
+                           [elements[indices[0]] for _, indices in chunk],
+                           [tolerances[indices[0]] for _, indices in chunk]):
+               chunk for chunk in chunks}
+    done = 0
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            chunk = futures[future]
+            *packed, digests = future.result()
+            store(chunk, unpackChunk(*packed), digests)
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return paths
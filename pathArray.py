@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+
+class PathArray:
+    # Compact container for a set of polylines (subpaths). All points are
+    # stored in one contiguous float64 array of shape (N, 2). Subpath i
+    # spans points[offsets[i]:offsets[i+1]], so len(offsets) is always
+    # number of subpaths + 1. owners optionally holds the index of the
+    # element every point was generated from; a segment belongs to the
+    # owner of its first point, so strokes merged from several elements
+    # keep the owner of every segment.
+    __slots__ = ('points', 'offsets', 'owners')
+
+    def __init__(self, points=None, offsets=None, owners=None):
+        if points is None:
+            points = np.empty((0, 2))
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.points = self.points.reshape(-1, 2)
+
+        if offsets is None:
+            if len(self.points):
+                offsets = (0, len(self.points))
+            else:
+                offsets = (0,)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+        if owners is not None:
+            owners = np.asarray(owners, dtype=np.int64)
+        self.owners = owners
+
+    @classmethod
+    def fromSubpaths(cls, subpaths):
+        subpaths = [np.asarray(sub, dtype=np.float64).reshape(-1, 2)
+                    for sub in subpaths]
+        subpaths = [sub for sub in subpaths if len(sub)]
+        if not subpaths:
+            return cls()
+
+        offsets = np.zeros(len(subpaths) + 1, dtype=np.int64)
+        np.cumsum([len(sub) for sub in subpaths], out=offsets[1:])
+
+        return cls(np.concatenate(subpaths), offsets)
+
+    @classmethod
+    def concatenate(cls, paths):
+        paths = [path for path in paths if path.pointCount()]
+        if not paths:
+            return cls()
+        if len(paths) == 1:
+            return paths[0]
+
+        points = np.concatenate([path.points for path in paths])
+        shift = np.cumsum([0] + [path.pointCount() for path in paths[:-1]])
+        offsets = np.concatenate(
+            [[0]] + [path.offsets[1:] + s for path, s in zip(paths, shift)])
+
+        owners = None
+        if all(path.owners is not None for path in paths):
+            owners = np.concatenate([path.owners for path in paths])
+
+        return cls(points, offsets, owners)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('subpath index out of range')
+
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def pointCount(self):
+        return len(self.points)
+
+    def lengths(self):
+        # Number of points in every subpath.
+        return np.diff(self.offsets)
+
+    def segmentMask(self):
+        # True for every point index i where (points[i], points[i+1]) is a
+        # drawn segment, i.e. both points belong to the same subpath.
+        mask = np.ones(max(len(self.points) - 1, 0), dtype=bool)
+        ends = self.offsets[1:-1] - 1
+        mask[ends[ends < len(mask)]] = False
+
+        return mask
+
+    def segments(self):
+        # All drawn segments as an (M, 4) array of x1, y1, x2, y2.
+        if len(self.points) < 2:
+            return np.empty((0, 4))
+
+        mask = self.segmentMask()
+        return np.hstack((self.points[:-1][mask], self.points[1:][mask]))
+
+    def segmentOwners(self):
+        # Owner of every segment returned by segments().
+        if self.owners is None:
+            return None
+
+        return self.owners[:-1][self.segmentMask()]
+
+    def keepSegments(self, kept, A, B, dots=None):
+        # New PathArray with the segments flagged in kept, in the order of
+        # segments(). A and B are the (possibly moved) start and end points
+        # of all segments. Subpaths are split where a segment is dropped or
+        # where the point between two segments moved. Single points are
+        # kept where dots (one flag per single point subpath) is set, all
+        # of them if it is None.
+        kept = np.flatnonzero(kept)
+        return self.segmentPieces(kept, A[kept], B[kept], dots)
+
+    def segmentPieces(self, segments, A, B, dots=None):
+        # New PathArray from pieces of segments, like keepSegments. For
+        # every piece, segments holds the index of its segment in the order
+        # of segments(), increasing, and A and B its start and end point. A
+        # segment may have several pieces, subpaths are split between them.
+        index = np.flatnonzero(self.segmentMask())[segments]
+        first = np.ones(len(index), dtype=bool)
+        first[1:] = (index[1:] != index[:-1] + 1) | \
+            (A[1:] != B[:-1]).any(axis=1)
+
+        # every piece adds its end point, a new subpath its start too
+        last = np.cumsum(1 + first) - 1
+        points = np.empty((last[-1] + 1 if len(last) else 0, 2))
+        points[last] = B
+        points[last[first] - 1] = A[first]
+        starts = last[first] - 1
+
+        # every point gets the owner of the segment which starts there, the
+        # last point of a subpath that of the segment which ends there
+        owners = None
+        if self.owners is not None:
+            segmentOwners = self.owners[index]
+            owners = np.empty(len(points), dtype=np.int64)
+            owners[last] = segmentOwners
+            owners[last - 1] = segmentOwners
+
+        # subpath every new subpath comes from
+        subpaths = np.searchsorted(self.offsets, index[first],
+                                   'right') - 1
+        single = np.flatnonzero(self.lengths() == 1)
+        if dots is not None:
+            single = single[dots]
+        if len(single):
+            starts = np.append(starts, np.arange(len(single)) + len(points))
+            points = np.vstack((points, self.points[self.offsets[single]]))
+            subpaths = np.append(subpaths, single)
+            if owners is not None:
+                owners = np.append(owners, self.owners[self.offsets[single]])
+
+        paths = PathArray(points, np.append(starts, len(points)), owners)
+        if not len(single):
+            return paths
+
+        # back in the original subpath order
+        order = np.argsort(subpaths, kind='stable')
+        lengths = paths.lengths()[order]
+        offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.arange(offsets[-1]) + \
+            np.repeat(paths.offsets[order] - offsets[:-1], lengths)
+
+        return PathArray(paths.points[gather], offsets,
+                         None if owners is None else owners[gather])
+
+    def withOwner(self, owner):
+        return PathArray(self.points, self.offsets,
+                         np.full(len(self.points), owner, dtype=np.int64))
+
+    def copy(self):
+        owners = None if self.owners is None else self.owners.copy()
+        return PathArray(self.points.copy(), self.offsets.copy(), owners)
+
+
+class OwnerIndex:
+    # Segments of every owner, so the segments of a few elements are found
+    # without going over all of them. The segment indices sorted by owner
+    # (stable, so in order) and where every owner starts among them.
+    __slots__ = ('order', 'offsets')
+
+    def __init__(self, owners):
+        owners = np.asarray(owners, dtype=np.int64)
+        self.order = np.argsort(owners, kind='stable')
+        self.offsets = np.searchsorted(
+            owners[self.order],
+            np.arange((owners.max() + 2) if len(owners) else 1))
+
+    def segments(self, owners):
+        # Indices of the segments of the given owners, increasing for
+        # every owner.
+        owners = [owner for owner in owners
+                  if 0 <= owner < len(self.offsets) - 1]
+        if not owners:
+            return np.empty(0, dtype=np.int64)
+
+        return np.concatenate([
+            self.order[self.offsets[owner]:self.offsets[owner + 1]]
+            for owner in owners])
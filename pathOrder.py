@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import time
+
+import numpy as np
+
+from pathArray import PathArray
+
+# Number of following paths a 2-opt move is tried against.
+TWO_OPT_WINDOW = 1000
+
+
+def travelLength(paths, start=(0, 0)):
+    # Total pen-up distance: from start to the first path and between the
+    # end of every path and the start of the next one.
+    if not len(paths):
+        return 0.0
+
+    starts = paths.points[paths.offsets[:-1]]
+    ends = np.vstack((start, paths.points[paths.offsets[1:] - 1]))[:-1]
+
+    return float(np.hypot(*(starts - ends).T).sum())
+
+
+class EndpointGrid:
+    # Uniform grid over both end points of every path, used to find the
+    # nearest end point of a path which has not been plotted yet. End point
+    # 2*i is the start and 2*i+1 the end of path i.
+    def __init__(self, points):
+        self.points = points
+        self.coordinates = points.tolist()
+        self.build(np.arange(len(points)))
+
+    def build(self, ids):
+        points = self.points[ids]
+        low = points.min(axis=0)
+        size = np.ptp(points, axis=0).max()
+        self.cellSize = max(size / max(np.sqrt(len(ids)), 1), 1e-6)
+        self.origin = low
+
+        cells = np.floor((points - low) / self.cellSize).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1
+        keys = cells[:, 0] * self.shape[1] + cells[:, 1]
+
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        split = np.flatnonzero(np.diff(keys)) + 1
+        self.cells = {}
+        for key, members in zip(keys[np.append(0, split)].tolist(),
+                                np.split(ids[order], split)):
+            self.cells[key] = members.tolist()
+
+        self.count = len(ids)
+        self.builtCount = len(ids)
+
+    def remove(self, path):
+        for id in (2*path, 2*path + 1):
+            cell = np.floor((self.points[id] - self.origin) / self.cellSize)
+            cell = np.clip(cell.astype(np.int64), 0, self.shape - 1)
+            self.cells[cell[0] * self.shape[1] + cell[1]].remove(id)
+        self.count -= 2
+
+        # a sparse grid makes searches slow, so rebuild it with larger cells
+        if self.count and self.count * 4 < self.builtCount:
+            self.build(np.array([id for members in self.cells.values()
+                                 for id in members], dtype=np.int64))
+
+    def nearest(self, point):
+        cell = np.floor((point - self.origin) / self.cellSize).astype(np.int64)
+        cx, cy = cell.tolist()
+        sx, sy = self.shape.tolist()
+        px, py = point.tolist()
+        coordinates = self.coordinates
+        best = None
+        bestDistance = np.inf
+
+        # search square rings of cells around the point, starting with the
+        # first one which touches the grid
+        first = max(0, -cx, cx - sx + 1, -cy, cy - sy + 1)
+        last = max(cx, sx - 1 - cx, cy, sy - 1 - cy)
+        for ring in range(first, last + 1):
+            for x in range(max(cx - ring, 0), min(cx + ring, sx - 1) + 1):
+                if abs(x - cx) == ring:
+                    ys = range(max(cy - ring, 0), min(cy + ring, sy - 1) + 1)
+                else:
+                    ys = [y for y in (cy - ring, cy + ring) if 0 <= y < sy]
+                for y in ys:
+                    for id in self.cells.get(x * sy + y, ()):
+                        x1, y1 = coordinates[id]
+                        distance = (x1 - px)**2 + (y1 - py)**2
+                        if distance < bestDistance:
+                            best = id
+                            bestDistance = distance
+
+            # everything outside this ring is at least ring cells away
+            if best is not None and \
+                    np.sqrt(bestDistance) <= ring * self.cellSize:
+                break
+
+        return best
+
+
+def nearestNeighbourOrder(starts, ends, start):
+    # Greedy order: always continue with the closest unplotted end point,
+    # reversing the path if that is its end. Returns path indices and a
+    # reversed flag for each of them.
+    count = len(starts)
+    endpoints = np.empty((2 * count, 2))
+    endpoints[0::2] = starts
+    endpoints[1::2] = ends
+
+    grid = EndpointGrid(endpoints)
+    order = np.empty(count, dtype=np.int64)
+    reverse = np.zeros(count, dtype=bool)
+    position = np.asarray(start, dtype=np.float64)
+
+    for i in range(count):
+        id = grid.nearest(position)
+        path = id // 2
+        order[i] = path
+        reverse[i] = id % 2
+        grid.remove(path)
+        position = endpoints[id ^ 1]
+
+    return order, reverse
+
+
+def twoOpt(starts, ends, start, timeBudget):
+    # Improve the order by reversing runs of paths (which also reverses
+    # every path in the run) while that shortens the travel. starts and
+    # ends are in plotting order and are modified in place.
+    count = len(starts)
+    order = np.arange(count)
+    reverse = np.zeros(count, dtype=bool)
+    deadline = time.perf_counter() + timeBudget
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(count):
+            if time.perf_counter() > deadline:
+                break
+
+            previous = ends[i - 1] if i else np.asarray(start)
+            last = min(i + TWO_OPT_WINDOW, count)
+            E = ends[i:last]
+            following = np.zeros(last - i, dtype=bool)
+            # zeros where no path follows, so the masked terms stay 0
+            S = np.zeros_like(E)
+            S[:-1] = starts[i + 1:last]
+            if last < count:
+                S[-1] = starts[last]
+                following[:] = True
+            else:
+                following[:-1] = True
+
+            # old edges: previous->starts[i] and ends[j]->starts[j+1]
+            # new edges: previous->ends[j] and starts[i]->starts[j+1]
+            old = np.hypot(*(previous - starts[i])) + \
+                np.hypot(*(E - S).T) * following
+            new = np.hypot(*(previous - E).T) + \
+                np.hypot(*(starts[i] - S).T) * following
+            delta = new - old
+            j = int(np.argmin(delta))
+            if delta[j] > -1e-9:
+                continue
+
+            j += i + 1
+            starts[i:j], ends[i:j] = ends[i:j][::-1].copy(), \
+                starts[i:j][::-1].copy()
+            order[i:j] = order[i:j][::-1]
+            reverse[i:j] = ~reverse[i:j][::-1]
+            improved = True
+
+    return order, reverse
+
+
+def orderPaths(paths, twoOptTime=0, start=(0, 0)):
+    # Reorder (and reverse where useful) the subpaths of a PathArray to
+    # reduce pen-up travel. Optionally refine the greedy order with 2-opt
+    # for up to twoOptTime seconds.
+    if len(paths) < 2:
+        return paths
+
+    starts = paths.points[paths.offsets[:-1]]
+    ends = paths.points[paths.offsets[1:] - 1]
+    order, reverse = nearestNeighbourOrder(starts, ends, start)
+
+    if twoOptTime > 0:
+        S = np.where(reverse[:, None], ends[order], starts[order])
+        E = np.where(reverse[:, None], starts[order], ends[order])
+        refined, flipped = twoOpt(S, E, start, twoOptTime)
+        order = order[refined]
+        reverse = reverse[refined] ^ flipped
+
+    return reorder(paths, order, reverse)
+
+
+def reorder(paths, order, reverse):
+    # Build a new PathArray with subpaths in the given order, reversing
+    # those flagged in reverse. Done with a single gather.
+    lengths = paths.lengths()[order]
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    # index of every output point in the input points
+    local = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    first = np.repeat(paths.offsets[order], lengths)
+    flip = np.repeat(reverse, lengths)
+    index = np.where(flip, first + np.repeat(lengths, lengths) - 1 - local,
+                     first + local)
+
+    # a reversed segment starts at the point after its first one
+    owners = None if paths.owners is None else \
+        paths.owners[np.where(flip, np.maximum(index - 1, first), index)]
+
+    return PathArray(paths.points[index], offsets, owners)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+from clip import clipPaths, fitPaths
+from joinPaths import joinPaths
+from overlaps import drawLength, removeOverlaps
+from pathOrder import orderPaths, travelLength
+from simplify import simplifyPaths
+
+
+def processPaths(paths, settings, report=None):
+    # Optimisation stages which run between path generation and output
+    # (simulation and G-code). Statistics of every stage are stored in
+    # report, if given.
+    if report is None:
+        report = {}
+
+    if settings.fitToPage:
+        paths, report['scale'] = fitPaths(paths, settings.workArea)
+
+    if settings.clipToWorkArea:
+        clipped = clipPaths(paths, settings.workArea)
+        if clipped is not paths:
+            report['clipped'] = drawLength(paths) - drawLength(clipped)
+        paths = clipped
+
+    if settings.overlapTolerance > 0:
+        before = drawLength(paths)
+        paths = removeOverlaps(paths, settings.overlapTolerance)
+        report['draw'] = (before, drawLength(paths))
+
+    if settings.joinTolerance > 0:
+        before = len(paths)
+        paths = joinPaths(paths, settings.joinTolerance)
+        report['strokes'] = (before, len(paths))
+
+    if settings.simplifyTolerance > 0:
+        before = paths.pointCount()
+        paths = simplifyPaths(paths, settings.simplifyTolerance)
+        report['points'] = (before, paths.pointCount())
+
+    if settings.orderPaths:
+        before = travelLength(paths)
+        paths = orderPaths(paths, settings.twoOptTime)
+        report['travel'] = (before, travelLength(paths))
+
+    return paths
+
+
+def formatReport(report):
+    messages = []
+    if 'scale' in report:
+        messages.append('scaled %.3gx' % report['scale'])
+    if 'clipped' in report:
+        messages.append('clipped %.0f mm' % report['clipped'])
+    if 'draw' in report:
+        messages.append('draw %.0f -> %.0f mm' % report['draw'])
+    if 'strokes' in report:
+        messages.append('strokes %d -> %d' % report['strokes'])
+    if 'points' in report:
+        messages.append('points %d -> %d' % report['points'])
+    if 'travel' in report:
+        messages.append('travel %.0f -> %.0f mm' % report['travel'])
+
+    return ', '.join(messages)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import collections
+import os
+import select
+import threading
+import time
+
+try:
+    import serial
+except ImportError:
+    # without pyserial only POSIX serial devices (and ptys) can be opened
+    serial = None
+
+if os.name == 'posix':
+    import termios
+    import tty
+else:
+    termios = None
+
+# Serial receive buffer of the controller in bytes (grbl: 128).
+RX_BUFFER_SIZE = 128
+BAUDRATE = 115200
+# Longest wait for a response before pending commands are handled, in s.
+POLL_INTERVAL = 0.02
+# Wait for the greeting of a controller which resets when the port is
+# opened, in s.
+STARTUP_TIMEOUT = 2.0
+# Line and byte rates are averaged over this many seconds.
+RATE_WINDOW = 1.0
+# Status report interval while the last moves run, in s.
+STATUS_INTERVAL = 0.2
+
+# grbl realtime commands, handled as soon as they are received.
+FEED_HOLD = b'!'
+CYCLE_START = b'~'
+STATUS_REPORT = b'?'
+SOFT_RESET = b'\x18'
+
+
+class SerialPort:
+    # Line based access to a serial device. pyserial is used if it is
+    # installed, otherwise the device is opened directly (POSIX only).
+    def __init__(self, name, baudrate=BAUDRATE):
+        self.buffer = b''
+        self.port = None
+        self.fd = None
+        if serial is not None:
+            self.port = serial.Serial(name, baudrate, timeout=0)
+        elif termios is not None:
+            self.fd = os.open(name, os.O_RDWR | os.O_NOCTTY)
+            tty.setraw(self.fd, termios.TCSANOW)
+            attributes = termios.tcgetattr(self.fd)
+            speed = getattr(termios, 'B%d' % baudrate, None)
+            if speed is not None:
+                attributes[4] = attributes[5] = speed
+                termios.tcsetattr(self.fd, termios.TCSANOW, attributes)
+        else:
+            raise RuntimeError('pyserial is needed to open %s' % name)
+
+    def write(self, data):
+        if self.port is not None:
+            self.port.write(data)
+            return
+
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def read(self, timeout):
+        # Bytes received within timeout seconds, b'' if there are none.
+        if self.port is not None:
+            self.port.timeout = timeout
+            return self.port.read(max(self.port.in_waiting, 1))
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return os.read(self.fd, 4096) if ready else b''
+
+    def readLine(self, timeout):
+        # Next received line without the line end, None if no complete
+        # line arrives within timeout seconds.
+        deadline = time.perf_counter() + timeout
+        while b'\n' not in self.buffer:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            self.buffer += self.read(remaining)
+        line, _, self.buffer = self.buffer.partition(b'\n')
+
+        return line.strip().decode('ascii', 'replace')
+
+    def close(self):
+        if self.port is not None:
+            self.port.close()
+        elif self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class Sender:
+    # Streams G-code to a grbl compatible controller from a background
+    # thread. lines yields (line, drawn segments done after the line), see
+    # gcode.gcodeLines. Lines are sent as long as all unacknowledged lines
+    # fit into the receive buffer of the controller (character counting),
+    # so its planner always has the next moves instead of waiting for the
+    # round trip of every 'ok'. maxLines=1 gives plain send and wait.
+    # pause(), resume() and stop() are safe to call from other threads,
+    # the realtime commands are written by the sender thread.
+    def __init__(self, port, lines, bufferSize=RX_BUFFER_SIZE,
+                 maxLines=None):
+        self.port = port
+        self.lines = lines
+        self.bufferSize = bufferSize
+        self.maxLines = maxLines
+
+        self.lock = threading.Lock()
+        self.commands = collections.deque()
+        self.thread = None
+        self.isPaused = False
+        self.isStopped = False
+
+        self.state = 'idle'
+        self.error = None
+        # (size, segment count) of sent lines without a response
+        self.inFlight = collections.deque()
+        self.inFlightBytes = 0
+        self.linesSent = 0
+        self.linesAcked = 0
+        self.bytesAcked = 0
+        self.segmentCount = 0
+        self.errors = []
+        self.messages = []
+        self.status = None
+        # (time, bytes) of recent acknowledgements for the rates
+        self.acks = collections.deque()
+        self.startTime = None
+        self.endTime = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wait(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def isRunning(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def pause(self):
+        # Feed hold: the machine decelerates to a stop and no more lines
+        # are sent until resume().
+        with self.lock:
+            if self.state == 'streaming':
+                self.isPaused = True
+                self.state = 'paused'
+                self.commands.append(FEED_HOLD)
+
+    def resume(self):
+        with self.lock:
+            if self.state == 'paused':
+                self.isPaused = False
+                self.state = 'streaming'
+                self.commands.append(CYCLE_START)
+
+    def stop(self):
+        # Stops the machine at once (feed hold and soft reset) and ends the
+        # stream. Lines in the controller's buffers are dropped.
+        with self.lock:
+            if self.thread is not None and not self.isStopped:
+                self.isStopped = True
+                self.commands.append(FEED_HOLD + SOFT_RESET)
+
+    def statistics(self):
+        with self.lock:
+            now = self.endTime or time.perf_counter()
+            while self.acks and self.acks[0][0] < now - RATE_WINDOW:
+                self.acks.popleft()
+            window = min(RATE_WINDOW, now - self.startTime) \
+                if self.startTime else 0
+            return {'state': self.state,
+                    'error': self.error,
+                    'linesSent': self.linesSent,
+                    'linesAcked': self.linesAcked,
+                    'segmentCount': self.segmentCount,
+                    'bufferFill': self.inFlightBytes,
+                    'bufferSize': self.bufferSize,
+                    'lineRate': len(self.acks) / window if window else 0.0,
+                    'byteRate': sum(size for _, size in self.acks) / window
+                    if window else 0.0,
+                    'errors': len(self.errors),
+                    'elapsed': now - self.startTime if self.startTime else 0}
+
+    def run(self):
+        try:
+            self.waitForStartup()
+            with self.lock:
+                self.startTime = time.perf_counter()
+                if self.state == 'idle':
+                    self.state = 'streaming'
+            self.stream()
+        except Exception as error:
+            with self.lock:
+                self.state = 'failed'
+                self.error = str(error)
+        finally:
+            with self.lock:
+                self.endTime = time.perf_counter()
+
+    def waitForStartup(self):
+        # grbl resets when the port is opened and greets with 'Grbl ...'.
+        # Controllers which do not reset are streamed to after the
+        # timeout.
+        deadline = time.perf_counter() + STARTUP_TIMEOUT
+        while time.perf_counter() < deadline and not self.isStopped:
+            response = self.port.readLine(POLL_INTERVAL)
+            if response is not None and response.startswith('Grbl'):
+                self.messages.append(response)
+                return
+
+    def stream(self):
+        lines = iter(self.lines)
+        pending = None
+        isExhausted = False
+        isDraining = False
+        nextStatus = 0
+        while True:
+            while self.commands:
+                self.port.write(self.commands.popleft())
+            if self.isStopped:
+                with self.lock:
+                    self.state = 'failed' if self.error else 'stopped'
+                return
+
+            data = []
+            while not self.isPaused and not isExhausted:
+                if pending is None:
+                    pending = next(lines, None)
+                    if pending is None:
+                        isExhausted = True
+                        break
+                size = len(pending[0]) + 1
+                if self.inFlight and (
+                        self.inFlightBytes + size > self.bufferSize or
+                        self.maxLines and len(self.inFlight) >= self.maxLines):
+                    break
+                data.append(pending[0])
+                with self.lock:
+                    self.inFlight.append((size, pending[1]))
+                    self.inFlightBytes += size
+                    self.linesSent += 1
+                pending = None
+            if data:
+                self.port.write(('\n'.join(data) + '\n').encode('ascii'))
+
+            # 'ok' only means that a line is planned, the stream is done
+            # when the controller reports that it is idle, i.e. the last
+            # moves ran and it is not held
+            if isExhausted and not self.inFlight:
+                if not isDraining:
+                    isDraining = True
+                    with self.lock:
+                        self.status = None
+                with self.lock:
+                    if not self.isPaused and self.status is not None and \
+                            self.status.startswith('<Idle'):
+                        self.state = 'done'
+                        return
+                now = time.perf_counter()
+                if not self.isPaused and now >= nextStatus:
+                    self.port.write(STATUS_REPORT)
+                    nextStatus = now + STATUS_INTERVAL
+
+            response = self.port.readLine(POLL_INTERVAL)
+            if response:
+                self.handle(response)
+
+    def handle(self, response):
+        with self.lock:
+            if response == 'ok' or response.startswith('error'):
+                if not self.inFlight:
+                    return
+                size, count = self.inFlight.popleft()
+                self.inFlightBytes -= size
+                self.linesAcked += 1
+                self.bytesAcked += size
+                self.segmentCount = count
+                self.acks.append((time.perf_counter(), size))
+                if response != 'ok':
+                    self.errors.append((self.linesAcked, response))
+            elif response.startswith('ALARM'):
+                # the controller stops and locks, the stream can not go on
+                self.error = response
+                self.isStopped = True
+            elif response.startswith('<'):
+                self.status = response
+            else:
+                self.messages.append(response)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+from flatten import DEFAULT_TOLERANCE
+
+
+class Settings:
+    # Settings shared by path generation, simulation and export. Lengths
+    # are in mm.
+    def __init__(self):
+        # maximum chord error when flattening curves
+        self.tolerance = DEFAULT_TOLERANCE
+
+        # processes used to flatten large documents, 0 uses all CPU cores
+        self.flattenWorkers = 0
+
+        # work area of the machine (x, y, width, height), everything outside
+        # is clipped away; fitToPage scales the drawing to fill it
+        self.workArea = (0, 0, 210, 297)
+        self.clipToWorkArea = True
+        self.fitToPage = False
+
+        # segments which are drawn again, up to this distance, are removed
+        # or trimmed, 0 disables it
+        self.overlapTolerance = 0.01
+
+        # subpaths whose end points are closer than this are merged into
+        # one stroke, 0 disables it
+        self.joinTolerance = 0.01
+
+        # polyline simplification after flattening, 0 disables it
+        self.simplifyTolerance = 0
+
+        # G-code output
+        self.precision = 3
+        # drawing speed in mm/min
+        self.feedRate = 1500
+        self.penUpCommand = 'M5'
+        self.penDownCommand = 'M3 S1000'
+
+        # motion model for time estimates and the simulation: pen-up (G0)
+        # speed in mm/min, acceleration in mm/s^2 and junction deviation in
+        # mm as configured on the controller
+        self.travelRate = 3000
+        self.acceleration = 500
+        self.junctionDeviation = 0.01
+
+        # pen-up travel optimisation, 2-opt refinement time in seconds
+        self.orderPaths = True
+        self.twoOptTime = 1.0
+
+        # compiled job cache, None is the default per-user cache directory
+        self.useJobCache = True
+        self.jobCacheDir = None
+        self.jobCacheSize = 2**30
+
+        # streaming to the controller: serial port (e.g. /dev/ttyUSB0 or
+        # COM3), its speed and the controller's receive buffer in bytes
+        self.port = ''
+        self.baudrate = 115200
+        self.rxBufferSize = 128
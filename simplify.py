@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+
+from pathArray import PathArray
+
+
+def segmentDistance(P, A, B):
+    # Distance of points P from segments AB, all of shape (N, 2).
+    AB = B - A
+    length = np.einsum('ij,ij->i', AB, AB)
+    t = np.einsum('ij,ij->i', P - A, AB)
+    t = np.clip(np.divide(t, length, out=np.zeros_like(t), where=length > 0),
+                0, 1)
+
+    return np.hypot(*(A + t[:, None] * AB - P).T)
+
+
+def simplifyPaths(paths, tolerance):
+    # Ramer-Douglas-Peucker simplification of every subpath. Instead of
+    # recursing per subpath, all open intervals of all subpaths are split
+    # together, one level per iteration. The first and last point of every
+    # subpath are always kept.
+    points = paths.points
+    if tolerance <= 0 or len(points) < 3:
+        return paths
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[paths.offsets[:-1]] = True
+    keep[paths.offsets[1:] - 1] = True
+    if paths.owners is not None:
+        # points where the owner changes are kept too, so every segment
+        # still belongs to one element
+        keep[1:] |= paths.owners[1:] != paths.owners[:-1]
+
+    # intervals between kept points of the same subpath
+    kept = np.flatnonzero(keep)
+    last = np.zeros(len(points), dtype=bool)
+    last[paths.offsets[1:] - 1] = True
+    starts = kept[:-1]
+    ends = kept[1:]
+    select = ~last[starts] & (ends - starts > 1)
+    starts = starts[select]
+    ends = ends[select]
+
+    while len(starts):
+        # indices of the interior points of every interval
+        count = ends - starts - 1
+        first = np.cumsum(count) - count
+        owner = np.repeat(np.arange(len(starts)), count)
+        index = np.arange(count.sum()) - first[owner] + starts[owner] + 1
+
+        distance = segmentDistance(points[index], points[starts[owner]],
+                                   points[ends[owner]])
+        largest = np.maximum.reduceat(distance, first)
+
+        # first point with the largest distance in every interval
+        candidate = np.flatnonzero(distance == largest[owner])
+        _, firstCandidate = np.unique(owner[candidate], return_index=True)
+        split = index[candidate[firstCandidate]]
+
+        select = largest > tolerance
+        split = split[select]
+        keep[split] = True
+
+        starts, ends = (np.concatenate((starts[select], split)),
+                        np.concatenate((split, ends[select])))
+        select = ends - starts > 1
+        starts = starts[select]
+        ends = ends[select]
+
+    offsets = np.zeros(len(points) + 1, dtype=np.int64)
+    np.cumsum(keep, out=offsets[1:])
+    offsets = offsets[paths.offsets]
+
+    owners = None if paths.owners is None else paths.owners[keep]
+
+    return PathArray(points[keep], offsets, owners)
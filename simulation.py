@@ -2,9 +2,10 @@
 
 # Form implementation generated from reading ui file 'simulation.ui'
 #
-# Created by: PyQt5 UI code generator 5.14.2
+# Created by: PyQt5 UI code generator 5.15.11
 #
-# WARNING! All changes made in this file will be lost!
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
 
 
 from PyQt5 import QtCore, QtGui, QtWidgets
@@ -15,7 +16,7 @@ class Ui_Dialog(object):
         Dialog.setObjectName("Dialog")
         Dialog.resize(1024, 768)
         self.graphicsView = QtWidgets.QGraphicsView(Dialog)
-        self.graphicsView.setGeometry(QtCore.QRect(105, 11, 911, 751))
+        self.graphicsView.setGeometry(QtCore.QRect(105, 11, 911, 711))
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         sizePolicy.setHorizontalStretch(0)
         sizePolicy.setVerticalStretch(0)
@@ -29,6 +30,12 @@ class Ui_Dialog(object):
         self.graphicsView.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorUnderMouse)
         self.graphicsView.setViewportUpdateMode(QtWidgets.QGraphicsView.FullViewportUpdate)
         self.graphicsView.setObjectName("graphicsView")
+        self.progressSlider = QtWidgets.QSlider(Dialog)
+        self.progressSlider.setGeometry(QtCore.QRect(105, 732, 911, 22))
+        self.progressSlider.setMaximum(10000)
+        self.progressSlider.setPageStep(100)
+        self.progressSlider.setOrientation(QtCore.Qt.Horizontal)
+        self.progressSlider.setObjectName("progressSlider")
         self.stepFwdButton = QtWidgets.QPushButton(Dialog)
         self.stepFwdButton.setGeometry(QtCore.QRect(10, 80, 81, 31))
         self.stepFwdButton.setObjectName("stepFwdButton")
@@ -38,8 +45,47 @@ class Ui_Dialog(object):
         self.stepBackButton = QtWidgets.QPushButton(Dialog)
         self.stepBackButton.setGeometry(QtCore.QRect(10, 120, 81, 31))
         self.stepBackButton.setObjectName("stepBackButton")
+        self.speedLabel = QtWidgets.QLabel(Dialog)
+        self.speedLabel.setGeometry(QtCore.QRect(10, 170, 81, 21))
+        self.speedLabel.setObjectName("speedLabel")
+        self.speedBox = QtWidgets.QComboBox(Dialog)
+        self.speedBox.setGeometry(QtCore.QRect(10, 190, 81, 26))
+        self.speedBox.setObjectName("speedBox")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.speedBox.addItem("")
+        self.timeLabel = QtWidgets.QLabel(Dialog)
+        self.timeLabel.setGeometry(QtCore.QRect(10, 230, 91, 81))
+        self.timeLabel.setText("")
+        self.timeLabel.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.timeLabel.setObjectName("timeLabel")
+        self.portLabel = QtWidgets.QLabel(Dialog)
+        self.portLabel.setGeometry(QtCore.QRect(10, 330, 81, 21))
+        self.portLabel.setObjectName("portLabel")
+        self.portEdit = QtWidgets.QLineEdit(Dialog)
+        self.portEdit.setGeometry(QtCore.QRect(10, 350, 81, 26))
+        self.portEdit.setObjectName("portEdit")
+        self.sendButton = QtWidgets.QPushButton(Dialog)
+        self.sendButton.setGeometry(QtCore.QRect(10, 385, 81, 31))
+        self.sendButton.setObjectName("sendButton")
+        self.pauseButton = QtWidgets.QPushButton(Dialog)
+        self.pauseButton.setGeometry(QtCore.QRect(10, 425, 81, 31))
+        self.pauseButton.setObjectName("pauseButton")
+        self.stopButton = QtWidgets.QPushButton(Dialog)
+        self.stopButton.setGeometry(QtCore.QRect(10, 465, 81, 31))
+        self.stopButton.setObjectName("stopButton")
+        self.senderLabel = QtWidgets.QLabel(Dialog)
+        self.senderLabel.setGeometry(QtCore.QRect(10, 505, 91, 81))
+        self.senderLabel.setText("")
+        self.senderLabel.setAlignment(QtCore.Qt.AlignLeading|QtCore.Qt.AlignLeft|QtCore.Qt.AlignTop)
+        self.senderLabel.setObjectName("senderLabel")
 
         self.retranslateUi(Dialog)
+        self.speedBox.setCurrentIndex(3)
         QtCore.QMetaObject.connectSlotsByName(Dialog)
 
     def retranslateUi(self, Dialog):
@@ -48,6 +94,18 @@ class Ui_Dialog(object):
         self.stepFwdButton.setText(_translate("Dialog", "Step Fwd"))
         self.runButton.setText(_translate("Dialog", "Run"))
         self.stepBackButton.setText(_translate("Dialog", "Step Back"))
+        self.speedLabel.setText(_translate("Dialog", "Speed"))
+        self.speedBox.setItemText(0, _translate("Dialog", "1x"))
+        self.speedBox.setItemText(1, _translate("Dialog", "2x"))
+        self.speedBox.setItemText(2, _translate("Dialog", "5x"))
+        self.speedBox.setItemText(3, _translate("Dialog", "10x"))
+        self.speedBox.setItemText(4, _translate("Dialog", "50x"))
+        self.speedBox.setItemText(5, _translate("Dialog", "100x"))
+        self.speedBox.setItemText(6, _translate("Dialog", "1000x"))
+        self.portLabel.setText(_translate("Dialog", "Port"))
+        self.sendButton.setText(_translate("Dialog", "Send"))
+        self.pauseButton.setText(_translate("Dialog", "Pause"))
+        self.stopButton.setText(_translate("Dialog", "Stop"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from svgview import polygonFromArray
+
+# Number of segments handed to QPainter.drawLines at once.
+DRAW_BATCH = 65536
+# Memory for checkpoint images in bytes and their maximum number.
+CHECKPOINT_MEMORY = 64 * 2**20
+MAX_CHECKPOINTS = 16
+# Checkpoints are not made closer than this many segments.
+MIN_CHECKPOINT_INTERVAL = 4096
+
+
+class SimulationItem(QtWidgets.QGraphicsItem):
+    # Draws the first count segments of the simulated plot. Segments are
+    # kept in one (M, 4) array instead of one QGraphicsLineItem each. The
+    # segments already drawn are kept in an image in device coordinates,
+    # so advancing the simulation only draws the new segments. Copies of
+    # the image are kept at evenly spaced segment counts (checkpoints)
+    # while drawing, so seeking backwards or far ahead draws at most one
+    # checkpoint interval of segments. Everything is redrawn when the
+    # view transform or size changes. When segments are shown or hidden,
+    # drawing continues from the last checkpoint before the first of them.
+    def __init__(self, segments, pen, parent=None):
+        super().__init__(parent)
+        self.segments = np.ascontiguousarray(segments, dtype=np.float64)
+        self.visible = np.ones(len(self.segments), dtype=bool)
+        self.pen = pen
+        self.count = 0
+
+        self.image = None
+        self.imageCount = 0
+        self.imageTransform = None
+        self.checkpoints = {}
+        self.checkpointInterval = 0
+
+        if len(self.segments):
+            points = self.segments.reshape(-1, 2)
+            low = points.min(axis=0)
+            high = points.max(axis=0)
+            margin = pen.widthF()
+            self.rect = QtCore.QRectF(
+                low[0] - margin, low[1] - margin,
+                high[0] - low[0] + 2 * margin, high[1] - low[1] + 2 * margin)
+        else:
+            self.rect = QtCore.QRectF()
+
+    def segmentCount(self):
+        return len(self.segments)
+
+    def setCount(self, count):
+        count = min(max(count, 0), len(self.segments))
+        if count != self.count:
+            self.count = count
+            self.update()
+
+    def setSegmentsVisible(self, indices, visible):
+        # indices of the segments, e.g. from OwnerIndex.segments
+        if not len(indices):
+            return
+        self.visible[indices] = visible
+
+        first = indices.min()
+        self.checkpoints = {count: image
+                            for count, image in self.checkpoints.items()
+                            if count <= first}
+        if self.image is not None and self.imageCount > first:
+            base = max(self.checkpoints, default=0)
+            if base:
+                self.image = self.checkpoints[base].copy()
+            else:
+                self.image.fill(QtCore.Qt.transparent)
+            self.imageCount = base
+        self.update()
+
+    def boundingRect(self):
+        return self.rect
+
+    def drawSegments(self, painter, start, end):
+        painter.setPen(self.pen)
+        for first in range(start, end, DRAW_BATCH):
+            last = min(first + DRAW_BATCH, end)
+            segments = self.segments[first:last][self.visible[first:last]]
+            if len(segments):
+                painter.drawLines(polygonFromArray(segments.reshape(-1, 2)))
+
+    def paint(self, painter, option, widget=None):
+        if widget is None:
+            # rendering to a printer, image, ... without a view
+            self.drawSegments(painter, 0, self.count)
+            return
+
+        transform = painter.worldTransform()
+        ratio = widget.devicePixelRatioF()
+        size = widget.size() * ratio
+        if self.image is None or self.image.size() != size or \
+                self.imageTransform != transform:
+            self.image = QtGui.QImage(
+                size, QtGui.QImage.Format_ARGB32_Premultiplied)
+            self.image.setDevicePixelRatio(ratio)
+            self.image.fill(QtCore.Qt.transparent)
+            self.imageCount = 0
+            self.imageTransform = transform
+
+            checkpoints = CHECKPOINT_MEMORY // max(self.image.sizeInBytes(), 1)
+            checkpoints = min(max(checkpoints, 1), MAX_CHECKPOINTS)
+            self.checkpointInterval = max(
+                -(-len(self.segments) // checkpoints), MIN_CHECKPOINT_INTERVAL)
+            self.checkpoints = {}
+
+        # continue from the closest checkpoint if that is nearer than the
+        # current image (or the current image is past the count)
+        if self.imageCount > self.count or \
+                self.count - self.imageCount > self.checkpointInterval:
+            base = max((count for count in self.checkpoints
+                        if count <= self.count), default=0)
+            if base > self.imageCount or self.imageCount > self.count:
+                if base:
+                    self.image = self.checkpoints[base].copy()
+                else:
+                    self.image.fill(QtCore.Qt.transparent)
+                self.imageCount = base
+
+        if self.imageCount < self.count:
+            imagePainter = QtGui.QPainter(self.image)
+            imagePainter.setRenderHints(painter.renderHints())
+            imagePainter.setTransform(transform)
+            while self.imageCount < self.count:
+                interval = self.checkpointInterval
+                end = min((self.imageCount // interval + 1) * interval,
+                          self.count)
+                self.drawSegments(imagePainter, self.imageCount, end)
+                self.imageCount = end
+                if end % interval == 0 and end not in self.checkpoints:
+                    self.checkpoints[end] = self.image.copy()
+            imagePainter.end()
+
+        painter.save()
+        painter.resetTransform()
+        painter.drawImage(0, 0, self.image)
+        painter.restore()
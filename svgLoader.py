@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+#############################################################################
+#
+# Copyright (c) 2020 Jernej Pangerc
+# See LICENCE file for details [1].
+#
+#############################################################################
+
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from elements import ELEMENT_CLASSES, Svg, createElement
+from flatten import DEFAULT_TOLERANCE
+from geometryCache import geometryCache
+from parallelFlatten import flattenElements
+from pathArray import PathArray
+
+# Progress is reported after this many elements.
+PROGRESS_INTERVAL = 1000
+
+
+def matrixScale(matrix):
+    # Largest factor by which the matrix stretches lengths (the largest
+    # singular value of its linear part).
+    a, b = matrix[0, :2]
+    c, d = matrix[1, :2]
+    square = a * a + b * b + c * c + d * d
+    determinant = a * d - b * c
+    return math.sqrt((square + math.sqrt(max(
+        square * square - 4 * determinant * determinant, 0))) / 2)
+
+
+def transformPaths(paths, matrices):
+    # Paths mapped by the 3x3 matrix of every element (None for no
+    # transform). Elements share the matrix object of their group, so the
+    # points of all elements with the same matrix are mapped by one
+    # multiplication.
+    groups = {}
+    for index, (path, matrix) in enumerate(zip(paths, matrices)):
+        if matrix is not None and path is not None and path.pointCount():
+            groups.setdefault(id(matrix), []).append(index)
+
+    paths = list(paths)
+    for group in groups.values():
+        matrix = matrices[group[0]]
+        points = np.concatenate([paths[index].points for index in group])
+        points = points @ matrix[:2, :2].T + matrix[:2, 2]
+        start = 0
+        for index in group:
+            end = start + paths[index].pointCount()
+            paths[index] = PathArray(points[start:end], paths[index].offsets)
+            start = end
+
+    return paths
+
+
+class SvgDocument:
+    # Element model of a loaded SVG file. Elements are stored in document
+    # order together with the index of their parent (-1 for the root),
+    # their transform to the page in mm (the page transform of the root
+    # composed with the transforms of all parents and their own, None if
+    # there is none) and their flattened geometry on the page (None for
+    # groups). A compiled document is restored from the job cache and has
+    # no element attributes, so its geometry can not be flattened again.
+    def __init__(self, namespace='', tolerance=DEFAULT_TOLERANCE):
+        self.namespace = namespace
+        self.tolerance = tolerance
+        self.compiled = False
+        # page (width, height) in mm, None if it is not known
+        self.pageSize = None
+        self.elements = []
+        self.parents = []
+        self.matrices = []
+        self.paths = []
+
+    def __len__(self):
+        return len(self.elements)
+
+    def add(self, element, parent, path):
+        if parent >= 0:
+            matrix = self.matrices[parent]
+        elif isinstance(element, Svg):
+            matrix, self.pageSize = element.pageTransform()
+            if np.array_equal(matrix, np.eye(3)):
+                matrix = None
+        else:
+            matrix = None
+        if element.transform is not None:
+            matrix = element.transform if matrix is None else \
+                matrix @ element.transform
+
+        self.elements.append(element)
+        self.parents.append(parent)
+        self.matrices.append(matrix)
+        self.paths.append(path)
+
+        return len(self.elements) - 1
+
+    def flatten(self, tolerance, cache=geometryCache, workers=0,
+                progress=None):
+        # Elements are flattened in their own coordinates, with the
+        # tolerance divided by the scale of their transform, so cached
+        # geometry does not depend on the transform. The geometry is then
+        # mapped to the page.
+        if self.compiled:
+            raise ValueError('compiled document can not be flattened again')
+        self.tolerance = tolerance
+
+        scales = {}
+        for matrix in self.matrices:
+            if matrix is not None and id(matrix) not in scales:
+                scales[id(matrix)] = matrixScale(matrix)
+        if scales:
+            tolerance = [tolerance / max(scales[id(matrix)], 1e-12)
+                         if matrix is not None else tolerance
+                         for matrix in self.matrices]
+        paths = flattenElements(self.elements, tolerance, cache, workers,
+                                progress)
+        self.paths = transformPaths(paths, self.matrices)
+
+    def updatePaths(self, tolerance, cache=geometryCache, workers=0):
+        self.flatten(tolerance, cache, workers)
+
+    def getPaths(self, indices):
+        # Geometry of the given elements joined into one PathArray, every
+        # subpath owned by its element.
+        return PathArray.concatenate([self.paths[i].withOwner(i)
+                                      for i in indices
+                                      if self.paths[i] is not None])
+
+    def pageRect(self):
+        # Page (x, y, width, height) in mm, or the bounding box of all
+        # geometry if the page size is not known.
+        if self.pageSize is not None:
+            width, height = self.pageSize
+            if width > 0 and height > 0:
+                return (0, 0, width, height)
+
+        points = [path.points for path in self.paths
+                  if path is not None and path.pointCount()]
+        if not points:
+            return (0, 0, 0, 0)
+        low = np.min([p.min(axis=0) for p in points], axis=0)
+        high = np.max([p.max(axis=0) for p in points], axis=0)
+
+        return (low[0], low[1], high[0] - low[0], high[1] - low[1])
+
+
+class SvgLoader:
+    # Builds an SvgDocument in a single pass over the file with
+    # ET.iterparse. Every node is cleared and detached as soon as it is
+    # finished, so memory does not grow with the size of the XML tree.
+    # The elements are flattened after parsing, in parallel for large
+    # documents (see parallelFlatten).
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, progress=None,
+                 cache=geometryCache, workers=0):
+        self.tolerance = tolerance
+        # progress(done, total), called with bytes read while parsing and
+        # with flattened elements after that
+        self.progress = progress
+        self.cache = cache
+        # flattening processes, 0 uses all CPU cores
+        self.workers = workers
+        # document being loaded, for progress callbacks
+        self.document = None
+
+    def load(self, filename):
+        document = self.parse(filename)
+        if document is not None:
+            self.flatten(document)
+
+        return document
+
+    def parse(self, filename):
+        # Document with all elements but without geometry.
+        size = os.path.getsize(filename)
+        document = None
+
+        # stack of (node, element index or None if it is skipped)
+        stack = []
+        skipped = 0
+
+        with open(filename, 'rb') as file:
+            for event, node in ET.iterparse(file, events=('start', 'end')):
+                if event == 'start':
+                    if document is None:
+                        match = re.match('{(.*)}', node.tag)
+                        namespace = '{' + match.group(1) + '}' if match else ''
+                        document = SvgDocument(namespace, self.tolerance)
+                        self.document = document
+
+                    tag = node.tag.replace(document.namespace, '')
+                    if skipped or (stack and (tag == 'svg' or
+                                              tag not in ELEMENT_CLASSES)):
+                        # content of defs, metadata, ... is not drawn
+                        skipped += 1
+                        stack.append((node, None))
+                        continue
+
+                    parent = stack[-1][1] if stack else -1
+                    element = createElement(tag, node.attrib)
+                    index = document.add(element, parent, None)
+                    stack.append((node, index))
+
+                    if self.progress and index % PROGRESS_INTERVAL == 0:
+                        self.progress(file.tell(), size)
+                    continue
+
+                node, index = stack.pop()
+                if index is None:
+                    skipped -= 1
+
+                node.clear()
+                if stack:
+                    del stack[-1][0][-1]
+
+        if self.progress:
+            self.progress(size, size)
+
+        return document
+
+    def flatten(self, document):
+        document.flatten(self.tolerance, self.cache, self.workers,
+                         self.progress)
@@ -7,27 +7,140 @@
 #
 #############################################################################
 
-from PyQt5 import QtCore, QtGui, QtWidgets, QtSvg
+import collections
+import math
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from pathArray import OwnerIndex
+
+# Preview tile size in device pixels and the number of cached tiles.
+TILE_SIZE = 256
+TILE_CACHE_SIZE = 256
+# Longer side of the low resolution overview shown while tiles render.
+OVERVIEW_SIZE = 2048
+# Segments drawn by one QPainter call in worker threads. PyQt keeps the
+# GIL during the call, so long calls would stall the GUI thread.
+RENDER_BATCH = 16384
+
+
+def polygonFromArray(points):
+    # QPolygonF filled directly from an (N, 2) float64 array.
+    polygon = QtGui.QPolygonF(len(points))
+    if len(points):
+        buffer = polygon.data()
+        buffer.setsize(len(points) * 2 * 8)
+        np.frombuffer(buffer, dtype=np.float64)[:] = points.ravel()
+
+    return polygon
+
+
+def renderSegments(size, transform, segments, bounds, visible, owners,
+                   rect):
+    # Image of the visible segments which touch rect (scene coordinates),
+    # drawn with the given scene to image transform. Runs in worker
+    # threads, so it only uses QImage and QPainter.
+    image = QtGui.QImage(size, QtGui.QImage.Format_ARGB32_Premultiplied)
+    image.fill(QtCore.Qt.transparent)
+
+    select = (bounds[:, 2] >= rect[0]) & (bounds[:, 0] <= rect[2]) & \
+        (bounds[:, 3] >= rect[1]) & (bounds[:, 1] <= rect[3])
+    select &= visible[owners]
+    if select.any():
+        pen = QtGui.QPen(QtCore.Qt.black, 0)
+        pen.setCosmetic(True)
+        painter = QtGui.QPainter(image)
+        painter.setTransform(transform)
+        painter.setPen(pen)
+        selected = segments[select]
+        for first in range(0, len(selected), RENDER_BATCH):
+            painter.drawLines(polygonFromArray(
+                selected[first:first + RENDER_BATCH].reshape(-1, 2)))
+        painter.end()
+
+    return image
+
+
+class TileSignals(QtCore.QObject):
+    # key, generation, image
+    finished = QtCore.pyqtSignal(object, int, QtGui.QImage)
+
+
+class TileTask(QtCore.QRunnable):
+    # Renders one preview tile (or the overview) in the thread pool. Tiles
+    # which are not wanted any more when the task starts (e.g. after
+    # zooming) are skipped and reported with a null image.
+    def __init__(self, view, key, generation, size, transform, rect,
+                 geometry):
+        super().__init__()
+        self.view = view
+        self.signals = view.signals
+        self.key = key
+        self.generation = generation
+        self.size = size
+        self.transform = transform
+        self.rect = rect
+        self.geometry = geometry
+
+    def run(self):
+        if self.view.isTileWanted(self.key, self.generation):
+            image = renderSegments(self.size, self.transform, *self.geometry,
+                                   self.rect)
+        else:
+            image = QtGui.QImage()
+        self.signals.finished.emit(self.key, self.generation, image)
 
 
 class SvgView(QtWidgets.QGraphicsView):
+    # Preview of the geometry which will be plotted. Instead of one item
+    # per element, the geometry is drawn in the foreground from square
+    # tiles in device coordinates. Tiles are keyed by the zoom level and
+    # their position, so panning reuses them, and are rendered by a
+    # thread pool and kept in an LRU cache. Missing tiles are filled from
+    # a low resolution overview of the whole drawing. Showing or hiding
+    # elements starts a new generation: tiles away from the elements are
+    # kept, the others stay on screen until their replacements arrive, and
+    # only the part of the overview around the elements is rendered again.
     def __init__(self, parent):
         super().__init__(parent)
 
-        self.svg_file = None
-        self.items = None
-        self.svgItem = None
         self.backgroundItem = None
         self.outlineItem = None
 
-    def run(self):
-        self.setScene(QtWidgets.QGraphicsScene(self))
+        self.segments = np.empty((0, 4))
+        self.bounds = np.empty((0, 4))
+        self.owners = np.empty(0, dtype=np.int64)
+        self.ownerIndex = OwnerIndex(self.owners)
+        self.visible = np.empty(0, dtype=bool)
+        # scene rects (x1, y1, x2, y2) of elements shown or hidden since the
+        # last generation, and of those since the overview generation
+        self.changed = []
+        self.overviewChanges = []
+        self.overviewGeneration = 0
+        self.extent = None
+        self.geometry = None
+        self.generation = 0
+        self.documentGeneration = 0
+        self.tileScale = None
+        self.isVisibilityDirty = False
 
-    def openFile(self, svg_file):
+        # (scale, x, y) -> (generation, image)
+        self.tiles = collections.OrderedDict()
+        self.pending = set()
+        self.overview = None
+        self.overviewRect = None
 
-        if not svg_file.exists():
-            return
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max(QtCore.QThread.idealThreadCount() - 1,
+                                        1))
+        self.signals = TileSignals(self)
+        self.signals.finished.connect(self.tileFinished)
 
+    def run(self):
+        self.setScene(QtWidgets.QGraphicsScene(self))
+
+    def setDocument(self, document):
         s = self.scene()
 
         if self.backgroundItem:
@@ -42,20 +155,38 @@ class SvgView(QtWidgets.QGraphicsView):
 
         s.clear()
 
-        self.svgItem = QtSvg.QGraphicsSvgItem(svg_file.fileName())
-        self.svgItem.setFlags(QtWidgets.QGraphicsItem.ItemClipsToShape)
-        self.svgItem.setCacheMode(QtWidgets.QGraphicsItem.NoCache)
-        self.svgItem.setZValue(0)
+        paths = document.getPaths(range(len(document)))
+        self.segments = paths.segments()
+        self.owners = paths.segmentOwners()
+        if self.owners is None:
+            self.owners = np.empty(0, dtype=np.int64)
+        self.ownerIndex = OwnerIndex(self.owners)
+        self.bounds = np.hstack((
+            np.minimum(self.segments[:, :2], self.segments[:, 2:]),
+            np.maximum(self.segments[:, :2], self.segments[:, 2:])))
+        self.visible = np.ones(len(document), dtype=bool)
+        self.changed = []
+        self.overviewChanges = []
+        self.isVisibilityDirty = True
+        if len(self.segments):
+            self.extent = (self.bounds[:, :2].min(axis=0),
+                           self.bounds[:, 2:].max(axis=0))
 
-        self.backgroundItem = QtWidgets.QGraphicsRectItem(
-            self.svgItem.boundingRect())
+        # results of tasks for the previous document are dropped
+        self.pool.clear()
+        self.documentGeneration = self.generation + 1
+        self.tiles.clear()
+        self.overview = None
+
+        page = QtCore.QRectF(*document.pageRect())
+
+        self.backgroundItem = QtWidgets.QGraphicsRectItem(page)
         self.backgroundItem.setBrush(QtCore.Qt.white)
         self.backgroundItem.setPen(QtGui.QPen(QtCore.Qt.NoPen))
         self.backgroundItem.setVisible(drawBackground)
         self.backgroundItem.setZValue(-1)
 
-        self.outlineItem = QtWidgets.QGraphicsRectItem(
-            self.svgItem.boundingRect())
+        self.outlineItem = QtWidgets.QGraphicsRectItem(page)
         outline = QtGui.QPen(QtCore.Qt.black, 2, QtCore.Qt.DashLine)
         outline.setCosmetic(True)
         self.outlineItem.setPen(outline)
@@ -64,11 +195,22 @@ class SvgView(QtWidgets.QGraphicsView):
         self.outlineItem.setZValue(1)
 
         s.addItem(self.backgroundItem)
-        s.addItem(self.svgItem)
         s.addItem(self.outlineItem)
 
         s.setSceneRect(
             self.outlineItem.boundingRect().adjusted(-10, -10, 10, 10))
+        self.viewport().update()
+
+    def setElementVisible(self, index, visible):
+        if self.visible[index] != visible:
+            self.visible[index] = visible
+            segments = self.ownerIndex.segments([index])
+            if len(segments):
+                bounds = self.bounds[segments]
+                self.changed.append(np.concatenate(
+                    (bounds[:, :2].min(axis=0), bounds[:, 2:].max(axis=0))))
+                self.isVisibilityDirty = True
+                self.viewport().update()
 
     def setViewBackground(self, enable):
         if self.backgroundItem:
@@ -82,3 +224,185 @@ class SvgView(QtWidgets.QGraphicsView):
         factor = pow(1.2, event.angleDelta().y() / 240.0)
         self.scale(factor, factor)
         event.accept()
+
+    def isTileWanted(self, key, generation):
+        # Called from worker threads.
+        if generation != self.generation:
+            return False
+
+        return key[0] == 'overview' or key[0] == self.tileScale
+
+    def tileRect(self, key):
+        # Scene rect (x1, y1, x2, y2) of a tile, one pixel wider for lines
+        # on the tile border.
+        scale, x, y = key
+        return ((x * TILE_SIZE - 1) / scale, (y * TILE_SIZE - 1) / scale,
+                ((x + 1) * TILE_SIZE + 1) / scale,
+                ((y + 1) * TILE_SIZE + 1) / scale)
+
+    def overviewGrid(self):
+        # Scale, position of the first pixel (in pixels, whole ones so the
+        # parts rendered again line up) and size of the overview.
+        low, high = self.extent
+        scale = OVERVIEW_SIZE / max((high - low).max(), 1e-9)
+        origin = np.floor(low * scale)
+        size = np.maximum(np.ceil(high * scale - origin), 1).astype(int)
+
+        return scale, origin, size
+
+    def updateGeometry(self):
+        # Snapshot of the visibility for the worker threads. Tiles of the
+        # last generation which do not touch the changed elements are
+        # still valid.
+        self.generation += 1
+        self.geometry = (self.segments, self.bounds, self.visible.copy(),
+                         self.owners)
+        self.isVisibilityDirty = False
+        self.pending.clear()
+
+        changed = np.array(self.changed).reshape(-1, 4)
+        self.changed = []
+        for key, (generation, image) in list(self.tiles.items()):
+            if generation != self.generation - 1:
+                continue
+            rect = self.tileRect(key)
+            if not ((changed[:, 2] >= rect[0]) & (changed[:, 0] <= rect[2]) &
+                    (changed[:, 3] >= rect[1]) &
+                    (changed[:, 1] <= rect[3])).any():
+                self.tiles[key] = (self.generation, image)
+
+        if not len(self.segments):
+            return
+
+        # the whole overview, or the part of it which changed since the
+        # generation it shows
+        scale, origin, size = self.overviewGrid()
+        first = np.zeros(2, dtype=int)
+        last = size
+        if self.overview is not None:
+            if len(changed):
+                self.overviewChanges.append((
+                    self.generation, np.concatenate(
+                        (changed[:, :2].min(axis=0),
+                         changed[:, 2:].max(axis=0)))))
+            if not self.overviewChanges:
+                return
+            rects = np.array([rect for _, rect in self.overviewChanges])
+            first = np.clip(np.floor(rects[:, :2].min(axis=0) * scale -
+                                     origin).astype(int) - 1, 0, size)
+            last = np.clip(np.ceil(rects[:, 2:].max(axis=0) * scale -
+                                   origin).astype(int) + 1, 0, size)
+
+        transform = QtGui.QTransform(scale, 0, 0, scale,
+                                     -origin[0] - first[0],
+                                     -origin[1] - first[1])
+        rect = tuple(np.concatenate(((origin + first - 1) / scale,
+                                     (origin + last + 1) / scale)))
+        self.pool.start(TileTask(
+            self, ('overview', int(first[0]), int(first[1])),
+            self.generation,
+            QtCore.QSize(*np.maximum(last - first, 1).tolist()), transform,
+            rect, self.geometry), 1)
+
+    def tileFinished(self, key, generation, image):
+        if generation < self.documentGeneration or image.isNull():
+            if key[0] != 'overview':
+                self.pending.discard(key + (generation,))
+            return
+
+        if key[0] == 'overview':
+            # the overview, or the part of it at key[1:], at a generation
+            # after the one it shows
+            if generation > self.overviewGeneration:
+                self.overviewGeneration = generation
+                self.overviewChanges = [
+                    change for change in self.overviewChanges
+                    if change[0] > generation]
+                if self.overview is None:
+                    scale, origin, size = self.overviewGrid()
+                    self.overview = image
+                    self.overviewRect = QtCore.QRectF(
+                        origin[0] / scale, origin[1] / scale,
+                        size[0] / scale, size[1] / scale)
+                else:
+                    painter = QtGui.QPainter(self.overview)
+                    painter.setCompositionMode(
+                        QtGui.QPainter.CompositionMode_Source)
+                    painter.drawImage(key[1], key[2], image)
+                    painter.end()
+                self.viewport().update()
+            return
+
+        self.pending.discard(key + (generation,))
+        current = self.tiles.get(key)
+        if current is None or current[0] <= generation:
+            self.tiles[key] = (generation, image)
+            self.tiles.move_to_end(key)
+            while len(self.tiles) > TILE_CACHE_SIZE:
+                self.tiles.popitem(last=False)
+            self.viewport().update()
+
+    def drawForeground(self, painter, rect):
+        if not len(self.segments):
+            return
+        if self.isVisibilityDirty:
+            self.updateGeometry()
+
+        # device position of scene point p is p * scale + offset
+        transform = self.viewportTransform()
+        scale = self.tileScale = transform.m11()
+        offset = (transform.dx(), transform.dy())
+        viewport = self.viewport().rect()
+        first = [math.floor((0 - offset[0]) / TILE_SIZE),
+                 math.floor((0 - offset[1]) / TILE_SIZE)]
+        last = [math.floor((viewport.width() - offset[0]) / TILE_SIZE),
+                math.floor((viewport.height() - offset[1]) / TILE_SIZE)]
+
+        painter.save()
+        missing = []
+        for x in range(first[0], last[0] + 1):
+            for y in range(first[1], last[1] + 1):
+                key = (scale, x, y)
+                target = QtCore.QRectF(x * TILE_SIZE + offset[0],
+                                       y * TILE_SIZE + offset[1],
+                                       TILE_SIZE, TILE_SIZE)
+                tile = self.tiles.get(key)
+                if tile is None or tile[0] != self.generation:
+                    self.requestTile(key, scale)
+                if tile is None:
+                    missing.append(target)
+                    continue
+
+                self.tiles.move_to_end(key)
+                painter.resetTransform()
+                painter.drawImage(target.topLeft(), tile[1])
+
+        if missing and self.overview is not None:
+            painter.setTransform(transform)
+            painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+            inverse = transform.inverted()[0]
+            source = self.overview.rect()
+            for target in missing:
+                sceneRect = inverse.mapRect(target) & self.overviewRect
+                if sceneRect.isEmpty():
+                    continue
+                fx = source.width() / self.overviewRect.width()
+                fy = source.height() / self.overviewRect.height()
+                painter.drawImage(sceneRect, self.overview, QtCore.QRectF(
+                    (sceneRect.x() - self.overviewRect.x()) * fx,
+                    (sceneRect.y() - self.overviewRect.y()) * fy,
+                    sceneRect.width() * fx, sceneRect.height() * fy))
+        painter.restore()
+
+    def requestTile(self, key, scale):
+        if key + (self.generation,) in self.pending:
+            return
+        self.pending.add(key + (self.generation,))
+
+        _, x, y = key
+        transform = QtGui.QTransform(scale, 0, 0, scale,
+                                     -x * TILE_SIZE, -y * TILE_SIZE)
+        self.pool.start(TileTask(self, key, self.generation,
+                                 QtCore.QSize(TILE_SIZE, TILE_SIZE),
+                                 transform, self.tileRect(key),
+                                 self.geometry))